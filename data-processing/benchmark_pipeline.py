@@ -0,0 +1,193 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Pipeline Benchmark
+Times every ranking stage on synthetic card pools and records the results as JSON
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+from calculate_rankings import (load_cards, build_card_table, build_pair_engine, select_top_pairs,
+                                build_combinations, TOP_N, MIN_SCORE_THRESHOLD, WEIGHTS)
+from rankings_export import write_rankings
+from synthetic_cards import generate_cards, build_snapshot
+
+DEFAULT_SIZES = [1000, 5000, 13000, 50000]
+# The unpruned scan grows quadratically; above this many cards it is skipped
+MAX_SCAN_CARDS = 15000
+STAGES = ('load', 'card_scoring', 'pair_scoring', 'top_k', 'explanations', 'export')
+
+def git_commit():
+    """Current commit of the checkout, or None outside a git repository"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def timed(fn, *args, **kwargs):
+    """Call fn, returning its result and the elapsed wall time in seconds"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def full_scan(engine, candidate_floor):
+    """Score every pair of the upper triangle without pruning; returns the count above the floor"""
+    count = 0
+    for _, _, scores, _ in engine.iter_upper_blocks():
+        count += int(np.count_nonzero(scores >= candidate_floor))
+    return count
+
+def benchmark_size(count, seed, top_n, max_scan_cards, workdir, compact=False):
+    """Generate count synthetic cards and time each pipeline stage on them"""
+    cards_file = os.path.join(workdir, f"cards_{count}.json")
+    rankings_file = os.path.join(workdir, f"rankings_{count}.json")
+    with open(cards_file, 'w', encoding='utf-8') as f:
+        json.dump(build_snapshot(generate_cards(count, seed), seed), f, ensure_ascii=False, indent=2)
+
+    stages = {}
+    cards, stages['load'] = timed(load_cards, cards_file)
+    # Same filter as calculate_rankings.py
+    cards = [card for card in cards if card.get('desc')]
+    table, stages['card_scoring'] = timed(build_card_table, cards)
+
+    engine = build_pair_engine(table)
+    n = len(table)
+    total_pairs = n * (n - 1) // 2
+    candidate_floor = MIN_SCORE_THRESHOLD - 0.005
+
+    if n <= max_scan_cards:
+        _, stages['pair_scoring'] = timed(full_scan, engine, candidate_floor)
+    else:
+        stages['pair_scoring'] = None
+
+    (winners, scored_count), stages['top_k'] = timed(select_top_pairs, engine, table.ids, top_n,
+                                                     MIN_SCORE_THRESHOLD)
+    combinations, stages['explanations'] = timed(build_combinations, table, winners, MIN_SCORE_THRESHOLD)
+
+    def export():
+        output_data = {
+            'metadata': {
+                'totalCombinations': total_pairs,
+                'scoredCombinations': scored_count,
+                'topN': top_n,
+                'generationDate': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'weights': WEIGHTS,
+                'cardsAnalyzed': n,
+                'minScoreThreshold': MIN_SCORE_THRESHOLD
+            },
+            'rankings': combinations
+        }
+        return write_rankings(output_data, rankings_file, compact)
+    export_stats, stages['export'] = timed(export)
+
+    return {
+        'cards': count,
+        'cardsAnalyzed': n,
+        'totalPairs': total_pairs,
+        'scoredCombinations': scored_count,
+        'exported': len(combinations),
+        'cardsFileBytes': os.path.getsize(cards_file),
+        'rankingsFileBytes': export_stats['bytes'],
+        'rankingsFormat': export_stats['format'],
+        'encoder': export_stats['encoder'],
+        'seconds': stages,
+        'totalSeconds': sum(seconds for seconds in stages.values() if seconds is not None),
+        'pairScoringPairsPerSecond': (total_pairs / stages['pair_scoring']
+                                      if stages['pair_scoring'] else None),
+        'topKPairsPerSecond': total_pairs / stages['top_k'] if stages['top_k'] else None,
+    }
+
+def print_comparison(results, baseline):
+    """Print per-stage timing changes against an earlier results file"""
+    previous = {result['cards']: result for result in baseline['results']}
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline.get('date', 'unknown date')}):")
+    for result in results:
+        old = previous.get(result['cards'])
+        if old is None:
+            continue
+        print(f"\n  {result['cards']:,} cards:")
+        for stage in STAGES:
+            before, after = old['seconds'].get(stage), result['seconds'].get(stage)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            marker = "⚠️ " if change > 0.1 else "  "
+            print(f"  {marker}{stage:<14} {before:8.3f}s -> {after:8.3f}s ({change:+.1%})")
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Benchmark the ranking pipeline on synthetic cards")
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES,
+                        help="card pool sizes to benchmark (default: 1000 5000 13000 50000)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of the synthetic cards (default: 0)")
+    parser.add_argument('--top', type=int, default=TOP_N,
+                        help=f"number of combinations ranked and exported (default: {TOP_N})")
+    parser.add_argument('--max-scan-cards', type=int, default=MAX_SCAN_CARDS,
+                        help=f"skip the unpruned pair scan above this many cards (default: {MAX_SCAN_CARDS:,})")
+    parser.add_argument('--compact', action='store_true', help="time the compact rankings export")
+    parser.add_argument('--output', default=None, help="write the results as JSON to this file")
+    parser.add_argument('--compare', default=None, help="results file of an earlier run to compare against")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main execution function"""
+    args = parse_args(argv)
+
+    print("=" * 60)
+    print("Yu-Gi-Oh Ranking Pipeline Benchmark")
+    print("=" * 60)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for count in args.sizes:
+            print(f"\nBenchmarking {count:,} synthetic cards...")
+            results.append(benchmark_size(count, args.seed, args.top, args.max_scan_cards, workdir,
+                                          args.compact))
+
+    print("\n" + "=" * 60)
+    print("Results (seconds):")
+    print("=" * 60)
+    print(f"{'cards':>8} " + " ".join(f"{stage:>13}" for stage in STAGES) + f" {'total':>9}")
+    for result in results:
+        cells = ['skipped' if result['seconds'][stage] is None else f"{result['seconds'][stage]:.3f}"
+                 for stage in STAGES]
+        print(f"{result['cards']:>8,} " + " ".join(f"{cell:>13}" for cell in cells)
+              + f" {result['totalSeconds']:>9.3f}")
+
+    report = {
+        'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpuCount': os.cpu_count(),
+        'seed': args.seed,
+        'topN': args.top,
+        'minScoreThreshold': MIN_SCORE_THRESHOLD,
+        'results': results,
+    }
+
+    if args.compare:
+        try:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                print_comparison(results, json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"\nCould not compare with {args.compare}: {e}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Smart Ranker Recall Benchmark
+Compares calculate_rankings_smart.py's heuristic candidates against the exact top-K
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+from calculate_rankings import load_card_table, build_pair_engine, select_top_pairs, CARDS_FILE
+from calculate_rankings_smart import (filter_smart_cards, select_smart_pairs, parse_limit,
+                                      MECH_LIST_LIMIT, POWER_CARD_LIMIT, TOP_N, MIN_SCORE_THRESHOLD)
+
+def pair_keys(table, winners):
+    """Order-independent card id pair of every (score, idx1, idx2) winner"""
+    keys = []
+    for _, idx1, idx2 in winners:
+        id1, id2 = int(table.ids[idx1]), int(table.ids[idx2])
+        keys.append((min(id1, id2), max(id1, id2)))
+    return keys
+
+def spearman(ranks_a, ranks_b):
+    """Spearman correlation of two paired rank lists (None when undefined)"""
+    a = np.asarray(ranks_a, dtype=np.float64)
+    b = np.asarray(ranks_b, dtype=np.float64)
+    if len(a) < 2 or a.std() == 0 or b.std() == 0:
+        return None
+    return float(np.corrcoef(a, b)[0, 1])
+
+def compare_rankings(exact_keys, smart_keys):
+    """
+    Recall, rank correlation and first missed rank of the smart ranking.
+    The correlation runs over the union of both top-K lists, with pairs
+    missing from a list ranked just below its end, so misses lower it.
+    """
+    exact_rank = {key: rank for rank, key in enumerate(exact_keys, 1)}
+    smart_rank = {key: rank for rank, key in enumerate(smart_keys, 1)}
+    union = list(exact_rank) + [key for key in smart_rank if key not in exact_rank]
+    missed = [exact_rank[key] for key in exact_keys if key not in smart_rank]
+
+    return {
+        'recall': 1 - len(missed) / len(exact_keys) if exact_keys else 1.0,
+        'spearman': spearman([exact_rank.get(key, len(exact_keys) + 1) for key in union],
+                             [smart_rank.get(key, len(smart_keys) + 1) for key in union]),
+        'missed': len(missed),
+        'firstMissedRank': missed[0] if missed else None,
+    }
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Measure the smart ranker's recall against the exact top-K")
+    parser.add_argument('--cards', nargs='+', default=[CARDS_FILE],
+                        help="card snapshots (cards.json files) to benchmark")
+    parser.add_argument('--limit', type=int, default=None,
+                        help="only use the first N cards of each snapshot")
+    parser.add_argument('--top', type=int, default=TOP_N,
+                        help=f"K, the number of top pairs compared (default: {TOP_N})")
+    parser.add_argument('--mech-limits', nargs='+', type=parse_limit, default=[MECH_LIST_LIMIT],
+                        help="MECH_LIST_LIMIT values to try ('none' for no limit)")
+    parser.add_argument('--power-limits', nargs='+', type=parse_limit, default=[POWER_CARD_LIMIT],
+                        help="POWER_CARD_LIMIT values to try ('none' for no limit)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processes used for the exact ranking (default: 1)")
+    parser.add_argument('--output', default=None,
+                        help="write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main execution function"""
+    args = parse_args(argv)
+
+    print("=" * 60)
+    print("Yu-Gi-Oh Smart Ranker Recall Benchmark")
+    print("=" * 60)
+
+    results = []
+    for cards_file in args.cards:
+        table = load_card_table(cards_file)
+        if table is None:
+            print(f"Failed to load {cards_file}, skipping")
+            continue
+
+        # Both rankers see exactly the cards the smart ranker analyzes
+        table = filter_smart_cards(table)
+        if args.limit is not None:
+            table = table.take(np.arange(min(args.limit, len(table))))
+        total_pairs = len(table) * (len(table) - 1) // 2
+        print(f"\n✓ {cards_file}: {len(table):,} cards, {total_pairs:,} pairs")
+
+        start = time.perf_counter()
+        exact, _ = select_top_pairs(build_pair_engine(table), table.ids, args.top, MIN_SCORE_THRESHOLD,
+                                    max(1, args.workers))
+        exact_seconds = time.perf_counter() - start
+        exact_keys = pair_keys(table, exact)
+
+        for mech_limit in args.mech_limits:
+            for power_limit in args.power_limits:
+                start = time.perf_counter()
+                smart, _, candidate_count = select_smart_pairs(table, args.top, MIN_SCORE_THRESHOLD,
+                                                               mech_limit, power_limit)
+                smart_seconds = time.perf_counter() - start
+
+                result = {
+                    'cards': cards_file,
+                    'cardCount': len(table),
+                    'k': args.top,
+                    'mechListLimit': mech_limit,
+                    'powerCardLimit': power_limit,
+                    'candidates': candidate_count,
+                    'candidateShare': candidate_count / total_pairs if total_pairs else 0.0,
+                    'exactSeconds': exact_seconds,
+                    'smartSeconds': smart_seconds,
+                    **compare_rankings(exact_keys, pair_keys(table, smart)),
+                }
+                results.append(result)
+
+    print("\n" + "=" * 60)
+    print("Results:")
+    print("=" * 60)
+    for result in results:
+        spearman_text = 'n/a' if result['spearman'] is None else f"{result['spearman']:.4f}"
+        print(f"\n{result['cards']} ({result['cardCount']:,} cards, K={result['k']:,})")
+        print(f"  MECH_LIST_LIMIT={result['mechListLimit']}, POWER_CARD_LIMIT={result['powerCardLimit']}")
+        print(f"  Recall@K:   {result['recall']:.4f} ({result['missed']:,} missed, "
+              f"first at rank {result['firstMissedRank']})")
+        print(f"  Spearman:   {spearman_text}")
+        print(f"  Candidates: {result['candidates']:,} ({result['candidateShare']:.1%} of all pairs)")
+        print(f"  Time:       smart {result['smartSeconds']:.2f}s vs exact {result['exactSeconds']:.2f}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'generationDate': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'minScoreThreshold': MIN_SCORE_THRESHOLD,
+                'results': results,
+            }, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,42 @@
 """
 Yu-Gi-Oh Card Combination Ranking Calculator - OPTIMIZED VERSION
-Analyzes 2-card combinations with batch processing and progress saving
+Analyzes 2-card combinations with vectorized block scoring and streaming top-K selection
 """
 
+import argparse
+import hashlib
+import inspect
 import json
 import re
-from itertools import combinations
+import time
 from datetime import datetime
 from tqdm import tqdm
+import numpy as np
 import os
 
+import card_features
+from card_cache import cache_dir_for, load_cache, write_cache
+from card_features import FeatureExtractor
+from card_table import CardTable
+from instrumentation import RunReport, report_path
+from pair_engine import PairEngine
+from partner_index import PARTNER_COUNT, write_partner_index
+from parallel_scoring import select_top_pairs_parallel
+from pruning import PrunedScan
+from ranking_state import POOL_FACTOR, RankingState
+from rankings_export import write_rankings, print_export_stats
+from topk import TopK
+
 CARDS_FILE = "../public/cards.json"
 OUTPUT_FILE = "../public/rankings.json"
+PARTNERS_FILE = "../public/partners.bin"  # Top partners of every analyzed card
+CACHE_ROOT = "cache/cards"  # One memory-mappable CardTable per card file
+STATE_DIR = "cache/rankings_state"  # Previous run's table and candidate pool, for --incremental
 TOP_N = 10000  # Number of top combinations to export
-BATCH_SIZE = 100000  # Process combinations in batches
 MIN_SCORE_THRESHOLD = 100  # Only keep combinations above this score
+CARD_LIMIT = 3000  # Cards analyzed by default; --full analyzes every card
+# --full target: all ~13k cards (~85M pairs) exactly in under 10 minutes on 8 cores
+FULL_TARGET_SECONDS = 600
 
 # Scoring weights (can be customized)
 WEIGHTS = {
@@ -29,6 +51,21 @@ WEIGHTS = {
     'resourceGeneration': 1.0,
 }
 
+# Metric order used for the per-card score vectors
+METRICS = tuple(WEIGHTS.keys())
+
+# Phrases checked directly by the scorers, the synergy multiplier and the
+# smart ranker's index, on top of the CardScorer keyword lists
+TEXT_PHRASES = (
+    'draw 2', 'add 2', 'add up to 2',
+    'negate the activation', 'negate that effect',
+    'destroy all', 'destroy as many', 'banish all', 'return all',
+    'search', 'add', 'special summon', 'from your deck', 'from your hand',
+    'you can', '●', 'target', 'send', 'gain', 'lp', 'attach', 'material',
+    'draw', 'negate', 'destroy', 'banish', 'discard', 'fusion', 'synchro',
+    'xyz', 'link', 'ritual', 'token', 'counter', 'equip', 'continuous', 'field',
+)
+
 class CardScorer:
     """Scores individual cards and card combinations"""
     
@@ -59,33 +96,49 @@ class CardScorer:
         return count
     
     @staticmethod
-    def score_card_advantage(card):
+    def keywords():
+        """Every keyword in the scoring category lists"""
+        return [
+            keyword
+            for name, keywords in vars(CardScorer).items() if name.endswith('_KEYWORDS')
+            for keyword in keywords
+        ]
+    
+    @staticmethod
+    def features(card, features=None):
+        """Return precomputed features, or extract them from the card"""
+        if features is None:
+            features = extract_card_features(card)
+        return features
+    
+    @staticmethod
+    def score_card_advantage(card, features=None):
         """Score based on card advantage generation"""
-        desc = card.get('desc', '').lower()
+        features = CardScorer.features(card, features)
         score = 0
         
-        draw_count = CardScorer.count_keyword_occurrences(desc, CardScorer.DRAW_KEYWORDS)
+        draw_count = features.count_any(CardScorer.DRAW_KEYWORDS)
         score += min(draw_count * 20, 60)
         
-        search_count = CardScorer.count_keyword_occurrences(desc, CardScorer.SEARCH_KEYWORDS)
+        search_count = features.count_any(CardScorer.SEARCH_KEYWORDS)
         score += min(search_count * 15, 45)
         
-        if 'draw 2' in desc or 'add 2' in desc or 'add up to 2' in desc:
+        if features.has('draw 2') or features.has('add 2') or features.has('add up to 2'):
             score += 25
         
         return min(score, 100)
     
     @staticmethod
-    def score_board_presence(card):
+    def score_board_presence(card, features=None):
         """Score based on board presence capabilities"""
-        desc = card.get('desc', '').lower()
+        features = CardScorer.features(card, features)
         card_type = card.get('type', '')
         score = 0
         
-        ss_count = CardScorer.count_keyword_occurrences(desc, CardScorer.SPECIAL_SUMMON_KEYWORDS)
+        ss_count = features.count_any(CardScorer.SPECIAL_SUMMON_KEYWORDS)
         score += min(ss_count * 30, 60)
         
-        token_count = CardScorer.count_keyword_occurrences(desc, CardScorer.TOKEN_KEYWORDS)
+        token_count = features.count_any(CardScorer.TOKEN_KEYWORDS)
         score += min(token_count * 15, 30)
         
         if 'Continuous' in card_type or 'Field' in card_type:
@@ -94,29 +147,29 @@ class CardScorer:
         return min(score, 100)
     
     @staticmethod
-    def score_disruption(card):
+    def score_disruption(card, features=None):
         """Score based on disruption potential"""
-        desc = card.get('desc', '').lower()
+        features = CardScorer.features(card, features)
         card_type = card.get('type', '')
         score = 0
         
-        negate_count = CardScorer.count_keyword_occurrences(desc, CardScorer.NEGATE_KEYWORDS)
+        negate_count = features.count_any(CardScorer.NEGATE_KEYWORDS)
         if negate_count > 0:
-            if 'negate the activation' in desc or 'negate that effect' in desc:
+            if features.has('negate the activation') or features.has('negate that effect'):
                 score += 40
             else:
                 score += 25
         
-        destroy_count = CardScorer.count_keyword_occurrences(desc, CardScorer.DESTROY_KEYWORDS)
-        if 'destroy all' in desc or 'destroy as many' in desc:
+        destroy_count = features.count_any(CardScorer.DESTROY_KEYWORDS)
+        if features.has('destroy all') or features.has('destroy as many'):
             score += 35
         else:
             score += min(destroy_count * 20, 40)
         
-        banish_count = CardScorer.count_keyword_occurrences(desc, CardScorer.BANISH_KEYWORDS)
+        banish_count = features.count_any(CardScorer.BANISH_KEYWORDS)
         score += min(banish_count * 30, 45)
         
-        discard_count = CardScorer.count_keyword_occurrences(desc, CardScorer.DISCARD_KEYWORDS)
+        discard_count = features.count_any(CardScorer.DISCARD_KEYWORDS)
         score += min(discard_count * 25, 40)
         
         if 'Counter' in card_type and 'Trap' in card_type:
@@ -125,15 +178,15 @@ class CardScorer:
         return min(score, 100)
     
     @staticmethod
-    def score_protection(card):
+    def score_protection(card, features=None):
         """Score based on protection and sustainability"""
-        desc = card.get('desc', '').lower()
+        features = CardScorer.features(card, features)
         score = 0
         
-        protection_count = CardScorer.count_keyword_occurrences(desc, CardScorer.PROTECTION_KEYWORDS)
+        protection_count = features.count_any(CardScorer.PROTECTION_KEYWORDS)
         score += min(protection_count * 20, 40)
         
-        recursion_count = CardScorer.count_keyword_occurrences(desc, CardScorer.RECURSION_KEYWORDS)
+        recursion_count = features.count_any(CardScorer.RECURSION_KEYWORDS)
         score += min(recursion_count * 25, 50)
         
         if 'Quick-Play' in card.get('type', ''):
@@ -142,27 +195,27 @@ class CardScorer:
         return min(score, 100)
     
     @staticmethod
-    def score_combo_extender(card):
+    def score_combo_extender(card, features=None):
         """Score based on combo extension potential"""
-        desc = card.get('desc', '').lower()
+        features = CardScorer.features(card, features)
         score = 0
         
-        if 'search' in desc or 'add' in desc:
+        if features.has('search') or features.has('add'):
             score += 25
         
-        if 'special summon' in desc:
-            if 'from your deck' in desc:
+        if features.has('special summon'):
+            if features.has('from your deck'):
                 score += 35
-            elif 'from your hand' in desc:
+            elif features.has('from your hand'):
                 score += 30
         
-        if desc.count('you can') >= 2 or desc.count('●') >= 2:
+        if features.count('you can') >= 2 or features.count('●') >= 2:
             score += 20
         
         return min(score, 100)
     
     @staticmethod
-    def score_spell_trap_synergy(card):
+    def score_spell_trap_synergy(card, features=None):
         """Score spell/trap cards for synergy potential"""
         card_type = card.get('type', '')
         score = 0
@@ -181,24 +234,24 @@ class CardScorer:
         return min(score, 100)
     
     @staticmethod
-    def score_extra_deck_access(card):
+    def score_extra_deck_access(card, features=None):
         """Score based on Extra Deck summoning capability"""
-        desc = card.get('desc', '').lower()
+        features = CardScorer.features(card, features)
         score = 0
         
-        fusion_count = CardScorer.count_keyword_occurrences(desc, CardScorer.FUSION_KEYWORDS)
+        fusion_count = features.count_any(CardScorer.FUSION_KEYWORDS)
         if fusion_count > 0:
             score += 30
         
-        synchro_count = CardScorer.count_keyword_occurrences(desc, CardScorer.SYNCHRO_KEYWORDS)
+        synchro_count = features.count_any(CardScorer.SYNCHRO_KEYWORDS)
         if synchro_count > 0:
             score += 30
         
-        xyz_count = CardScorer.count_keyword_occurrences(desc, CardScorer.XYZ_KEYWORDS)
+        xyz_count = features.count_any(CardScorer.XYZ_KEYWORDS)
         if xyz_count > 0:
             score += 30
         
-        link_count = CardScorer.count_keyword_occurrences(desc, CardScorer.LINK_KEYWORDS)
+        link_count = features.count_any(CardScorer.LINK_KEYWORDS)
         if link_count > 0:
             score += 30
         
@@ -209,98 +262,116 @@ class CardScorer:
         return min(score, 100)
     
     @staticmethod
-    def score_removal(card):
+    def score_removal(card, features=None):
         """Score removal capabilities"""
-        desc = card.get('desc', '').lower()
+        features = CardScorer.features(card, features)
         score = 0
         
-        if 'destroy all' in desc or 'banish all' in desc or 'return all' in desc:
+        if features.has('destroy all') or features.has('banish all') or features.has('return all'):
             score += 50
         
-        destroy_count = CardScorer.count_keyword_occurrences(desc, CardScorer.DESTROY_KEYWORDS)
-        banish_count = CardScorer.count_keyword_occurrences(desc, CardScorer.BANISH_KEYWORDS)
+        destroy_count = features.count_any(CardScorer.DESTROY_KEYWORDS)
+        banish_count = features.count_any(CardScorer.BANISH_KEYWORDS)
         score += min((destroy_count + banish_count) * 20, 40)
         
-        if 'destroy' in desc and 'target' not in desc:
+        if features.has('destroy') and not features.has('target'):
             score += 15
         
-        if 'return' in desc or 'banish' in desc or 'send' in desc:
+        if features.has('return') or features.has('banish') or features.has('send'):
             score += 15
         
         return min(score, 100)
     
     @staticmethod
-    def score_resource_generation(card):
+    def score_resource_generation(card, features=None):
         """Score resource generation"""
-        desc = card.get('desc', '').lower()
+        features = CardScorer.features(card, features)
         score = 0
         
-        if 'gain' in desc and 'lp' in desc:
+        if features.has('gain') and features.has('lp'):
             score += 10
         
-        counter_count = CardScorer.count_keyword_occurrences(desc, CardScorer.COUNTER_KEYWORDS)
+        counter_count = features.count_any(CardScorer.COUNTER_KEYWORDS)
         score += min(counter_count * 20, 40)
         
-        if 'attach' in desc or 'material' in desc:
+        if features.has('attach') or features.has('material'):
             score += 25
         
         return min(score, 100)
     
     @staticmethod
-    def calculate_card_scores(card):
+    def calculate_card_scores(card, features=None):
         """Calculate all scores for a single card"""
+        features = CardScorer.features(card, features)
         return {
-            'cardAdvantage': CardScorer.score_card_advantage(card),
-            'boardPresence': CardScorer.score_board_presence(card),
-            'disruption': CardScorer.score_disruption(card),
-            'protection': CardScorer.score_protection(card),
-            'comboExtender': CardScorer.score_combo_extender(card),
-            'spellTrapSynergy': CardScorer.score_spell_trap_synergy(card),
-            'extraDeckAccess': CardScorer.score_extra_deck_access(card),
-            'removal': CardScorer.score_removal(card),
-            'resourceGeneration': CardScorer.score_resource_generation(card),
+            'cardAdvantage': CardScorer.score_card_advantage(card, features),
+            'boardPresence': CardScorer.score_board_presence(card, features),
+            'disruption': CardScorer.score_disruption(card, features),
+            'protection': CardScorer.score_protection(card, features),
+            'comboExtender': CardScorer.score_combo_extender(card, features),
+            'spellTrapSynergy': CardScorer.score_spell_trap_synergy(card, features),
+            'extraDeckAccess': CardScorer.score_extra_deck_access(card, features),
+            'removal': CardScorer.score_removal(card, features),
+            'resourceGeneration': CardScorer.score_resource_generation(card, features),
         }
+    
+    @staticmethod
+    def score_vector(card, features=None):
+        """Calculate all scores for a single card as a tuple in METRICS order"""
+        scores = CardScorer.calculate_card_scores(card, features)
+        return tuple(scores[metric] for metric in METRICS)
 
-def calculate_synergy_multiplier(card1, card2):
-    """Calculate synergy multiplier between two cards"""
+FEATURE_EXTRACTOR = FeatureExtractor(CardScorer.keywords() + list(TEXT_PHRASES))
+
+def extract_card_features(card):
+    """Extract every keyword count used for scoring from a card's description in one pass"""
+    return FEATURE_EXTRACTOR.extract(card.get('desc', ''))
+
+def synergy_features(card, features=None):
+    """Extract the per-card flags that calculate_synergy_multiplier depends on"""
+    features = CardScorer.features(card, features)
+    card_type = card.get('type', '')
+    
+    return (
+        card.get('archetype'),
+        'Monster' in card_type,
+        'Equip' in card_type,
+        'Quick-Play' in card_type or 'Trap' in card_type,
+        features.has('search') or features.has('add'),
+        features.has('special summon'),
+    )
+
+def synergy_multiplier_from_features(features1, features2):
+    """Calculate synergy multiplier from two synergy_features tuples"""
+    arch1, monster1, equip1, reactive1, search1, summon1 = features1
+    arch2, monster2, equip2, reactive2, search2, summon2 = features2
     multiplier = 1.0
     
-    arch1 = card1.get('archetype')
-    arch2 = card2.get('archetype')
     if arch1 and arch2 and arch1 == arch2:
         multiplier *= 1.5
     
-    type1 = card1.get('type', '')
-    type2 = card2.get('type', '')
-    
-    if ('Monster' in type1 and 'Equip' in type2) or ('Monster' in type2 and 'Equip' in type1):
+    if (monster1 and equip2) or (monster2 and equip1):
         multiplier *= 1.2
     
-    if ('Monster' in type1 and ('Quick-Play' in type2 or 'Trap' in type2)) or \
-       ('Monster' in type2 and ('Quick-Play' in type1 or 'Trap' in type1)):
+    if (monster1 and reactive2) or (monster2 and reactive1):
         multiplier *= 1.15
     
-    desc1 = card1.get('desc', '').lower()
-    desc2 = card2.get('desc', '').lower()
-    
-    if ('search' in desc1 or 'add' in desc1) and 'special summon' in desc2:
-        multiplier *= 1.3
-    elif ('search' in desc2 or 'add' in desc2) and 'special summon' in desc1:
+    if (search1 and summon2) or (search2 and summon1):
         multiplier *= 1.3
     
     return min(multiplier, 2.0)
 
-def score_combination(card1, card2):
-    """Score a 2-card combination"""
-    scores1 = CardScorer.calculate_card_scores(card1)
-    scores2 = CardScorer.calculate_card_scores(card2)
-    
+def calculate_synergy_multiplier(card1, card2):
+    """Calculate synergy multiplier between two cards"""
+    return synergy_multiplier_from_features(synergy_features(card1), synergy_features(card2))
+
+def combine_card_vectors(vector1, vector2, synergy_multiplier, weights=WEIGHTS):
+    """Combine two per-card score vectors into the score data for the pair"""
     combined_scores = {}
-    for metric in WEIGHTS.keys():
-        combined_scores[metric] = (scores1[metric] + scores2[metric]) / 2
+    for metric, score1, score2 in zip(METRICS, vector1, vector2):
+        combined_scores[metric] = (score1 + score2) / 2
     
-    weighted_total = sum(combined_scores[metric] * WEIGHTS[metric] for metric in WEIGHTS.keys())
-    synergy_multiplier = calculate_synergy_multiplier(card1, card2)
+    weighted_total = sum(combined_scores[metric] * weights[metric] for metric in METRICS)
     final_score = weighted_total * synergy_multiplier
     
     return {
@@ -309,6 +380,132 @@ def score_combination(card1, card2):
         'totalScore': round(final_score, 2)
     }
 
+def score_combination(card1, card2):
+    """Score a 2-card combination"""
+    return combine_card_vectors(
+        CardScorer.score_vector(card1),
+        CardScorer.score_vector(card2),
+        calculate_synergy_multiplier(card1, card2)
+    )
+
+def build_card_table(cards, features=None):
+    """
+    Score every card once and pack the cards into a CardTable.
+    features: optional per-card CardFeatures, extracted on demand if omitted
+    """
+    metrics = []
+    flags = []
+    for idx, card in enumerate(cards):
+        card_features = extract_card_features(card) if features is None else features[idx]
+        metrics.append(CardScorer.score_vector(card, card_features))
+        flags.append(synergy_features(card, card_features)[1:])
+    return CardTable.from_cards(cards, metrics, flags)
+
+def build_pair_engine(table, weights=WEIGHTS):
+    """Build a vectorized PairEngine over a CardTable"""
+    return PairEngine(table.metrics, table.codes['archetype'], table.flags,
+                      [weights[metric] for metric in METRICS])
+
+def score_table_pair(table, idx1, idx2, weights=WEIGHTS):
+    """Score the pair of cards at the given table indices"""
+    return combine_card_vectors(
+        table.vector(idx1),
+        table.vector(idx2),
+        synergy_multiplier_from_features(table.synergy_features(idx1), table.synergy_features(idx2)),
+        weights
+    )
+
+def select_top_pairs(engine, tie_keys, top_n, min_score, workers=1, prune=True):
+    """
+    Stream every pair of the upper triangle through a bounded TopK.
+    Returns the (score, idx1, idx2) winners, best first, and the number
+    of pairs that reached min_score. Ties are broken by tie_keys (card
+    ids). With workers > 1 the triangle is sharded across a process
+    pool; with prune, pairs that provably cannot reach min_score or the
+    running top-K are skipped. Either way the result is identical.
+    """
+    # Block scores are unrounded, so keep every pair whose rounded total can
+    # still reach min_score; build_combinations makes the exact final call
+    candidate_floor = min_score - 0.005
+    
+    # Score bounds need non-negative weights and metrics
+    prune = prune and engine.nonnegative()
+    
+    total_pairs = len(engine) * (len(engine) - 1) // 2
+    start = time.perf_counter()
+    
+    if workers > 1:
+        winners, scored_count = select_top_pairs_parallel(engine, tie_keys, top_n, candidate_floor, workers, prune)
+    else:
+        top = TopK(top_n, tie_keys)
+        scored_count = 0
+        
+        with tqdm(total=total_pairs, desc="Processing", unit="pairs", unit_scale=True) as pbar:
+            if prune:
+                scored_count, scored_pairs = PrunedScan(engine).run(top, candidate_floor, progress=pbar)
+            else:
+                for row_start, col_start, scores, pair_count in engine.iter_upper_blocks():
+                    rows, cols = np.nonzero(scores >= candidate_floor)
+                    scored_count += len(rows)
+                    top.push_block(scores[rows, cols], rows + row_start, cols + col_start)
+                    pbar.update(pair_count)
+        
+        if prune:
+            print(f"✓ Pruning scored {scored_pairs:,} of {total_pairs:,} pairs")
+        winners = top.results()
+    
+    elapsed = time.perf_counter() - start
+    print(f"✓ Covered {total_pairs:,} pairs in {elapsed:.1f}s ({total_pairs / max(elapsed, 1e-9):,.0f} pairs/s)")
+    
+    return winners, scored_count
+
+def ranking_config():
+    """Everything persisted pair scores depend on besides the cards themselves"""
+    return {
+        'fingerprint': scorer_fingerprint(),
+        'weights': WEIGHTS,
+        'minScore': MIN_SCORE_THRESHOLD,
+    }
+
+def update_ranking_state(table, engine, state_dir=None):
+    """
+    Carry the previous run's RankingState over to table, scoring only the
+    pairs that involve new or changed cards. Returns None when there is no
+    state, or it was computed with other weights or scoring code.
+    """
+    state = RankingState.load(state_dir or STATE_DIR)
+    if state is None or state.config != ranking_config():
+        return None
+    
+    # Same candidate floor as select_top_pairs
+    candidate_floor = MIN_SCORE_THRESHOLD - 0.005
+    return state.update(build_pair_engine(state.table), table, engine, POOL_FACTOR * TOP_N, candidate_floor)
+
+def build_combinations(table, winners, min_score, weights=WEIGHTS):
+    """
+    Build full, ranked ranking entries for the final (score, idx1, idx2)
+    winners only. The winners carry their table indices, so no card
+    lookups are needed and explanations are generated in one batch.
+    """
+    kept = []
+    for _, idx1, idx2 in winners:
+        score_data = score_table_pair(table, idx1, idx2, weights)
+        if score_data['totalScore'] >= min_score:
+            kept.append((idx1, idx2, score_data))
+    
+    explanations = generate_explanations(table, [(idx1, idx2) for idx1, idx2, _ in kept])
+    
+    entries = []
+    for rank, ((idx1, idx2, score_data), explanation) in enumerate(zip(kept, explanations), 1):
+        entries.append({
+            'card1': table.summary(idx1),
+            'card2': table.summary(idx2),
+            **score_data,
+            'rank': rank,
+            'explanation': explanation
+        })
+    return entries
+
 def generate_explanation(card1, card2, score_data):
     """Generate explanation for why cards synergize"""
     explanations = []
@@ -329,130 +526,222 @@ def generate_explanation(card1, card2, score_data):
     
     return ". ".join(explanations) + "."
 
-def load_cards():
+def generate_explanations(table, pairs):
+    """
+    Generate explanations for many (idx1, idx2) table pairs at once,
+    straight from the precomputed metric vectors. Produces the same text
+    as generate_explanation for each pair.
+    """
+    if not pairs:
+        return []
+    
+    idx1 = np.array([pair[0] for pair in pairs], dtype=np.intp)
+    idx2 = np.array([pair[1] for pair in pairs], dtype=np.intp)
+    
+    combined = (table.metrics[idx1] + table.metrics[idx2]) / 2
+    # Stable sort keeps METRICS order between equal scores, like sorted() does
+    top_metrics = np.argsort(-combined, axis=1, kind='stable')[:, :2]
+    
+    archetypes = table.codes['archetype']
+    same_archetype = (archetypes[idx1] == archetypes[idx2]) & (archetypes[idx1] >= 0)
+    metric_names = [metric.replace('_', ' ').title() for metric in METRICS]
+    
+    results = []
+    for k in range(len(pairs)):
+        explanations = []
+        
+        if same_archetype[k]:
+            explanations.append(f"Both cards belong to the {table.value('archetype', idx1[k])} archetype")
+        
+        for m in top_metrics[k]:
+            score = combined[k, m]
+            if score >= 50:
+                explanations.append(f"High {metric_names[m]} synergy (score: {score:.0f})")
+        
+        if not explanations:
+            explanations.append("Cards provide complementary effects")
+        
+        results.append(". ".join(explanations) + ".")
+    
+    return results
+
+def load_cards(cards_file=None):
     """Load cards from JSON file"""
-    print(f"Loading cards from {CARDS_FILE}...")
+    cards_file = cards_file or CARDS_FILE
+    print(f"Loading cards from {cards_file}...")
     try:
-        with open(CARDS_FILE, 'r', encoding='utf-8') as f:
+        with open(cards_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
         return data['cards']
     except Exception as e:
         print(f"Error loading cards: {e}")
         return None
 
-def main():
+def scorer_fingerprint():
+    """Hash of the card scoring code, so cached metric vectors go stale when it changes"""
+    source = "".join([
+        inspect.getsource(CardScorer),
+        inspect.getsource(synergy_features),
+        inspect.getsource(card_features),
+        repr(TEXT_PHRASES),
+    ])
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+
+def write_card_cache(cards, cards_file=None, cache_dir=None):
+    """Score parsed cards once and store them as the binary card cache for cards_file"""
+    cards_file = cards_file or CARDS_FILE
+    table = build_card_table(cards)
+    write_cache(table, cache_dir or cache_dir_for(cards_file, CACHE_ROOT), cards_file, scorer_fingerprint())
+    return table
+
+def load_card_table(cards_file=None, cache_dir=None, run=None):
+    """
+    Load every card as a CardTable memory-mapped from the binary cache.
+    The cache is rebuilt from cards_file when it is missing or stale.
+    run: optional RunReport that times the cache read, JSON parse and card scoring
+    """
+    cards_file = cards_file or CARDS_FILE
+    cache_dir = cache_dir or cache_dir_for(cards_file, CACHE_ROOT)
+    run = run or RunReport('load_card_table')
+    
+    with run.stage('cache_load'):
+        table = load_cache(cache_dir, cards_file, scorer_fingerprint())
+    if table is not None:
+        print(f"Loaded card cache from {cache_dir}")
+        return table
+    
+    with run.stage('json_load'):
+        cards = load_cards(cards_file)
+    if not cards:
+        return None
+    
+    print(f"Building card cache in {cache_dir}...")
+    with run.stage('card_scoring'):
+        write_card_cache(cards, cards_file, cache_dir)
+        table = load_cache(cache_dir, cards_file, scorer_fingerprint())
+    return table
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Rank Yu-Gi-Oh 2-card combinations")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of processes used to score pairs (default: 1)")
+    parser.add_argument('--full', action='store_true',
+                        help=f"analyze every card instead of the first {CARD_LIMIT:,}")
+    parser.add_argument('--no-prune', dest='prune', action='store_false',
+                        help="score every pair instead of skipping pairs by score bounds")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only score pairs involving cards that changed since the last run")
+    parser.add_argument('--partners', type=int, nargs='?', const=PARTNER_COUNT, default=0, metavar='M',
+                        help=f"also write the best M partners of every card to {PARTNERS_FILE} "
+                             f"(M defaults to {PARTNER_COUNT})")
+    parser.add_argument('--compact', action='store_true',
+                        help="write compact rankings.json (no indentation, each card stored once)")
+    parser.add_argument('--profile', metavar='STAGE', default=None,
+                        help="profile one stage with cProfile (e.g. pair_scoring, explanations, export)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main execution function"""
+    args = parse_args(argv)
+    run = RunReport('calculate_rankings', args.profile)
+    
     print("=" * 60)
     print("Yu-Gi-Oh Card Combination Ranking Calculator (OPTIMIZED)")
     print("=" * 60)
     
-    cards = load_cards()
-    if not cards:
+    table = load_card_table(CARDS_FILE, run=run)
+    if table is None:
         print("Failed to load cards. Please run fetch_cards.py first.")
         return
     
-    print(f"✓ Loaded {len(cards)} cards")
+    print(f"✓ Loaded {len(table)} cards")
     
     # Filter out cards without descriptions
-    cards = [c for c in cards if c.get('desc')]
-    print(f"✓ Filtered to {len(cards)} cards with descriptions")
+    table = table.take(np.flatnonzero(table.text['desc'].lengths() > 0))
+    print(f"✓ Filtered to {len(table)} cards with descriptions")
     
-    # OPTIMIZATION: Limit to first 3000 cards for faster processing
-    # You can remove this limit or adjust it
-    if len(cards) > 3000:
-        print(f"\n⚠️  OPTIMIZATION: Using first 3000 cards for faster processing")
-        print(f"   To analyze all cards, remove the limit in the script")
-        cards = cards[:3000]
+    # OPTIMIZATION: Limit to the first CARD_LIMIT cards unless --full
+    if len(table) > CARD_LIMIT and not args.full:
+        print(f"\n⚠️  OPTIMIZATION: Using first {CARD_LIMIT:,} cards for faster processing")
+        print(f"   To analyze all cards, run with --full")
+        table = table.take(np.arange(CARD_LIMIT))
     
-    total_combinations = len(cards) * (len(cards) - 1) // 2
+    total_combinations = len(table) * (len(table) - 1) // 2
     print(f"\nTotal combinations to analyze: {total_combinations:,}")
     
-    # Score combinations in batches
-    print(f"\nScoring combinations (batch size: {BATCH_SIZE:,})...")
-    print(f"Minimum score threshold: {MIN_SCORE_THRESHOLD}")
-    
-    ranked_combinations = []
-    batch_count = 0
-    
-    combo_iter = combinations(cards, 2)
-    
-    with tqdm(total=total_combinations, desc="Processing") as pbar:
-        batch = []
-        for card1, card2 in combo_iter:
-            score_data = score_combination(card1, card2)
-            
-            # Only keep combinations above threshold
-            if score_data['totalScore'] >= MIN_SCORE_THRESHOLD:
-                batch.append({
-                    'card1': {
-                        'id': card1['id'],
-                        'name': card1['name'],
-                        'type': card1['type'],
-                        'image_url_small': card1.get('image_url_small', '')
-                    },
-                    'card2': {
-                        'id': card2['id'],
-                        'name': card2['name'],
-                        'type': card2['type'],
-                        'image_url_small': card2.get('image_url_small', '')
-                    },
-                    **score_data
-                })
-            
-            pbar.update(1)
-            
-            # Process batch
-            if len(batch) >= BATCH_SIZE:
-                ranked_combinations.extend(batch)
-                batch = []
-                batch_count += 1
-                
-                # Sort and keep only top N to save memory
-                ranked_combinations.sort(key=lambda x: x['totalScore'], reverse=True)
-                ranked_combinations = ranked_combinations[:TOP_N * 2]  # Keep 2x for safety
-        
-        # Add remaining batch
-        if batch:
-            ranked_combinations.extend(batch)
-    
-    print(f"\n✓ Found {len(ranked_combinations):,} combinations above threshold")
-    
-    # Final sort and take top N
+    engine = build_pair_engine(table)
+    state = None
+    
+    if args.incremental:
+        print(f"\nUpdating previous rankings from {STATE_DIR}...")
+        with run.stage('incremental_update'):
+            state = update_ranking_state(table, engine)
+        if state is None:
+            print("No compatible previous run found, scoring all combinations")
+        elif not state.certified(TOP_N):
+            print("Candidate pool can no longer prove the top rankings, scoring all combinations")
+            state = None
+    
+    if state is None:
+        # Score combinations block by block, keeping a candidate pool of the
+        # best pairs for later incremental runs
+        pool_size = POOL_FACTOR * TOP_N
+        print(f"\nScoring combinations (keeping top {pool_size:,} candidates)...")
+        print(f"Minimum score threshold: {MIN_SCORE_THRESHOLD}")
+        
+        workers = max(1, args.workers)
+        with run.stage('pair_scoring', pairs=total_combinations) as stage:
+            pool, scored_count = select_top_pairs(engine, table.ids, pool_size, MIN_SCORE_THRESHOLD, workers, args.prune)
+        elapsed = stage['wallSeconds']
+        
+        if args.full and elapsed > FULL_TARGET_SECONDS:
+            print(f"⚠️  Full run took {elapsed / 60:.1f} min, over the {FULL_TARGET_SECONDS // 60} min target")
+        state = RankingState.from_pool(table, pool, pool_size, scored_count, ranking_config())
+    
+    winners = state.pool[:TOP_N]
+    scored_count = state.scored_count
+    print(f"\n✓ Found {scored_count:,} combinations above threshold")
+    
+    # Build ranked, explained entries for the winners only
     print(f"\nRanking top {TOP_N:,} combinations...")
-    ranked_combinations.sort(key=lambda x: x['totalScore'], reverse=True)
-    top_combinations = ranked_combinations[:TOP_N]
-    
-    # Add rank and explanation
-    print("Generating explanations...")
-    for i, combo in enumerate(tqdm(top_combinations, desc="Explanations"), 1):
-        combo['rank'] = i
-        card1_full = next(c for c in cards if c['id'] == combo['card1']['id'])
-        card2_full = next(c for c in cards if c['id'] == combo['card2']['id'])
-        combo['explanation'] = generate_explanation(card1_full, card2_full, combo)
+    with run.stage('explanations'):
+        top_combinations = build_combinations(table, winners, MIN_SCORE_THRESHOLD)
     
     # Export to JSON
     print(f"\nExporting to {OUTPUT_FILE}...")
     output_data = {
         'metadata': {
             'totalCombinations': total_combinations,
-            'scoredCombinations': len(ranked_combinations),
+            'scoredCombinations': scored_count,
             'topN': TOP_N,
             'generationDate': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'weights': WEIGHTS,
-            'cardsAnalyzed': len(cards),
+            'cardsAnalyzed': len(table),
             'minScoreThreshold': MIN_SCORE_THRESHOLD
         },
         'rankings': top_combinations
     }
     
     try:
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=2)
+        with run.stage('export'):
+            export_stats = write_rankings(output_data, OUTPUT_FILE, args.compact)
         
         print(f"✓ Successfully exported rankings")
+        print_export_stats(export_stats)
+        
+        with run.stage('save_state'):
+            state.save(STATE_DIR)
+        print(f"✓ Saved ranking state to {STATE_DIR}")
         
-        file_size = os.path.getsize(OUTPUT_FILE) / (1024 * 1024)
-        print(f"✓ File size: {file_size:.2f} MB")
+        partners_bytes = None
+        if args.partners > 0:
+            print(f"\nIndexing top {args.partners} partners of every card...")
+            with run.stage('partner_index') as stage:
+                partners_bytes, stage['pairs'] = write_partner_index(engine, table.ids, PARTNERS_FILE, args.partners,
+                                                                     max(1, args.workers), args.prune)
+            print(f"✓ Wrote partner index to {PARTNERS_FILE} ({partners_bytes / (1024 * 1024):.2f} MB, "
+                  f"{stage['pairs']:,} pairs scored)")
         
         # Print top 5
         print("\n" + "=" * 60)
@@ -464,6 +753,20 @@ def main():
             print(f"  Synergy: {combo['synergyMultiplier']:.2f}x")
             print(f"  {combo['explanation']}")
         
+        run.info.update({
+            'cardsAnalyzed': len(table),
+            'totalCombinations': total_combinations,
+            'scoredCombinations': scored_count,
+            'export': export_stats,
+            'partnersPerCard': args.partners,
+            'partnerIndexBytes': partners_bytes,
+            'workers': max(1, args.workers),
+            'prune': args.prune,
+            'incremental': args.incremental,
+        })
+        run.print_summary()
+        run.write(report_path(OUTPUT_FILE))
+        
         print("\n" + "=" * 60)
         print("✓ COMPLETE!")
         print("=" * 60)
@@ -3,16 +3,17 @@ Yu-Gi-Oh Card Combination Ranking Calculator - QUICK TEST VERSION
 Analyzes only 500 cards for fast testing (~30 seconds)
 """
 
-import json
-from itertools import combinations
+import argparse
 from datetime import datetime
-from tqdm import tqdm
 import os
 import sys
 
 # Import the scoring functions from the main script
 sys.path.insert(0, os.path.dirname(__file__))
-from calculate_rankings import CardScorer, calculate_synergy_multiplier, score_combination, generate_explanation, WEIGHTS
+import numpy as np
+from calculate_rankings import load_card_table, build_pair_engine, select_top_pairs, build_combinations, WEIGHTS
+from instrumentation import RunReport, report_path
+from rankings_export import write_rankings, print_export_stats
 
 CARDS_FILE = "../public/cards.json"
 OUTPUT_FILE = "../public/rankings.json"
@@ -20,19 +21,20 @@ TOP_N = 1000  # Export top 1000 for quick testing
 CARD_LIMIT = 500  # Only analyze first 500 cards
 MIN_SCORE_THRESHOLD = 100
 
-def load_cards():
-    """Load cards from JSON file"""
-    print(f"Loading cards from {CARDS_FILE}...")
-    try:
-        with open(CARDS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data['cards']
-    except Exception as e:
-        print(f"Error loading cards: {e}")
-        return None
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Rank combinations of the first cards only, for fast testing")
+    parser.add_argument('--compact', action='store_true',
+                        help="write compact rankings.json (no indentation, each card stored once)")
+    parser.add_argument('--profile', metavar='STAGE', default=None,
+                        help="profile one stage with cProfile (e.g. pair_scoring, explanations, export)")
+    return parser.parse_args(argv)
 
-def main():
+def main(argv=None):
     """Main execution function"""
+    args = parse_args(argv)
+    run = RunReport('calculate_rankings_quick', args.profile)
+    
     print("=" * 60)
     print("Yu-Gi-Oh Combo Rankings - QUICK TEST VERSION")
     print("=" * 60)
@@ -40,80 +42,59 @@ def main():
     print(f"⚡ This should complete in ~30 seconds")
     print("=" * 60)
     
-    cards = load_cards()
-    if not cards:
+    table = load_card_table(CARDS_FILE, run=run)
+    if table is None:
         print("Failed to load cards. Please run fetch_cards.py first.")
         return
     
-    print(f"✓ Loaded {len(cards)} cards")
+    print(f"✓ Loaded {len(table)} cards")
     
     # Filter and limit
-    cards = [c for c in cards if c.get('desc')]
-    cards = cards[:CARD_LIMIT]
-    print(f"✓ Using {len(cards)} cards for analysis")
+    with_desc = np.flatnonzero(table.text['desc'].lengths() > 0)
+    table = table.take(with_desc[:CARD_LIMIT])
+    print(f"✓ Using {len(table)} cards for analysis")
     
-    total_combinations = len(cards) * (len(cards) - 1) // 2
+    total_combinations = len(table) * (len(table) - 1) // 2
     print(f"\nTotal combinations: {total_combinations:,}")
     
-    # Score all combinations
+    # Stream all pairs through a bounded top-K
     print(f"\nScoring combinations...")
-    ranked_combinations = []
-    
-    for card1, card2 in tqdm(combinations(cards, 2), total=total_combinations):
-        score_data = score_combination(card1, card2)
-        
-        if score_data['totalScore'] >= MIN_SCORE_THRESHOLD:
-            ranked_combinations.append({
-                'card1': {
-                    'id': card1['id'],
-                    'name': card1['name'],
-                    'type': card1['type'],
-                    'image_url_small': card1.get('image_url_small', '')
-                },
-                'card2': {
-                    'id': card2['id'],
-                    'name': card2['name'],
-                    'type': card2['type'],
-                    'image_url_small': card2.get('image_url_small', '')
-                },
-                **score_data
-            })
-    
-    print(f"\n✓ Found {len(ranked_combinations):,} combinations above threshold")
+    with run.stage('pair_scoring', pairs=total_combinations):
+        winners, scored_count = select_top_pairs(build_pair_engine(table), table.ids, TOP_N, MIN_SCORE_THRESHOLD)
     
-    # Sort and take top N
-    ranked_combinations.sort(key=lambda x: x['totalScore'], reverse=True)
-    top_combinations = ranked_combinations[:TOP_N]
+    print(f"\n✓ Found {scored_count:,} combinations above threshold")
     
-    # Add rank and explanation
-    print("Generating explanations...")
-    for i, combo in enumerate(top_combinations, 1):
-        combo['rank'] = i
-        card1_full = next(c for c in cards if c['id'] == combo['card1']['id'])
-        card2_full = next(c for c in cards if c['id'] == combo['card2']['id'])
-        combo['explanation'] = generate_explanation(card1_full, card2_full, combo)
+    with run.stage('explanations'):
+        top_combinations = build_combinations(table, winners, MIN_SCORE_THRESHOLD)
     
     # Export
     print(f"\nExporting to {OUTPUT_FILE}...")
     output_data = {
         'metadata': {
             'totalCombinations': total_combinations,
-            'scoredCombinations': len(ranked_combinations),
+            'scoredCombinations': scored_count,
             'topN': len(top_combinations),
             'generationDate': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'weights': WEIGHTS,
-            'cardsAnalyzed': len(cards),
+            'cardsAnalyzed': len(table),
             'minScoreThreshold': MIN_SCORE_THRESHOLD,
             'testVersion': True
         },
         'rankings': top_combinations
     }
     
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, ensure_ascii=False, indent=2)
+    with run.stage('export'):
+        export_stats = write_rankings(output_data, OUTPUT_FILE, args.compact)
+    print_export_stats(export_stats)
     
-    file_size = os.path.getsize(OUTPUT_FILE) / (1024 * 1024)
-    print(f"✓ File size: {file_size:.2f} MB")
+    run.info.update({
+        'cardsAnalyzed': len(table),
+        'totalCombinations': total_combinations,
+        'scoredCombinations': scored_count,
+        'export': export_stats,
+    })
+    run.print_summary()
+    run.write(report_path(OUTPUT_FILE))
     
     # Print top 5
     print("\n" + "=" * 60)
@@ -4,22 +4,28 @@ Uses Inverted Index and Heuristics to analyze ALL cards efficiently.
 This effectively reduces the search space from ~72 million to ~5 million comparisons.
 """
 
-import json
-from itertools import combinations
+import argparse
 from datetime import datetime
 from tqdm import tqdm
 import os
 import sys
 from collections import defaultdict
+import numpy as np
 
-# Import scoring logic (assuming it's in the same folder)
-# We'll copy minimal needed logic to make this standalone and faster
-# or import if possible. To be safe/standalone, I'll allow it to run on its own.
+# Import the scoring functions from the main script
+sys.path.insert(0, os.path.dirname(__file__))
+from calculate_rankings import load_card_table, build_pair_engine, build_combinations, FEATURE_EXTRACTOR, WEIGHTS
+from pair_engine import BLOCK_PAIRS
+from instrumentation import RunReport, report_path
+from rankings_export import write_rankings, print_export_stats
+from topk import TopK
 
 CARDS_FILE = "../public/cards.json"
 OUTPUT_FILE = "../public/rankings.json"
 TOP_N = 10000
 MIN_SCORE_THRESHOLD = 100
+MECH_LIST_LIMIT = 500  # Skip mechanics shared by at least this many cards (None: keep all)
+POWER_CARD_LIMIT = 1000  # Power cards compared against every other card
 
 # Optimization: Keywords to build index on
 # Only pairs sharing these properties will be heavily scored
@@ -31,197 +37,221 @@ SYNERGY_KEYS = [
     'token', 'counter', 'equip', 'continuous', 'field'
 ]
 
-def load_cards():
-    print(f"Loading cards from {CARDS_FILE}...")
-    try:
-        with open(CARDS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data['cards']
-    except Exception as e:
-        print(f"Error loading cards: {e}")
-        return None
-
-def build_inverted_index(cards):
+def build_inverted_index(table, features):
     """
-    Builds a map of {keyword: [card_indices]}
+    Builds a map of {keyword: sorted card index array}
     This allows us to quickly find potential partners.
+    features: per-card CardFeatures of the table's descriptions
     """
     print("Building smart search index...")
     index = defaultdict(list)
     generic_power_cards = []
     
-    for idx, card in enumerate(tqdm(cards)):
-        desc = card.get('desc', '').lower()
+    for idx in tqdm(range(len(table))):
+        card_features = features[idx]
         
         # 1. Index by Archetype
-        if 'archetype' in card:
-            index[f"ARCH_{card['archetype']}"].append(idx)
+        index[f"ARCH_{table.value('archetype', idx)}"].append(idx)
             
         # 2. Index by Mechanics (Keywords)
         for key in SYNERGY_KEYS:
             if key == 'archetype': continue
-            if key in desc:
+            if card_features.has(key):
                 index[f"MECH_{key}"].append(idx)
         
         # 3. Identify "Power Cards" (Generic good cards)
         # These are checked against everything
         # Simple heuristic: Cards with multiple strong effects
         score_potential = 0
-        if 'draw' in desc: score_potential += 1
-        if 'special summon' in desc: score_potential += 1
-        if 'negate' in desc: score_potential += 1
-        if 'destroy' in desc: score_potential += 1
-        if 'search' in desc: score_potential += 1
+        if card_features.has('draw'): score_potential += 1
+        if card_features.has('special summon'): score_potential += 1
+        if card_features.has('negate'): score_potential += 1
+        if card_features.has('destroy'): score_potential += 1
+        if card_features.has('search'): score_potential += 1
         
         if score_potential >= 2:
             generic_power_cards.append(idx)
             
     print(f"✓ Index built with {len(index)} keys")
     print(f"✓ Found {len(generic_power_cards)} generic power cards")
-    return index, generic_power_cards
+    index = {key: np.array(indices, dtype=np.intp) for key, indices in index.items()}
+    return index, np.array(generic_power_cards, dtype=np.intp)
 
-def main():
-    print("=" * 60)
-    print("Yu-Gi-Oh Smart Ranking Calculator")
-    print("Analyzes ALL cards using intelligent filtering")
-    print("=" * 60)
+def iter_candidate_blocks(index, power_indices, n, block_pairs=BLOCK_PAIRS):
+    """
+    Yield the candidate pairs as (rows, cols, strip_size) with index arrays
+    rows < cols, a strip of strip_size rows at a time and without duplicates.
+
+    Each posting list is kept as a packed bitset over all cards. A row's
+    partners are the OR of the bitsets of every list the card is in, plus
+    the power cards (or every card, for a power card itself), so no pair
+    is ever materialized twice.
+    """
+    bitsets = np.packbits(np.zeros((len(index), n), dtype=bool), axis=1)
+    memberships = [[] for _ in range(n)]
+    for k, indices in enumerate(index.values()):
+        bits = np.zeros(n, dtype=bool)
+        bits[indices] = True
+        bitsets[k] = np.packbits(bits)
+        for idx in indices.tolist():
+            memberships[idx].append(k)
     
-    # 1. Load Data
-    cards = load_cards()
-    if not cards: return
+    power = np.zeros(n, dtype=bool)
+    power[power_indices] = True
+    power_bits = np.packbits(power)
+    all_bits = np.packbits(np.ones(n, dtype=bool))
+    
+    rows_per_block = max(1, block_pairs // max(n, 1))
+    for block_start in range(0, n, rows_per_block):
+        rows = np.arange(block_start, min(block_start + rows_per_block, n))
+        masks = np.empty((len(rows), bitsets.shape[1]), dtype=np.uint8)
+        for r, idx in enumerate(rows.tolist()):
+            if power[idx]:
+                masks[r] = all_bits
+            else:
+                masks[r] = np.bitwise_or.reduce(bitsets[memberships[idx]], axis=0, initial=0) | power_bits
+        
+        # Keep partners after the row only
+        partners = np.unpackbits(masks, axis=1, count=n).astype(bool)
+        partners &= np.arange(n)[None, :] > rows[:, None]
+        r, cols = np.nonzero(partners)
+        yield rows[r], cols, len(rows)
 
-    # Filter: Remove Vanilla monsters (no desc usually means no effect or normal)
-    # Actually Normal monsters have flavor text. 
-    # Better filter: Type != 'Normal Monster'
-    cards = [c for c in cards if 'Normal Monster' not in c.get('type', '')]
-    print(f"✓ Filtered to {len(cards)} Effect Monsters/Spells/Traps")
+def filter_smart_cards(table):
+    """
+    Filter: Remove Vanilla monsters (no desc usually means no effect or normal)
+    Actually Normal monsters have flavor text. 
+    Better filter: Type != 'Normal Monster'
+    """
+    return table.take(np.flatnonzero(table.label_mask('type', lambda t: 'Normal Monster' not in (t or ''))))
+
+def select_smart_pairs(table, top_n, min_score, mech_list_limit=MECH_LIST_LIMIT, power_card_limit=POWER_CARD_LIMIT):
+    """
+    Score the heuristic candidate pairs of table through a bounded TopK.
+    Returns the (score, idx1, idx2) winners, best first, the number of
+    candidates that reached min_score and the number of candidates scored.
+    """
+    # 2. Extract text features for the index (metric vectors come from the cache)
+    print("Extracting card features...")
+    features = [FEATURE_EXTRACTOR.extract(table.text['desc'][idx]) for idx in range(len(table))]
     
-    # 2. Build Index for fast lookups
-    index, power_indices = build_inverted_index(cards)
+    # 3. Build Index for fast lookups
+    index, power_indices = build_inverted_index(table, features)
+    del features
     
-    # 3. Generate Candidate Pairs (Using Set to avoid duplicates)
+    # 4. Select the posting lists that generate candidate pairs
     print("\nGenerating candidate pairs...")
-    candidate_pairs = set()
     
     # A. Archetype Matches (Highest Synergy)
+    candidate_lists = {key: indices for key, indices in index.items()
+                       if key.startswith("ARCH_") and len(indices) > 1}
+    archetype_pairs = sum(len(indices) * (len(indices) - 1) // 2 for indices in candidate_lists.values())
+    print(f"✓ Archetype pairs found: {archetype_pairs:,}")
+    
+    # B. Mechanism Matches (Medium Synergy)
+    # Bitsets make large lists cheap, so they are only skipped when a limit is set
     for key, indices in index.items():
-        if key.startswith("ARCH_") and len(indices) > 1:
-            # All pairs within this archetype
-            for i in range(len(indices)):
-                for j in range(i + 1, len(indices)):
-                    p1, p2 = indices[i], indices[j]
-                    if p1 > p2: p1, p2 = p2, p1
-                    candidate_pairs.add((p1, p2))
-    
-    print(f"✓ Archetype pairs found: {len(candidate_pairs):,}")
-    
-    # B. Mechanism Matches (Medium Synergy - limit search space)
-    # Only if lists are not too huge. 
-    mech_pairs_count = 0
-    for key, indices in index.items():
-        if key.startswith("MECH_") and len(indices) < 500: # optimization
-             for i in range(len(indices)):
-                for j in range(i + 1, len(indices)):
-                    p1, p2 = indices[i], indices[j]
-                    if p1 > p2: p1, p2 = p2, p1
-                    candidate_pairs.add((p1, p2))
-                    mech_pairs_count += 1
+        if key.startswith("MECH_") and (mech_list_limit is None or len(indices) < mech_list_limit):
+            candidate_lists[key] = indices
     
     print(f"✓ Mechanism pairs added")
     
     # C. Power Card Cross-Product (Generic Synergy)
     # Compare power cards with everything else
     # Limit to top power cards to avoid explosion
-    power_indices = power_indices[:1000] 
-    for p_idx in power_indices:
-        for other_idx in range(len(cards)):
-            if p_idx == other_idx: continue
-            p1, p2 = p_idx, other_idx
-            if p1 > p2: p1, p2 = p2, p1
-            candidate_pairs.add((p1, p2))
-            
-    print(f"✓ Total candidates to score: {len(candidate_pairs):,}")
-    print("  (Reduced from original ~{:,})".format(len(cards)**2 // 2))
-
-    # 4. Import full scoring logic
-    sys.path.insert(0, os.path.dirname(__file__))
-    try:
-        from calculate_rankings import score_combination, generate_explanation, WEIGHTS
-    except ImportError:
-        print("Error: detailed scoring logic not found. Run main script first.")
-        return
-
-    # 5. Score Candidates
+    power_indices = power_indices[:power_card_limit]
+
+    # 5. Score Candidates, one strip of partner bitmaps at a time
     print("\nScoring candidates...")
-    ranked_combinations = []
+    engine = build_pair_engine(table)
+    top = TopK(top_n, table.ids)
+    scored_count = 0
+    candidate_count = 0
     
-    # Convert set to list for iteration
-    candidates_list = list(candidate_pairs)
+    # Block scores are unrounded; build_combinations applies the exact threshold
+    candidate_floor = min_score - 0.005
     
-    # Process in batches to save memory
-    batch_size = 50000
-    for i in tqdm(range(0, len(candidates_list), batch_size)):
-        batch = candidates_list[i : i + batch_size]
-        
-        for idx1, idx2 in batch:
-            card1 = cards[idx1]
-            card2 = cards[idx2]
-            
-            score_data = score_combination(card1, card2)
+    n = len(table)
+    with tqdm(total=n, unit="cards") as pbar:
+        for rows, cols, strip_size in iter_candidate_blocks(candidate_lists, power_indices, n):
+            scores = engine.score_pairs(rows, cols)
+            candidate_count += len(scores)
             
-            if score_data['totalScore'] >= MIN_SCORE_THRESHOLD:
-                 ranked_combinations.append({
-                    'card1': {
-                        'id': card1['id'],
-                        'name': card1['name'],
-                        'type': card1['type'],
-                        'image_url_small': card1.get('image_url_small', '')
-                    },
-                    'card2': {
-                        'id': card2['id'],
-                        'name': card2['name'],
-                        'type': card2['type'],
-                        'image_url_small': card2.get('image_url_small', '')
-                    },
-                    **score_data
-                })
-        
-        # Periodic cleanup
-        if len(ranked_combinations) > TOP_N * 3:
-            ranked_combinations.sort(key=lambda x: x['totalScore'], reverse=True)
-            ranked_combinations = ranked_combinations[:TOP_N * 2]
+            keep = scores >= candidate_floor
+            scored_count += int(np.count_nonzero(keep))
+            top.push_block(scores[keep], rows[keep], cols[keep])
+            pbar.update(strip_size)
+    
+    print(f"✓ Total candidates scored: {candidate_count:,}")
+    print("  (Reduced from original ~{:,})".format(len(table)**2 // 2))
+    return top.results(), scored_count, candidate_count
 
-    # 6. Final Sort and Export
-    print(f"\nRanking top {TOP_N:,}...")
-    ranked_combinations.sort(key=lambda x: x['totalScore'], reverse=True)
-    top_combinations = ranked_combinations[:TOP_N]
-    
-    print("Generating explanations...")
-    for i, combo in enumerate(top_combinations, 1):
-        combo['rank'] = i
-        # Find full card data again
-        c1_id = combo['card1']['id']
-        c2_id = combo['card2']['id']
-        card1_full = next(c for c in cards if c['id'] == c1_id)
-        card2_full = next(c for c in cards if c['id'] == c2_id)
-        combo['explanation'] = generate_explanation(card1_full, card2_full, combo)
+def parse_limit(value):
+    """Limit argument: an integer, or 'none' for no limit"""
+    return None if value.lower() == 'none' else int(value)
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Rank combinations of heuristic candidate pairs over all cards")
+    parser.add_argument('--mech-limit', type=parse_limit, default=MECH_LIST_LIMIT,
+                        help=f"skip mechanics shared by at least this many cards, 'none' keeps all "
+                             f"(default: {MECH_LIST_LIMIT})")
+    parser.add_argument('--compact', action='store_true',
+                        help="write compact rankings.json (no indentation, each card stored once)")
+    parser.add_argument('--profile', metavar='STAGE', default=None,
+                        help="profile one stage with cProfile (e.g. pair_scoring, explanations, export)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    run = RunReport('calculate_rankings_smart', args.profile)
+    
+    print("=" * 60)
+    print("Yu-Gi-Oh Smart Ranking Calculator")
+    print("Analyzes ALL cards using intelligent filtering")
+    print("=" * 60)
+    
+    # 1. Load Data
+    table = load_card_table(CARDS_FILE, run=run)
+    if table is None: return
 
+    table = filter_smart_cards(table)
+    print(f"✓ Filtered to {len(table)} Effect Monsters/Spells/Traps")
+    
+    with run.stage('pair_scoring') as stage:
+        winners, scored_count, stage['pairs'] = select_smart_pairs(table, TOP_N, MIN_SCORE_THRESHOLD,
+                                                                   args.mech_limit, POWER_CARD_LIMIT)
+
+    # 6. Build ranked, explained entries for the final winners only
+    print(f"\nRanking top {TOP_N:,}...")
+    with run.stage('explanations'):
+        top_combinations = build_combinations(table, winners, MIN_SCORE_THRESHOLD)
+    
     print(f"Exporting to {OUTPUT_FILE}...")
     output_data = {
         'metadata': {
-            'totalCombinations': len(cards)**2 // 2, # Theoretical total
-            'scoredCombinations': len(ranked_combinations),
+            'totalCombinations': len(table)**2 // 2, # Theoretical total
+            'scoredCombinations': scored_count,
             'topN': TOP_N,
             'generationDate': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'type': 'SMART_ANALYSIS',
-            'cardsAnalyzed': len(cards)
+            'cardsAnalyzed': len(table)
         },
         'rankings': top_combinations
     }
     
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, ensure_ascii=False, indent=2)
+    with run.stage('export'):
+        export_stats = write_rankings(output_data, OUTPUT_FILE, args.compact)
+    print_export_stats(export_stats)
 
+    run.info.update({
+        'cardsAnalyzed': len(table),
+        'scoredCombinations': scored_count,
+        'mechListLimit': args.mech_limit,
+        'export': export_stats,
+    })
+    run.print_summary()
+    run.write(report_path(OUTPUT_FILE))
     print("✓ DONE!")
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Binary Card Cache
+Keeps a memory-mappable CardTable next to cards.json so ranking runs skip JSON parsing
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+from card_table import CardTable
+
+# Bump when the on-disk layout changes
+CACHE_VERSION = 1
+META_FILE = 'meta.json'
+
+def file_sha256(path):
+    """Content hash of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_dir_for(source_file, cache_root):
+    """
+    Cache directory of source_file under cache_root. Each source file gets
+    its own directory, named after a hash of its absolute path, so runs on
+    different card files don't overwrite each other's cache.
+    """
+    path_hash = hashlib.sha256(os.path.abspath(source_file).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_root, path_hash)
+
+def read_meta(cache_dir):
+    """Cache metadata, or None when there is no readable cache"""
+    try:
+        with open(os.path.join(cache_dir, META_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_cache(table, cache_dir, source_file, fingerprint, source_hash=None):
+    """
+    Write table to cache_dir, tagged with the content hash of source_file
+    and the scorer fingerprint that produced its metric vectors
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(cache_dir)), exist_ok=True)
+    if source_hash is None:
+        source_hash = file_sha256(source_file)
+
+    # Write next to the old cache and swap, so readers never see half a cache
+    staging_dir = cache_dir + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    table.save(staging_dir)
+
+    meta = {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(source_file),
+        'sourceHash': source_hash,
+        'sourceMtime': os.path.getmtime(source_file),
+        'fingerprint': fingerprint,
+        'cards': len(table),
+    }
+    with open(os.path.join(staging_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(staging_dir, cache_dir)
+
+def load_cache(cache_dir, source_file, fingerprint):
+    """
+    Memory-map the cached CardTable for source_file.
+
+    Returns None when the cache is missing, was built from another file or
+    by a different scorer, when source_file is gone, or when source_file
+    is newer than the cache and its content hash changed. A newer file with unchanged content just has
+    its recorded mtime refreshed.
+    """
+    meta = read_meta(cache_dir)
+    if meta is None:
+        return None
+
+    if meta.get('version') != CACHE_VERSION or meta.get('fingerprint') != fingerprint:
+        return None
+    if meta.get('source') != os.path.abspath(source_file):
+        return None
+
+    try:
+        source_mtime = os.path.getmtime(source_file)
+        touched = source_mtime > meta.get('sourceMtime', 0)
+        if touched and file_sha256(source_file) != meta.get('sourceHash'):
+            return None
+    except OSError:
+        return None
+    if touched:
+        meta['sourceMtime'] = source_mtime
+        with open(os.path.join(cache_dir, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+    try:
+        return CardTable.load(cache_dir)
+    except (OSError, ValueError, KeyError):
+        return None
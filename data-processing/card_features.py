@@ -0,0 +1,113 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Card Text Features
+Extracts every keyword count the scorers need in a single pass per description
+"""
+
+import re
+
+class CardFeatures:
+    """Keyword occurrence counts for one card description"""
+
+    __slots__ = ('counts', 'vocabulary')
+
+    def __init__(self, counts, vocabulary):
+        self.counts = counts
+        self.vocabulary = vocabulary
+
+    def count(self, keyword):
+        """Occurrences of keyword, with the same semantics as str.count on the lowercased text"""
+        if keyword not in self.vocabulary:
+            raise KeyError(f"'{keyword}' is not in the feature vocabulary")
+        return self.counts.get(keyword, 0)
+
+    def has(self, keyword):
+        """Whether keyword appears in the lowercased text"""
+        if keyword not in self.vocabulary:
+            raise KeyError(f"'{keyword}' is not in the feature vocabulary")
+        return keyword in self.counts
+
+    def count_any(self, keywords):
+        """Total occurrences of all keywords, like CardScorer.count_keyword_occurrences"""
+        total = 0
+        for keyword in keywords:
+            total += self.count(keyword)
+        return total
+
+def _trie_pattern(words):
+    """
+    Build a regex alternation shaped like a trie over words. Optional
+    suffixes are greedy, so the match at any position is the longest
+    keyword starting there.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def render(node):
+        branches = []
+        for char in sorted(k for k in node if k):
+            branches.append(re.escape(char) + render(node[char]))
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            return '(?:' + body + ')?'
+        return body
+
+    return render(trie)
+
+class FeatureExtractor:
+    """
+    Counts a fixed keyword vocabulary with one compiled regex.
+
+    The pattern is a zero-width lookahead, so it reports the longest keyword
+    starting at every position of the text. All keywords that match at the
+    same position are prefixes of that longest match, so each match is
+    expanded back to every keyword it covers. Keywords that can overlap
+    themselves (like 'destroyed') only count matches that start after the
+    previous counted one ends, which is exactly what str.count does.
+    """
+
+    def __init__(self, vocabulary):
+        self.vocabulary = frozenset(keyword.lower() for keyword in vocabulary)
+        self.pattern = re.compile('(?=(' + _trie_pattern(self.vocabulary) + '))')
+        self.self_overlapping = frozenset(
+            k for k in self.vocabulary if any(k[:b] == k[-b:] for b in range(1, len(k)))
+        )
+        self._expansions = {}
+
+    def _expand(self, longest):
+        expansion = self._expansions.get(longest)
+        if expansion is None:
+            expansion = tuple(k for k in self.vocabulary if longest.startswith(k))
+            self._expansions[longest] = expansion
+        return expansion
+
+    def extract(self, text):
+        """Extract CardFeatures from raw description text"""
+        matches = {}
+        overlap_matches = []
+        for match in self.pattern.finditer(text.lower()):
+            longest = match.group(1)
+            matches[longest] = matches.get(longest, 0) + 1
+            if not self.self_overlapping.isdisjoint(self._expand(longest)):
+                overlap_matches.append((match.start(), longest))
+
+        counts = {}
+        for longest, occurrences in matches.items():
+            for keyword in self._expand(longest):
+                if keyword not in self.self_overlapping:
+                    counts[keyword] = counts.get(keyword, 0) + occurrences
+
+        # Count self-overlapping keywords without overlaps, left to right
+        next_free = {}
+        for start, longest in overlap_matches:
+            for keyword in self.self_overlapping.intersection(self._expand(longest)):
+                if start >= next_free.get(keyword, 0):
+                    counts[keyword] = counts.get(keyword, 0) + 1
+                    next_free[keyword] = start + len(keyword)
+
+        return CardFeatures(counts, self.vocabulary)
@@ -0,0 +1,204 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Columnar Card Store
+Holds the ranking pipeline's card data as compact columns instead of dicts
+"""
+
+import json
+import os
+
+import numpy as np
+
+class StringColumn:
+    """
+    Strings packed into one UTF-8 buffer plus an offsets array.
+    Values are only decoded when accessed.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values):
+        encoded = [(value or '').encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        start, stop = self.offsets[idx], self.offsets[idx + 1]
+        return self.data[start:stop].tobytes().decode('utf-8')
+
+    def lengths(self):
+        """Encoded length of every value, without decoding anything"""
+        return np.diff(self.offsets)
+
+    def take(self, indices):
+        """New column holding only the values at indices"""
+        return StringColumn.from_strings(self[idx] for idx in indices)
+
+class CardTable:
+    """
+    Struct-of-arrays card store used by the ranking scripts.
+
+    Per-pair work only needs integer lookups into NumPy columns: the card
+    id, the metric vector, the synergy flags and interned codes for the
+    categorical fields. Text fields stay packed in StringColumns and are
+    decoded lazily, when a winner is exported.
+    """
+
+    # Categorical fields, interned to integer codes (-1 for missing)
+    CODE_FIELDS = ('type', 'race', 'attribute', 'archetype')
+    # Free text fields, kept packed
+    TEXT_FIELDS = ('name', 'desc', 'image_url_small')
+    # Synergy flag columns, in synergy_features order
+    FLAG_FIELDS = ('monster', 'equip', 'reactive', 'search', 'summon')
+
+    def __init__(self, ids, metrics, flags, codes, labels, text):
+        """
+        ids:     int64 card ids
+        metrics: (cards x metrics) float64 score vectors
+        flags:   (cards x FLAG_FIELDS) bool synergy flags
+        codes:   {field: int32 codes} for CODE_FIELDS
+        labels:  {field: [label, ...]} decoding the codes
+        text:    {field: StringColumn} for TEXT_FIELDS
+        """
+        self.ids = ids
+        self.metrics = metrics
+        self.flags = flags
+        self.codes = codes
+        self.labels = labels
+        self.text = text
+        self._index = None
+
+    @classmethod
+    def from_cards(cls, cards, metrics, flags):
+        """
+        Pack card dicts plus their precomputed metric vectors and synergy
+        flags into a table
+        """
+        ids = np.array([int(card['id']) for card in cards], dtype=np.int64)
+
+        codes = {}
+        labels = {}
+        for field in cls.CODE_FIELDS:
+            interned = {}
+            codes[field] = np.array(
+                [interned.setdefault(card.get(field), len(interned)) if card.get(field) else -1 for card in cards],
+                dtype=np.int32
+            )
+            labels[field] = list(interned)
+
+        text = {field: StringColumn.from_strings(card.get(field, '') for card in cards) for field in cls.TEXT_FIELDS}
+
+        metrics = np.asarray(metrics, dtype=np.float64).reshape(len(cards), -1)
+        flags = np.asarray(flags, dtype=bool).reshape(len(cards), len(cls.FLAG_FIELDS))
+        return cls(ids, metrics, flags, codes, labels, text)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def save(self, directory):
+        """Write every column to directory as .npy files plus labels.json"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'ids.npy'), self.ids)
+        np.save(os.path.join(directory, 'metrics.npy'), self.metrics)
+        np.save(os.path.join(directory, 'flags.npy'), self.flags)
+        for field, codes in self.codes.items():
+            np.save(os.path.join(directory, f'codes_{field}.npy'), codes)
+        for field, column in self.text.items():
+            np.save(os.path.join(directory, f'text_{field}_data.npy'), column.data)
+            np.save(os.path.join(directory, f'text_{field}_offsets.npy'), column.offsets)
+        with open(os.path.join(directory, 'labels.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.labels, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Load a table written by save. With mmap_mode='r' the columns are
+        memory-mapped read-only, so loading is nearly free and processes
+        reading the same files share their pages.
+        """
+        def column(name):
+            return np.load(os.path.join(directory, name), mmap_mode=mmap_mode)
+
+        with open(os.path.join(directory, 'labels.json'), 'r', encoding='utf-8') as f:
+            labels = json.load(f)
+
+        return cls(
+            column('ids.npy'),
+            column('metrics.npy'),
+            column('flags.npy'),
+            {field: column(f'codes_{field}.npy') for field in cls.CODE_FIELDS},
+            labels,
+            {
+                field: StringColumn(column(f'text_{field}_data.npy'), column(f'text_{field}_offsets.npy'))
+                for field in cls.TEXT_FIELDS
+            },
+        )
+
+    def label_mask(self, field, predicate):
+        """Bool mask of cards whose categorical value satisfies predicate (None when missing)"""
+        matches = np.array([bool(predicate(label)) for label in self.labels[field]] + [bool(predicate(None))])
+        # Code -1 indexes the trailing entry for missing values
+        return matches[self.codes[field]]
+
+    def value(self, field, idx):
+        """Decoded categorical value, or None"""
+        code = self.codes[field][idx]
+        return self.labels[field][code] if code >= 0 else None
+
+    def card_id(self, idx):
+        return str(self.ids[idx])
+
+    def index_of(self, card_id):
+        """Table index of a card id (str or int)"""
+        if self._index is None:
+            self._index = {int(card_id): idx for idx, card_id in enumerate(self.ids.tolist())}
+        return self._index[int(card_id)]
+
+    def vector(self, idx):
+        """Metric vector of one card as a tuple"""
+        return tuple(self.metrics[idx].tolist())
+
+    def synergy_features(self, idx):
+        """The synergy_features tuple of one card"""
+        return (self.value('archetype', idx), *self.flags[idx].tolist())
+
+    def summary(self, idx):
+        """Card fields embedded in each ranking entry"""
+        return {
+            'id': self.card_id(idx),
+            'name': self.text['name'][idx],
+            'type': self.value('type', idx) or '',
+            'image_url_small': self.text['image_url_small'][idx],
+        }
+
+    def card(self, idx):
+        """Rebuild a card dict with the fields the scorers look at"""
+        return {
+            'id': self.card_id(idx),
+            'name': self.text['name'][idx],
+            'type': self.value('type', idx) or '',
+            'race': self.value('race', idx) or '',
+            'attribute': self.value('attribute', idx),
+            'archetype': self.value('archetype', idx),
+            'desc': self.text['desc'][idx],
+            'image_url_small': self.text['image_url_small'][idx],
+        }
+
+    def take(self, indices):
+        """New table holding only the cards at indices (in that order)"""
+        indices = np.asarray(indices, dtype=np.intp)
+        return CardTable(
+            self.ids[indices],
+            self.metrics[indices],
+            self.flags[indices],
+            {field: codes[indices] for field, codes in self.codes.items()},
+            self.labels,
+            {field: column.take(indices.tolist()) for field, column in self.text.items()},
+        )
@@ -0,0 +1,422 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - k-Card Combo Search
+Finds strong 3- and 4-card combinations with a beam search seeded from the
+exact pair top-K, skipping extensions that provably cannot make the beam
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+from tqdm import tqdm
+
+sys.path.insert(0, os.path.dirname(__file__))
+from calculate_rankings import (load_card_table, build_pair_engine, select_top_pairs,
+                                CARDS_FILE, CARD_LIMIT, METRICS, WEIGHTS)
+from instrumentation import RunReport
+from pair_engine import BLOCK_PAIRS
+from pruning import BOUND_SLACK, MAX_MULTIPLIER
+from rankings_export import encode_json
+
+OUTPUT_FILE = "../public/combos-{size}.json"
+REPORT_FILE = "../public/combos.report.json"
+COMBO_SIZES = (3, 4)
+BEAM_WIDTH = 5000  # Combinations kept per level; bounds both memory and time
+TOP_N = 1000  # Combinations exported per size
+TIME_LIMIT = 300  # Seconds; once over, every level only expands its best states
+
+# Synergy rules in synergy_multiplier_from_features order: the factor, and
+# the flag pairs (FLAG_FIELDS indices) that trigger it in either order
+ARCHETYPE_FACTOR = 1.5
+FLAG_RULES = (
+    (1.2, 0, 1),   # monster + equip
+    (1.15, 0, 2),  # monster + quick-play/trap
+    (1.3, 3, 4),   # search/add + special summon
+)
+
+def combo_multiplier(features):
+    """
+    Synergy multiplier of a k-card combination from its synergy_features
+    tuples. Every rule of synergy_multiplier_from_features applies once
+    when any two of the cards trigger it, so two cards get exactly the
+    pair multiplier and adding a card never lowers it.
+    """
+    archetypes = [card[0] for card in features if card[0]]
+    flags = [card[1:] for card in features]
+    multiplier = 1.0
+
+    if len(archetypes) != len(set(archetypes)):
+        multiplier *= ARCHETYPE_FACTOR
+
+    for factor, first, second in FLAG_RULES:
+        if any(a[first] and b[second] or a[second] and b[first]
+               for i, a in enumerate(flags) for b in flags[i + 1:]):
+            multiplier *= factor
+
+    return min(multiplier, MAX_MULTIPLIER)
+
+def score_combo(table, indices, weights=WEIGHTS):
+    """
+    Score data of the cards at table indices: the per-metric average, the
+    weighted total times the combo multiplier, rounded like score_combination
+    """
+    vectors = [table.vector(idx) for idx in indices]
+    combined_scores = {metric: sum(values) / len(values) for metric, values in zip(METRICS, zip(*vectors))}
+    weighted_total = sum(combined_scores[metric] * weights[metric] for metric in METRICS)
+    multiplier = combo_multiplier([table.synergy_features(idx) for idx in indices])
+
+    return {
+        'scores': combined_scores,
+        'synergyMultiplier': multiplier,
+        'totalScore': round(weighted_total * multiplier, 2)
+    }
+
+def generate_combo_explanation(table, indices, score_data):
+    """Explanation of a k-card combination, in the style of generate_explanation"""
+    explanations = []
+
+    archetypes = Counter(table.value('archetype', idx) for idx in indices)
+    archetypes.pop(None, None)
+    if archetypes:
+        archetype, count = archetypes.most_common(1)[0]
+        if count == len(indices):
+            explanations.append(f"All {count} cards belong to the {archetype} archetype")
+        elif count > 1:
+            explanations.append(f"{count} cards belong to the {archetype} archetype")
+
+    top_metrics = sorted(score_data['scores'].items(), key=lambda x: x[1], reverse=True)[:2]
+    for metric, score in top_metrics:
+        if score >= 50:
+            explanations.append(f"High {metric.replace('_', ' ').title()} synergy (score: {score:.0f})")
+
+    if not explanations:
+        explanations.append("Cards provide complementary effects")
+
+    return ". ".join(explanations) + "."
+
+class BeamLevel:
+    """
+    The combinations of one size kept by the beam, as parallel arrays:
+    members (sorted table indices), the sum of their card totals, their
+    archetypes, which synergy flags any member has and which rules fire.
+    """
+
+    def __init__(self, members, total_sum, archetypes, flags, rules, scores):
+        self.members = members
+        self.total_sum = total_sum
+        self.archetypes = archetypes
+        self.flags = flags
+        self.rules = rules
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.members)
+
+class ComboSearch:
+    """
+    Beam search over k-card combinations.
+
+    Level 2 is the exact pair top-K. Each level extends every kept
+    combination by one card, scores all extensions with broadcast
+    arithmetic and keeps the best beam_width distinct ones. A combination
+    of s cards with card total sum T scores at most 2 * (T + t) / (s + 1)
+    with a new card of total t, so with cards visited by total (highest
+    first) only a prefix of them can reach the beam cutoff, and parents
+    whose best extension cannot reach it are skipped entirely. The beam
+    itself is a heuristic; the report says how much of the space it saw.
+    """
+
+    def __init__(self, engine, tie_keys):
+        self.engine = engine
+        self.tie_keys = np.asarray(tie_keys, dtype=np.int64)
+        totals = engine.card_totals()
+        self.order = np.argsort(-totals, kind='stable')
+        self.sorted_totals = totals[self.order]
+        self._negated = -self.sorted_totals
+        self.totals = totals
+        self.prune = engine.nonnegative()
+
+    def seed(self, pairs):
+        """BeamLevel of (score, idx1, idx2) pairs"""
+        members = np.sort(np.array([(idx1, idx2) for _, idx1, idx2 in pairs], dtype=np.intp).reshape(-1, 2),
+                          axis=1)
+        flags = self.engine.flags[members]
+        multipliers = self.engine.pair_multipliers(members[:, 0], members[:, 1])
+        rules = np.zeros((len(members), 1 + len(FLAG_RULES)), dtype=bool)
+        archetypes = self.engine.archetype[members]
+        rules[:, 0] = (archetypes[:, 0] == archetypes[:, 1]) & (archetypes[:, 0] >= 0)
+        for r, (_, first, second) in enumerate(FLAG_RULES, 1):
+            rules[:, r] = ((flags[:, 0, first] & flags[:, 1, second]) | (flags[:, 0, second] & flags[:, 1, first]))
+        total_sum = self.totals[members].sum(axis=1)
+        return BeamLevel(members, total_sum, archetypes, flags.any(axis=1), rules,
+                         total_sum / 2 * multipliers)
+
+    def _extend(self, level, states, cols):
+        """Scores of states x cols extensions and the rules they fire (-inf for cards already in a state)"""
+        engine = self.engine
+        size = level.members.shape[1]
+        flags = level.flags[states]
+        card_flags = engine.flags[cols]
+
+        col_archetype = engine.archetype[cols]
+        shared = (level.archetypes[states][:, :, None] == col_archetype[None, None, :]).any(axis=1)
+        rules = [level.rules[states, 0][:, None] | (shared & (col_archetype >= 0)[None, :])]
+        for r, (_, first, second) in enumerate(FLAG_RULES, 1):
+            rules.append(level.rules[states, r][:, None]
+                         | (flags[:, first][:, None] & card_flags[:, second][None, :])
+                         | (flags[:, second][:, None] & card_flags[:, first][None, :]))
+
+        multiplier = np.ones((len(states), len(cols)))
+        np.multiply(multiplier, ARCHETYPE_FACTOR, out=multiplier, where=rules[0])
+        for (factor, _, _), fired in zip(FLAG_RULES, rules[1:]):
+            np.multiply(multiplier, factor, out=multiplier, where=fired)
+        np.minimum(multiplier, MAX_MULTIPLIER, out=multiplier)
+
+        scores = (level.total_sum[states][:, None] + self.totals[cols][None, :]) / (size + 1)
+        scores *= multiplier
+        scores[(level.members[states][:, :, None] == cols[None, None, :]).any(axis=1)] = -np.inf
+        return scores, np.stack(rules, axis=2)
+
+    def expand(self, level, beam_width, deadline=None, progress=None):
+        """
+        Extend level by one card. Returns the next BeamLevel (best first)
+        and {'states', 'statesSkipped', 'setsScored', 'setsPossible', 'timedOut'}.
+        """
+        n = len(self.engine)
+        size = level.members.shape[1]
+        rows_per_block = max(1, BLOCK_PAIRS // max(n, 1))
+        # Parents by card total sum, so the bound shrinks monotonically
+        parents = np.argsort(-level.total_sum, kind='stable')
+        best = {}
+        cutoff = -math.inf
+        stats = {'states': len(level), 'statesSkipped': 0, 'setsScored': 0,
+                 'setsPossible': len(level) * (n - size), 'timedOut': False}
+
+        for start in range(0, len(parents), rows_per_block):
+            states = parents[start:start + rows_per_block]
+            if start and deadline is not None and time.perf_counter() > deadline:
+                stats['timedOut'] = True
+                stats['statesSkipped'] += len(parents) - start
+                break
+
+            columns = n
+            if self.prune and cutoff > -math.inf:
+                needed = cutoff - abs(cutoff) * BOUND_SLACK - BOUND_SLACK
+                # 2 * (T + t) / (size + 1) >= needed
+                best_total = level.total_sum[states[0]]
+                if MAX_MULTIPLIER * (best_total + self.sorted_totals[0]) / (size + 1) < needed:
+                    stats['statesSkipped'] += len(parents) - start
+                    break
+                columns = int(np.searchsorted(self._negated, -(needed * (size + 1) / MAX_MULTIPLIER - best_total),
+                                              side='right'))
+            cols = self.order[:max(columns, size + 1)]
+
+            scores, rules = self._extend(level, states, cols)
+            stats['setsScored'] += scores.size
+
+            rows, picked = np.nonzero(scores >= cutoff)
+            values = scores[rows, picked]
+            # Every set can come from up to size + 1 parents
+            keep = beam_width * (size + 1)
+            if len(values) > keep:
+                kth = np.partition(values, len(values) - keep)[len(values) - keep]
+                mask = values >= kth
+                rows, picked, values = rows[mask], picked[mask], values[mask]
+
+            for row, col, value in zip(rows.tolist(), picked.tolist(), values.tolist()):
+                members = tuple(sorted((*level.members[states[row]].tolist(), int(cols[col]))))
+                if members not in best:
+                    best[members] = (value, rules[row, col])
+
+            if len(best) >= beam_width:
+                ranked = sorted(best.items(), key=lambda item: (-item[1][0], self._keys(item[0])))[:beam_width]
+                best = dict(ranked)
+                cutoff = ranked[-1][1][0]
+
+            if progress is not None:
+                progress.update(len(states))
+
+        if progress is not None and stats['timedOut']:
+            progress.update(stats['statesSkipped'])
+
+        ranked = sorted(best.items(), key=lambda item: (-item[1][0], self._keys(item[0])))[:beam_width]
+        members = np.array([m for m, _ in ranked], dtype=np.intp).reshape(-1, size + 1)
+        return BeamLevel(
+            members,
+            self.totals[members].sum(axis=1),
+            self.engine.archetype[members],
+            self.engine.flags[members].any(axis=1),
+            np.array([rules for _, (_, rules) in ranked], dtype=bool).reshape(-1, 1 + len(FLAG_RULES)),
+            np.array([value for _, (value, _) in ranked]),
+        ), stats
+
+    def _keys(self, members):
+        return tuple(sorted(self.tie_keys[list(members)].tolist()))
+
+    def score_bound(self, size):
+        """Highest score any combination of size cards could reach"""
+        return MAX_MULTIPLIER * self.sorted_totals[:size].sum() / size
+
+def search_combos(table, sizes, beam_width, time_limit=None, run=None):
+    """
+    Beam search for the best combinations of every size in sizes. Returns
+    {size: (BeamLevel, stats)} where stats reports the explored space.
+    """
+    run = run or RunReport('combo_search')
+    engine = build_pair_engine(table)
+    search = ComboSearch(engine, table.ids)
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    print(f"\nSeeding the beam with the top {beam_width:,} pairs...")
+    with run.stage('pair_seeds', pairs=len(table) * (len(table) - 1) // 2):
+        pairs, _ = select_top_pairs(engine, table.ids, beam_width, 0)
+    level = search.seed(pairs)
+
+    results = {}
+    levels = []
+    for size in range(3, max(sizes) + 1):
+        print(f"\nExtending {len(level):,} combinations to {size} cards...")
+        with run.stage(f"level_{size}") as stage:
+            with tqdm(total=len(level), desc=f"{size} cards", unit="combos") as pbar:
+                level, stats = search.expand(level, beam_width, deadline, pbar)
+            stage['pairs'] = stats['setsScored']
+
+        levels.append({'size': size, **stats})
+        if size in sizes:
+            results[size] = (level, {
+                'space': math.comb(len(table), size),
+                'setsScored': sum(item['setsScored'] for item in levels),
+                'levels': list(levels),
+                'scoreBound': float(search.score_bound(size)),
+                'timedOut': any(item['timedOut'] for item in levels),
+            })
+    return results
+
+def export_combos(table, level, stats, top_n, beam_width, output_file, compact=False):
+    """Write the best top_n combinations of a level with exact scores and explanations"""
+    combos = []
+    for members in level.members.tolist():
+        score_data = score_combo(table, members)
+        combos.append((members, score_data))
+    # Rescored exactly, so order by the rounded totals (ties by card ids)
+    combos.sort(key=lambda item: (-item[1]['totalScore'], sorted(int(table.ids[idx]) for idx in item[0])))
+
+    entries = []
+    for rank, (members, score_data) in enumerate(combos[:top_n], 1):
+        entries.append({
+            'cards': [table.summary(idx) for idx in members],
+            **score_data,
+            'rank': rank,
+            'explanation': generate_combo_explanation(table, members, score_data),
+        })
+
+    output_data = {
+        'metadata': {
+            'comboSize': level.members.shape[1],
+            'topN': len(entries),
+            'beamWidth': beam_width,
+            'finalBeamSize': len(level),
+            'generationDate': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'weights': WEIGHTS,
+            'cardsAnalyzed': len(table),
+            'explored': stats,
+        },
+        'combos': entries
+    }
+    encoded, _ = encode_json(output_data, compact)
+    with open(output_file, 'wb') as f:
+        f.write(encoded)
+    return entries
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Search the best 3- and 4-card combinations")
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(COMBO_SIZES),
+                        help="combination sizes to search (default: 3 4)")
+    parser.add_argument('--beam-width', type=int, default=BEAM_WIDTH,
+                        help=f"combinations kept per level (default: {BEAM_WIDTH:,})")
+    parser.add_argument('--top', type=int, default=TOP_N, help=f"combinations exported per size (default: {TOP_N:,})")
+    parser.add_argument('--time-limit', type=float, default=TIME_LIMIT,
+                        help=f"seconds before each level only expands its best states (default: {TIME_LIMIT})")
+    parser.add_argument('--full', action='store_true', help=f"analyze every card instead of the first {CARD_LIMIT:,}")
+    parser.add_argument('--compact', action='store_true', help="write compact JSON (no indentation)")
+    parser.add_argument('--profile', metavar='STAGE', default=None,
+                        help="profile one stage with cProfile (e.g. pair_seeds, level_3, level_4)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main execution function"""
+    args = parse_args(argv)
+    run = RunReport('combo_search', args.profile)
+
+    print("=" * 60)
+    print("Yu-Gi-Oh Combo Rankings - k-Card Combo Search")
+    print("=" * 60)
+
+    sizes = sorted(set(args.sizes))
+    if not sizes or sizes[0] < 3:
+        print("Combination sizes must be 3 or more; use calculate_rankings.py for pairs")
+        return 1
+    if args.top > args.beam_width:
+        print(f"--top ({args.top:,}) cannot exceed --beam-width ({args.beam_width:,})")
+        return 1
+
+    table = load_card_table(CARDS_FILE, run=run)
+    if table is None:
+        print("Failed to load cards. Please run fetch_cards.py first.")
+        return 1
+
+    # Same card selection as calculate_rankings.py
+    table = table.take(np.flatnonzero(table.text['desc'].lengths() > 0))
+    if len(table) > CARD_LIMIT and not args.full:
+        print(f"\n⚠️  OPTIMIZATION: Using first {CARD_LIMIT:,} cards for faster processing")
+        print(f"   To analyze all cards, run with --full")
+        table = table.take(np.arange(CARD_LIMIT))
+    print(f"✓ Using {len(table):,} cards")
+
+    results = search_combos(table, sizes, args.beam_width, args.time_limit, run)
+
+    for size, (level, stats) in results.items():
+        output_file = OUTPUT_FILE.format(size=size)
+        with run.stage(f"export_{size}"):
+            entries = export_combos(table, level, stats, args.top, args.beam_width, output_file, args.compact)
+
+        print("\n" + "=" * 60)
+        print(f"{size}-card combinations:")
+        print("=" * 60)
+        print(f"✓ Scored {stats['setsScored']:,} of {stats['space']:,} possible combinations "
+              f"({stats['setsScored'] / max(stats['space'], 1):.2e} of the space)")
+        for item in stats['levels']:
+            print(f"  {item['size']} cards: {item['states'] - item['statesSkipped']:,} of {item['states']:,} "
+                  f"states extended, {item['setsScored']:,} of {item['setsPossible']:,} extensions scored")
+        if stats['timedOut']:
+            print(f"⚠️  Time limit reached, later states were not extended")
+        if entries:
+            print(f"✓ Best score {entries[0]['totalScore']:.2f}; no {size}-card combination can exceed "
+                  f"{stats['scoreBound']:.2f}")
+        print(f"✓ Exported {len(entries):,} combinations to {output_file}")
+        for entry in entries[:3]:
+            print(f"\n#{entry['rank']}: {' + '.join(card['name'] for card in entry['cards'])}")
+            print(f"  Score: {entry['totalScore']:.2f}")
+            print(f"  Synergy: {entry['synergyMultiplier']:.2f}x")
+
+    run.info.update({
+        'cardsAnalyzed': len(table),
+        'beamWidth': args.beam_width,
+        'explored': {size: stats for size, (_, stats) in results.items()},
+    })
+    run.print_summary()
+    run.write(REPORT_FILE)
+
+    print("\n" + "=" * 60)
+    print("✓ COMPLETE!")
+    print("=" * 60)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Deck Scoring
+Scores every internal pair of a deck list in one batched call, and thousands
+of deck lists per second in bulk
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from tqdm import tqdm
+
+sys.path.insert(0, os.path.dirname(__file__))
+from calculate_rankings import load_card_table, build_pair_engine, score_table_pair, CARDS_FILE
+from pair_engine import BLOCK_PAIRS
+
+TOP_PAIRS = 10  # Best internal pairs listed per deck
+YDK_SECTIONS = {'#main': 'main', '#extra': 'extra', '!side': 'side'}
+
+def parse_ydk(text):
+    """
+    Card ids of a .ydk deck list by section: {'main', 'extra', 'side'}.
+    Other lines starting with # (comments, "#created by ...") are skipped.
+    """
+    deck = {'main': [], 'extra': [], 'side': []}
+    section = 'main'
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line in YDK_SECTIONS:
+            section = YDK_SECTIONS[line]
+        elif line.startswith(('#', '!')):
+            continue
+        elif line.isdigit():
+            deck[section].append(int(line))
+        else:
+            raise ValueError(f"Invalid line in deck list: {line!r}")
+    return deck
+
+def load_decks(path):
+    """
+    Deck lists from a .ydk file, a directory of .ydk files, or a JSON
+    lines file of decks (a list of card ids or {"name", "main"} per line).
+    Returns [(name, card_ids), ...] with the main deck of each .ydk.
+    """
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if name.endswith('.ydk'))
+        return [deck for name in names for deck in load_decks(os.path.join(path, name))]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.ydk'):
+            return [(os.path.basename(path), parse_ydk(f.read())['main'])]
+
+        decks = []
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            deck = json.loads(line)
+            if isinstance(deck, dict):
+                decks.append((deck.get('name', f"deck {number}"), deck.get('main', [])))
+            else:
+                decks.append((f"deck {number}", deck))
+        return decks
+
+class DeckScorer:
+    """
+    Scores deck lists against a CardTable.
+
+    A deck is reduced to its distinct cards and their copy counts, and the
+    internal pair matrix of those cards is scored with one broadcast
+    PairEngine call. Each pair is weighted by the product of the copy
+    counts, so the result equals scoring every pair of deck slots except
+    copies of the same card. In bulk, decks are padded to the same length
+    and scored as one 3-D block.
+    """
+
+    def __init__(self, table, engine=None):
+        self.table = table
+        self.engine = engine or build_pair_engine(table)
+
+    def resolve(self, card_ids):
+        """Distinct table indices of a deck, their copy counts and the ids not in the table"""
+        indices = []
+        unknown = []
+        for card_id in card_ids:
+            try:
+                indices.append(self.table.index_of(card_id))
+            except (KeyError, ValueError):
+                unknown.append(card_id)
+        cards, counts = np.unique(np.array(indices, dtype=np.intp), return_counts=True)
+        return cards, counts, unknown
+
+    def _score_block(self, groups, counts):
+        """
+        Pair scores, pair weights, deck scores and per-card contributions of
+        padded (decks x size) groups whose padding has count 0
+        """
+        scores = self.engine.score_groups(groups)
+        weights = (counts[:, :, None] * counts[:, None, :]).astype(np.float64)
+        diagonal = np.arange(groups.shape[1])
+        weights[:, diagonal, diagonal] = 0
+
+        weighted = scores * weights
+        pair_weight = weights.sum(axis=(1, 2))
+        deck_scores = np.divide(weighted.sum(axis=(1, 2)), pair_weight, out=np.zeros(len(groups)),
+                                where=pair_weight > 0)
+        card_weight = weights.sum(axis=2)
+        contributions = np.divide(weighted.sum(axis=2), card_weight, out=np.zeros(groups.shape),
+                                  where=card_weight > 0)
+        return scores, weights, deck_scores, contributions
+
+    def score_deck(self, card_ids, top_pairs=TOP_PAIRS):
+        """
+        Synergy profile of one deck list: the deck score (average score of
+        its pairs of different cards), its best internal pairs and every
+        card's average score with the rest of the deck
+        """
+        cards, counts, unknown = self.resolve(card_ids)
+        scores, weights, deck_scores, contributions = self._score_block(cards[None, :], counts[None, :])
+        scores, weights = scores[0], weights[0]
+
+        rows, cols = np.triu_indices(len(cards), 1)
+        pair_scores = scores[rows, cols]
+        tie_keys = self.table.ids[cards]
+        order = np.lexsort((tie_keys[cols], tie_keys[rows], -pair_scores))[:top_pairs]
+
+        best_pairs = []
+        for rank, pair in enumerate(order.tolist(), 1):
+            idx1, idx2 = int(cards[rows[pair]]), int(cards[cols[pair]])
+            best_pairs.append({
+                'rank': rank,
+                'card1': self.table.summary(idx1),
+                'card2': self.table.summary(idx2),
+                **score_table_pair(self.table, idx1, idx2),
+            })
+
+        card_order = np.lexsort((tie_keys, -contributions[0]))
+        return {
+            'cards': int(counts.sum()),
+            'distinctCards': len(cards),
+            'pairs': int(weights.sum() // 2),
+            'deckScore': round(float(deck_scores[0]), 2),
+            'bestPairs': best_pairs,
+            'contributions': [
+                {'card': self.table.summary(int(cards[idx])), 'copies': int(counts[idx]),
+                 'averageScore': round(float(contributions[0, idx]), 2)}
+                for idx in card_order.tolist()
+            ],
+            'unknownCards': unknown,
+        }
+
+    def score_decks(self, decks, progress=None):
+        """
+        Deck score and best pair of many deck lists, batched in blocks of
+        at most BLOCK_PAIRS pair scores. Returns one summary per deck.
+        """
+        resolved = [self.resolve(card_ids) for card_ids in decks]
+        size = max((len(cards) for cards, _, _ in resolved), default=0)
+        decks_per_block = max(1, BLOCK_PAIRS // max(size * size, 1))
+        summaries = []
+
+        # Without two distinct known cards in any deck there is no pair to score
+        if size < 2:
+            summaries = [{'cards': int(card_counts.sum()), 'deckScore': 0.0, 'bestPair': None,
+                          'unknownCards': len(unknown)} for _, card_counts, unknown in resolved]
+            if progress is not None:
+                progress.update(len(resolved))
+            return summaries
+
+        for start in range(0, len(resolved), decks_per_block):
+            block = resolved[start:start + decks_per_block]
+            groups = np.zeros((len(block), size), dtype=np.intp)
+            counts = np.zeros((len(block), size), dtype=np.int64)
+            for row, (cards, card_counts, _) in enumerate(block):
+                groups[row, :len(cards)] = cards
+                counts[row, :len(cards)] = card_counts
+
+            scores, weights, deck_scores, _ = self._score_block(groups, counts)
+            scores[weights == 0] = -np.inf
+            best = scores.reshape(len(block), -1).argmax(axis=1)
+
+            for row, (cards, card_counts, unknown) in enumerate(block):
+                summary = {
+                    'cards': int(card_counts.sum()),
+                    'deckScore': round(float(deck_scores[row]), 2),
+                    'bestPair': None,
+                    'unknownCards': len(unknown),
+                }
+                if len(cards) > 1:
+                    idx1, idx2 = (int(groups[row, idx]) for idx in divmod(int(best[row]), size))
+                    summary['bestPair'] = [self.table.card_id(idx1), self.table.card_id(idx2),
+                                           score_table_pair(self.table, idx1, idx2)['totalScore']]
+                summaries.append(summary)
+
+            if progress is not None:
+                progress.update(len(block))
+
+        return summaries
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Score the internal synergy of deck lists")
+    parser.add_argument('decks', nargs='+',
+                        help=".ydk files, directories of .ydk files or JSON lines files of decks")
+    parser.add_argument('--top', type=int, default=TOP_PAIRS,
+                        help=f"best pairs listed for a single deck (default: {TOP_PAIRS})")
+    parser.add_argument('--output', default=None, help="write the deck summaries as JSON lines to this file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main execution function"""
+    args = parse_args(argv)
+
+    print("=" * 60)
+    print("Yu-Gi-Oh Combo Rankings - Deck Scoring")
+    print("=" * 60)
+
+    try:
+        decks = [deck for path in args.decks for deck in load_decks(path)]
+    except (OSError, ValueError) as e:
+        print(f"Error loading decks: {e}")
+        return 1
+
+    table = load_card_table(CARDS_FILE)
+    if table is None:
+        print("Failed to load cards. Please run fetch_cards.py first.")
+        return 1
+    scorer = DeckScorer(table)
+
+    if len(decks) == 1:
+        name, card_ids = decks[0]
+        report = scorer.score_deck(card_ids, args.top)
+        print(f"\n{name}: {report['cards']} cards, {report['pairs']:,} pairs")
+        print(f"✓ Deck score: {report['deckScore']:.2f}")
+        if report['unknownCards']:
+            print(f"⚠️  {len(report['unknownCards'])} cards not in the card data: "
+                  f"{', '.join(map(str, report['unknownCards']))}")
+
+        print("\nBest pairs:")
+        for pair in report['bestPairs']:
+            print(f"  {pair['rank']:>3}. {pair['card1']['name']} + {pair['card2']['name']} ({pair['totalScore']:.2f})")
+        print("\nCard contributions (average score with the rest of the deck):")
+        for item in report['contributions']:
+            print(f"  {item['averageScore']:8.2f}  {item['copies']}x {item['card']['name']}")
+        results = [{'name': name, **report}]
+    else:
+        start = time.perf_counter()
+        with tqdm(total=len(decks), desc="Scoring", unit="decks") as pbar:
+            summaries = scorer.score_decks([card_ids for _, card_ids in decks], pbar)
+        elapsed = time.perf_counter() - start
+        print(f"✓ Scored {len(decks):,} decks in {elapsed:.2f}s ({len(decks) / max(elapsed, 1e-9):,.0f} decks/s)")
+
+        results = [{'name': name, **summary} for (name, _), summary in zip(decks, summaries)]
+        for result in sorted(results, key=lambda r: -r['deckScore'])[:10]:
+            print(f"  {result['deckScore']:8.2f}  {result['name']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        print(f"\n✓ Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Yu-Gi-Oh Card Data Fetcher - Raw Response Cache
+Keeps the last cardinfo response on disk with its validators, so refetches are
+conditional, interrupted downloads resume and cards.json can be rebuilt offline
+"""
+
+import json
+import os
+import time
+import zlib
+from datetime import datetime
+
+import requests
+from tqdm import tqdm
+from urllib3.exceptions import HTTPError as TransportError
+
+RAW_CACHE_DIR = "cache/raw"  # Last API response, still content-encoded as sent
+BODY_FILE = 'cardinfo.body'
+PARTIAL_FILE = 'cardinfo.body.part'
+META_FILE = 'cardinfo.meta.json'
+
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30  # Seconds without any data before an attempt fails
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 1.0  # Wait before the first retry, doubled after each one
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DOWNLOAD_CHUNK = 256 * 1024
+
+def read_meta(cache_dir=RAW_CACHE_DIR):
+    """
+    Cache metadata: the url, the complete 'body' and the interrupted
+    'partial' download, each with its ETag, Last-Modified and
+    Content-Encoding. Empty when there is no cache.
+    """
+    try:
+        with open(os.path.join(cache_dir, META_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_meta(cache_dir, meta):
+    path = os.path.join(cache_dir, META_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def has_cached_body(cache_dir=RAW_CACHE_DIR):
+    """Whether a complete response is cached"""
+    return bool(read_meta(cache_dir).get('body')) and os.path.exists(os.path.join(cache_dir, BODY_FILE))
+
+def iter_cached_chunks(cache_dir=RAW_CACHE_DIR, chunk_size=DOWNLOAD_CHUNK):
+    """Decoded bytes of the cached response, chunk by chunk"""
+    encoding = read_meta(cache_dir)['body']['encoding']
+    if encoding == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == 'deflate':
+        decompressor = zlib.decompressobj()
+    elif encoding == 'identity':
+        decompressor = None
+    else:
+        raise ValueError(f"Unsupported content encoding '{encoding}' in the response cache")
+
+    with open(os.path.join(cache_dir, BODY_FILE), 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield decompressor.decompress(chunk) if decompressor else chunk
+    if decompressor:
+        yield decompressor.flush()
+
+def _validators(response):
+    return {
+        'etag': response.headers.get('ETag'),
+        'lastModified': response.headers.get('Last-Modified'),
+        'encoding': response.headers.get('Content-Encoding', 'identity').lower(),
+    }
+
+def _download(url, cache_dir, meta):
+    """One download attempt. Returns False on 304 Not Modified, True once a new body is cached."""
+    body_path = os.path.join(cache_dir, BODY_FILE)
+    partial_path = os.path.join(cache_dir, PARTIAL_FILE)
+
+    # Only encodings iter_cached_chunks can undo
+    headers = {'Accept-Encoding': 'gzip, deflate'}
+    partial = meta.get('partial')
+    offset = os.path.getsize(partial_path) if partial and os.path.exists(partial_path) else 0
+    if offset and (partial['etag'] or partial['lastModified']):
+        # If-Range makes the server send the whole body if it changed since
+        headers['Range'] = f"bytes={offset}-"
+        headers['If-Range'] = partial['etag'] or partial['lastModified']
+    else:
+        offset = 0
+        body = meta.get('body')
+        if body and os.path.exists(body_path):
+            if body['etag']:
+                headers['If-None-Match'] = body['etag']
+            if body['lastModified']:
+                headers['If-Modified-Since'] = body['lastModified']
+
+    with requests.get(url, headers=headers, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+        if response.status_code == 304:
+            return False
+        if response.status_code == 416:
+            # The partial body no longer fits the resource; start over
+            os.remove(partial_path)
+            meta['partial'] = None
+            return _download(url, cache_dir, meta)
+        response.raise_for_status()
+
+        if response.status_code == 206 and offset:
+            mode = 'ab'
+            print(f"Resuming download at {offset:,} bytes...")
+        else:
+            mode, offset = 'wb', 0
+            meta['partial'] = _validators(response)
+            _write_meta(cache_dir, meta)
+
+        length = response.headers.get('Content-Length')
+        total = offset + int(length) if length and length.isdigit() else None
+        with open(partial_path, mode) as f, tqdm(total=total, initial=offset, unit='B', unit_scale=True,
+                                                 desc="Downloading") as pbar:
+            # Keep the content encoding, since byte ranges refer to the encoded body
+            for chunk in response.raw.stream(DOWNLOAD_CHUNK, decode_content=False):
+                f.write(chunk)
+                pbar.update(len(chunk))
+            size = f.tell()
+
+    if total is not None and size < total:
+        raise requests.exceptions.ChunkedEncodingError(f"Connection closed after {size:,} of {total:,} bytes")
+
+    os.replace(partial_path, body_path)
+    meta['body'] = {**meta['partial'], 'size': size, 'fetchedAt': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+    meta['partial'] = None
+    _write_meta(cache_dir, meta)
+    return True
+
+def _retryable(error):
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUSES
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                              requests.exceptions.ChunkedEncodingError, TransportError))
+
+def fetch_to_cache(url, cache_dir=RAW_CACHE_DIR):
+    """
+    Bring the cached response for url up to date. Sends a conditional
+    request when a complete response is cached, and resumes an
+    interrupted download with a Range request. Failed attempts are
+    retried with exponential backoff, each resuming where the last one
+    stopped. Returns True when a new response was downloaded and False
+    when the cached one is still current. Raises RequestException once
+    every attempt has failed.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    meta = read_meta(cache_dir)
+    if meta.get('url') != url:
+        meta = {'url': url, 'body': None, 'partial': None}
+
+    delay = BACKOFF_SECONDS
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return _download(url, cache_dir, meta)
+        except (requests.exceptions.RequestException, TransportError) as e:
+            if not _retryable(e) or attempt == MAX_ATTEMPTS:
+                if isinstance(e, TransportError):
+                    raise requests.exceptions.ConnectionError(str(e)) from e
+                raise
+            print(f"⚠️  Download attempt {attempt} failed ({e}), retrying in {delay:.0f}s...")
+            time.sleep(delay)
+            delay *= 2
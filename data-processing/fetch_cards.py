@@ -3,160 +3,257 @@ Yu-Gi-Oh Card Data Fetcher
 Fetches all card data from YGOPRODeck API and exports to JSON
 """
 
+import argparse
 import requests
 import json
+import os
+import shutil
 import time
 from datetime import datetime
 from tqdm import tqdm
 
+from calculate_rankings import load_card_table
+from fetch_cache import fetch_to_cache, has_cached_body, iter_cached_chunks, read_meta, RAW_CACHE_DIR
+from instrumentation import RunReport, report_path
+from json_stream import iter_json_array
+
 API_URL = "https://db.ygoprodeck.com/api/v7/cardinfo.php"
 OUTPUT_FILE = "../public/cards.json"
+CHUNK_SIZE = 64 * 1024  # Bytes read from the response at a time
 
-def fetch_all_cards():
-    """Fetch all cards from YGOPRODeck API"""
-    print("Fetching card data from YGOPRODeck API...")
-    
+def parse_card(card):
+    """Parse one raw API card, or None if it cannot be parsed"""
     try:
-        response = requests.get(API_URL, timeout=30)
-        response.raise_for_status()
-        data = response.json()
+        # Basic info
+        parsed_card = {
+            'id': str(card.get('id', '')),
+            'name': card.get('name', ''),
+            'type': card.get('type', ''),
+            'desc': card.get('desc', ''),
+            'race': card.get('race', ''),
+            'archetype': card.get('archetype', None),
+        }
         
-        if 'data' not in data:
-            print("Error: Unexpected API response format")
-            return None
+        # Card images
+        if 'card_images' in card and len(card['card_images']) > 0:
+            parsed_card['image_url'] = card['card_images'][0].get('image_url', '')
+            parsed_card['image_url_small'] = card['card_images'][0].get('image_url_small', '')
+        else:
+            parsed_card['image_url'] = ''
+            parsed_card['image_url_small'] = ''
         
-        return data['data']
-    
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching data: {e}")
-        return None
-
-def parse_card_data(raw_cards):
-    """Parse and structure card data"""
-    print(f"\nParsing {len(raw_cards)} cards...")
-    
-    parsed_cards = []
-    
-    for card in tqdm(raw_cards):
-        try:
-            # Basic info
-            parsed_card = {
-                'id': str(card.get('id', '')),
-                'name': card.get('name', ''),
-                'type': card.get('type', ''),
-                'desc': card.get('desc', ''),
-                'race': card.get('race', ''),
-                'archetype': card.get('archetype', None),
-            }
-            
-            # Card images
-            if 'card_images' in card and len(card['card_images']) > 0:
-                parsed_card['image_url'] = card['card_images'][0].get('image_url', '')
-                parsed_card['image_url_small'] = card['card_images'][0].get('image_url_small', '')
-            else:
-                parsed_card['image_url'] = ''
-                parsed_card['image_url_small'] = ''
-            
-            # Monster-specific attributes
-            if 'Monster' in parsed_card['type']:
-                parsed_card['attribute'] = card.get('attribute', '')
-                parsed_card['level'] = card.get('level', None)
-                parsed_card['atk'] = card.get('atk', None)
-                parsed_card['def'] = card.get('def', None)
-                
-                # For XYZ monsters
-                if 'rank' in card:
-                    parsed_card['rank'] = card.get('rank', None)
-                
-                # For Link monsters
-                if 'linkval' in card:
-                    parsed_card['link_value'] = card.get('linkval', None)
-                    parsed_card['linkmarkers'] = card.get('linkmarkers', [])
-                
-                # For Pendulum monsters
-                if 'scale' in card:
-                    parsed_card['scale'] = card.get('scale', None)
+        # Monster-specific attributes
+        if 'Monster' in parsed_card['type']:
+            parsed_card['attribute'] = card.get('attribute', '')
+            parsed_card['level'] = card.get('level', None)
+            parsed_card['atk'] = card.get('atk', None)
+            parsed_card['def'] = card.get('def', None)
             
-            # Spell/Trap specific
-            elif 'Spell' in parsed_card['type'] or 'Trap' in parsed_card['type']:
-                # Race field contains the spell/trap type (e.g., "Quick-Play", "Counter")
-                parsed_card['card_subtype'] = parsed_card['race']
+            # For XYZ monsters
+            if 'rank' in card:
+                parsed_card['rank'] = card.get('rank', None)
             
-            parsed_cards.append(parsed_card)
+            # For Link monsters
+            if 'linkval' in card:
+                parsed_card['link_value'] = card.get('linkval', None)
+                parsed_card['linkmarkers'] = card.get('linkmarkers', [])
             
-        except Exception as e:
-            print(f"\nError parsing card {card.get('name', 'Unknown')}: {e}")
-            continue
-    
-    return parsed_cards
+            # For Pendulum monsters
+            if 'scale' in card:
+                parsed_card['scale'] = card.get('scale', None)
+        
+        # Spell/Trap specific
+        elif 'Spell' in parsed_card['type'] or 'Trap' in parsed_card['type']:
+            # Race field contains the spell/trap type (e.g., "Quick-Play", "Counter")
+            parsed_card['card_subtype'] = parsed_card['race']
+        
+        return parsed_card
+        
+    except Exception as e:
+        print(f"\nError parsing card {card.get('name', 'Unknown')}: {e}")
+        return None
 
-def export_to_json(cards):
-    """Export cards to JSON file"""
-    print(f"\nExporting {len(cards)} cards to {OUTPUT_FILE}...")
-    
-    output_data = {
-        'metadata': {
-            'totalCards': len(cards),
-            'fetchDate': datetime.now().strftime('%Y-%m-%d'),
-            'apiVersion': 'v7',
-            'source': 'YGOPRODeck API'
-        },
-        'cards': cards
+def card_metadata(total_cards, source=API_URL):
+    """Metadata block of cards.json"""
+    return {
+        'totalCards': total_cards,
+        'fetchDate': datetime.now().strftime('%Y-%m-%d'),
+        'apiVersion': 'v7',
+        'source': 'YGOPRODeck API' if source == API_URL else source
     }
+
+def iter_file_chunks(path, chunk_size=CHUNK_SIZE):
+    """Raw bytes of a saved cardinfo response, chunk by chunk"""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+def stream_cards_to_json(chunks, output_file, source=API_URL, compact=False):
+    """
+    Parse a cardinfo response one card at a time and write the cards
+    straight to output_file, laid out as json.dump(..., indent=2) would
+    (or without any whitespace when compact). Only one raw and one parsed
+    card are held in memory. Returns the number of cards of each kind
+    written.
+    """
+    counts = {'Monster': 0, 'Spell': 0, 'Trap': 0, 'Total': 0}
     
+    # The card count heads the file, so cards go to a side file first
+    body_file = output_file + '.cards.tmp'
+    staging_file = output_file + '.tmp'
     try:
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"✓ Successfully exported cards to {OUTPUT_FILE}")
+        with open(body_file, 'w', encoding='utf-8') as body:
+            for raw_card in tqdm(iter_json_array(chunks, 'data'), unit="cards"):
+                card = parse_card(raw_card)
+                if card is None:
+                    continue
+                
+                if compact:
+                    body.write(',' if counts['Total'] else '')
+                    body.write(json.dumps(card, ensure_ascii=False, separators=(',', ':')))
+                else:
+                    # Indented as json.dump(..., indent=2) nests it in the cards list
+                    body.write(',\n    ' if counts['Total'] else '\n    ')
+                    body.write(json.dumps(card, ensure_ascii=False, indent=2).replace('\n', '\n    '))
+                
+                counts['Total'] += 1
+                for kind in ('Monster', 'Spell', 'Trap'):
+                    if kind in card['type']:
+                        counts[kind] += 1
         
-        # Print file size
-        import os
-        file_size = os.path.getsize(OUTPUT_FILE) / (1024 * 1024)  # Convert to MB
-        print(f"✓ File size: {file_size:.2f} MB")
+        metadata = {'metadata': card_metadata(counts['Total'], source)}
+        with open(staging_file, 'w', encoding='utf-8') as f, open(body_file, 'r', encoding='utf-8') as body:
+            if compact:
+                f.write(json.dumps(metadata, ensure_ascii=False, separators=(',', ':'))[:-1] + ',"cards":[')
+                shutil.copyfileobj(body, f)
+                f.write(']}')
+            else:
+                f.write(json.dumps(metadata, ensure_ascii=False, indent=2)[:-2] + ',\n  "cards": [')
+                shutil.copyfileobj(body, f)
+                f.write('\n  ]\n}' if counts['Total'] else ']\n}')
         
-        return True
+        # Replace the old file only once the new one is complete
+        os.replace(staging_file, output_file)
+    finally:
+        for path in (body_file, staging_file):
+            if os.path.exists(path):
+                os.remove(path)
     
-    except Exception as e:
+    return counts
+
+def download_cards(url):
+    """Update the raw response cache from url: True if new data came in, False if unchanged, None on failure"""
+    print(f"Fetching card data from {url}...")
+    
+    try:
+        changed = fetch_to_cache(url)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching data: {e}")
+        if has_cached_body():
+            print("   Run with --from-cache to rebuild the cards from the last download")
+        return None
+    
+    if changed:
+        print(f"✓ Downloaded {read_meta()['body']['size'] / (1024 * 1024):.2f} MB")
+    return changed
+
+def export_cards_streaming(chunks, output_file, source, compact=False):
+    """Stream the cards of a cardinfo response into output_file; None on failure"""
+    print(f"\nParsing and exporting cards to {output_file}...")
+    
+    try:
+        counts = stream_cards_to_json(chunks, output_file, source, compact)
+    except ValueError as e:
+        print(f"Error: Unexpected API response format ({e})")
+        return None
+    except OSError as e:
         print(f"Error exporting to JSON: {e}")
-        return False
+        return None
+    
+    print(f"✓ Successfully exported {counts['Total']} cards to {output_file}")
+    file_size = os.path.getsize(output_file) / (1024 * 1024)
+    print(f"✓ File size: {file_size:.2f} MB")
+    return counts
 
-def main():
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Fetch all cards from the YGOPRODeck API")
+    parser.add_argument('--source', default=API_URL,
+                        help="cardinfo URL or a local file holding a saved API response (default: the API)")
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help=f"cards file to write (default: {OUTPUT_FILE})")
+    parser.add_argument('--from-cache', action='store_true',
+                        help=f"rebuild the cards from the last downloaded response in {RAW_CACHE_DIR}, offline")
+    parser.add_argument('--compact', action='store_true',
+                        help="write cards.json without indentation")
+    parser.add_argument('--profile', metavar='STAGE', default=None,
+                        help="profile one stage with cProfile (download, export, json_load or card_scoring)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main execution function"""
+    args = parse_args(argv)
+    run = RunReport('fetch_cards', args.profile)
+    
     print("=" * 60)
     print("Yu-Gi-Oh Card Data Fetcher")
     print("=" * 60)
     
-    # Fetch cards
-    raw_cards = fetch_all_cards()
-    if not raw_cards:
-        print("Failed to fetch cards. Exiting.")
+    if args.from_cache:
+        if not has_cached_body():
+            print(f"No cached API response in {RAW_CACHE_DIR}. Run fetch_cards.py online first.")
+            return
+        body = read_meta()['body']
+        print(f"Using the cached API response from {body['fetchedAt']}")
+        chunks, source = iter_cached_chunks(), read_meta()['url']
+    elif args.source.startswith(('http://', 'https://')):
+        # Conditional request: nothing to do when the cached response is current
+        with run.stage('download'):
+            changed = download_cards(args.source)
+        if changed is None:
+            print("Failed to fetch cards. Exiting.")
+            return
+        if not changed and os.path.exists(args.output):
+            print(f"✓ Card data unchanged since the last fetch, keeping {args.output}")
+            run.info['notModified'] = True
+            run.print_summary()
+            run.write(report_path(args.output))
+            return
+        chunks, source = iter_cached_chunks(), args.source
+    else:
+        chunks, source = iter_file_chunks(args.source), args.source
+    
+    # Parse and export in one streaming pass
+    with run.stage('export'):
+        counts = export_cards_streaming(chunks, args.output, source, args.compact)
+    if not counts:
+        print("Failed to export cards. Exiting.")
         return
     
-    print(f"✓ Successfully fetched {len(raw_cards)} cards")
+    # Pre-build the binary card cache so ranking runs skip JSON parsing
+    print()
+    if load_card_table(args.output, run=run) is None:
+        print("⚠️  Card cache could not be built")
+    else:
+        print(f"✓ Card cache written")
     
-    # Parse cards
-    parsed_cards = parse_card_data(raw_cards)
-    print(f"✓ Successfully parsed {len(parsed_cards)} cards")
+    print("\n" + "=" * 60)
+    print("Card data fetch complete!")
+    print("=" * 60)
     
-    # Export to JSON
-    success = export_to_json(parsed_cards)
+    # Print some statistics
+    print(f"\nCard Statistics:")
+    print(f"  Monsters: {counts['Monster']}")
+    print(f"  Spells:   {counts['Spell']}")
+    print(f"  Traps:    {counts['Trap']}")
+    print(f"  Total:    {counts['Total']}")
     
-    if success:
-        print("\n" + "=" * 60)
-        print("Card data fetch complete!")
-        print("=" * 60)
-        
-        # Print some statistics
-        monster_count = sum(1 for c in parsed_cards if 'Monster' in c['type'])
-        spell_count = sum(1 for c in parsed_cards if 'Spell' in c['type'])
-        trap_count = sum(1 for c in parsed_cards if 'Trap' in c['type'])
-        
-        print(f"\nCard Statistics:")
-        print(f"  Monsters: {monster_count}")
-        print(f"  Spells:   {spell_count}")
-        print(f"  Traps:    {trap_count}")
-        print(f"  Total:    {len(parsed_cards)}")
+    run.info['totalCards'] = counts['Total']
+    run.print_summary()
+    run.write(report_path(args.output))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,131 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Run Instrumentation
+Times pipeline stages, tracks peak memory and throughput, profiles a chosen
+stage and writes a machine-readable run report
+"""
+
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_LINES = 25  # Functions printed for a profiled stage
+
+def cpu_seconds():
+    """CPU time of this process and its finished worker processes"""
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system
+
+def peak_rss_bytes(who='self'):
+    """Peak resident set size so far (who: 'self' or 'children'), or None where unavailable"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == 'self' else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+def report_path(output_file):
+    """Run report written next to an output file: rankings.json -> rankings.report.json"""
+    return os.path.splitext(output_file)[0] + '.report.json'
+
+class RunReport:
+    """
+    Stage timings of one script run.
+
+    Wrap each stage in `with run.stage(name):`. Every stage records wall and
+    CPU time and the peak RSS reached by its end; a stage given a pair
+    count also records pairs per second. The stage named profile_stage
+    runs under cProfile, and its stats are dumped next to the report.
+    """
+
+    def __init__(self, script, profile_stage=None):
+        self.script = script
+        self.profile_stage = profile_stage
+        self.stages = []
+        self.info = {}
+        self.start_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._wall = time.perf_counter()
+        self._cpu = cpu_seconds()
+        self._profile = None
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """Time the enclosed block; fields (e.g. pairs=...) may also be set on the yielded record"""
+        record = {'name': name, **fields}
+        profiler = cProfile.Profile() if name == self.profile_stage else None
+        wall, cpu = time.perf_counter(), cpu_seconds()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._profile = profiler
+            record['wallSeconds'] = time.perf_counter() - wall
+            record['cpuSeconds'] = cpu_seconds() - cpu
+            record['peakRssBytes'] = peak_rss_bytes()
+            if record.get('pairs') is not None:
+                record['pairsPerSecond'] = record['pairs'] / max(record['wallSeconds'], 1e-9)
+            self.stages.append(record)
+
+    def to_dict(self):
+        """The run report as JSON-ready data"""
+        return {
+            'script': self.script,
+            'startDate': self.start_date,
+            'wallSeconds': time.perf_counter() - self._wall,
+            'cpuSeconds': cpu_seconds() - self._cpu,
+            'peakRssBytes': peak_rss_bytes(),
+            'peakChildRssBytes': peak_rss_bytes('children'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpuCount': os.cpu_count(),
+            **self.info,
+            'stages': self.stages,
+        }
+
+    def print_summary(self):
+        """Print one line per stage"""
+        print("\nStage timings:")
+        for record in self.stages:
+            line = f"  {record['name']:<14} {record['wallSeconds']:8.2f}s wall {record['cpuSeconds']:8.2f}s CPU"
+            if record.get('pairsPerSecond') is not None:
+                line += f"  {record['pairsPerSecond']:,.0f} pairs/s"
+            print(line)
+        peak = peak_rss_bytes()
+        if peak is not None:
+            print(f"  Peak memory: {peak / (1024 * 1024):.0f} MB")
+
+    def write(self, path):
+        """Write the run report (and the profile of profile_stage, if it ran) next to path's name"""
+        report = self.to_dict()
+        if self.profile_stage is not None:
+            if self._profile is None:
+                names = ', '.join(record['name'] for record in self.stages)
+                print(f"\n⚠️  No stage named '{self.profile_stage}' ran (stages: {names})")
+            else:
+                report['profile'] = self._dump_profile(os.path.splitext(path)[0])
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Run report written to {path}")
+
+    def _dump_profile(self, prefix):
+        profile_file = f"{prefix}.{self.profile_stage}.prof"
+        self._profile.dump_stats(profile_file)
+
+        print(f"\nProfile of stage '{self.profile_stage}' (by cumulative time):")
+        pstats.Stats(self._profile, stream=sys.stdout).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        print(f"✓ Profile written to {profile_file} (open with python -m pstats)")
+        return profile_file
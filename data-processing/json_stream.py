@@ -0,0 +1,95 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Streaming JSON Reader
+Yields the elements of a large JSON array one at a time from a stream of byte
+chunks, so a response never has to be held in memory whole
+"""
+
+import codecs
+import json
+
+WHITESPACE = ' \t\n\r'
+
+class _ChunkReader:
+    """Text buffer over byte chunks that only keeps the unconsumed tail"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _more(self):
+        """Append the next chunk to the buffer; False at the end of the stream"""
+        if self.eof:
+            return False
+        chunk = next(self._chunks, None)
+        text = self._text.decode(b'' if chunk is None else chunk, final=chunk is None)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        self.eof = chunk is None
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or '' at the end of the stream"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._more():
+                return ''
+
+    def expect(self, chars):
+        """Consume the next character, which must be one of chars"""
+        char = self.peek()
+        if not char or char not in chars:
+            found = repr(char) if char else 'end of stream'
+            raise ValueError(f"Expected one of {chars!r} but found {found}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+                # A number running into the end of the buffer may continue in
+                # the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._more()
+
+def iter_json_array(chunks, key):
+    """
+    Yield the elements of the array stored under key in a top-level JSON
+    object, read from an iterable of UTF-8 byte chunks. Only the current
+    element is decoded at a time; other keys' values are skipped.
+    Raises ValueError when the stream is not such an object.
+    """
+    reader = _ChunkReader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        raise ValueError(f"No '{key}' array in the response")
+
+    while True:
+        name = reader.value()
+        reader.expect(':')
+        if name == key:
+            reader.expect('[')
+            if reader.peek() == ']':
+                return
+            while True:
+                yield reader.value()
+                if reader.expect(',]') == ']':
+                    return
+
+        reader.value()
+        if reader.expect(',}') == '}':
+            raise ValueError(f"No '{key}' array in the response")
@@ -0,0 +1,179 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Vectorized Pair Engine
+Scores blocks of the pair matrix with NumPy instead of one pair at a time
+"""
+
+import numpy as np
+
+# Upper bound on the number of pair scores held in memory per block
+BLOCK_PAIRS = 4_000_000
+
+class PairEngine:
+    """
+    Scores card pairs as NumPy matrices from precomputed per-card data.
+
+    The total score of a pair is the weighted sum of the averaged metric
+    vectors times a synergy multiplier, and the multiplier only depends on a
+    handful of per-card features, so a whole block of pairs can be scored
+    with broadcast arithmetic. Every operation is applied in the same order
+    as combine_card_vectors, so block scores match score_combination
+    exactly before rounding.
+    """
+
+    def __init__(self, metrics, archetype, flags, weights):
+        """
+        metrics:   (cards x metrics) float array, columns in METRICS order
+        archetype: per-card archetype code, -1 for no archetype
+        flags:     (cards x 5) bool array of monster, equip, quick-play/trap,
+                   search/add and special summon flags
+        weights:   metric weights in METRICS order
+        """
+        self.metrics = np.asarray(metrics, dtype=np.float64)
+        self.archetype = np.asarray(archetype, dtype=np.int32)
+        self.flags = np.asarray(flags, dtype=bool)
+        self.weights = [float(w) for w in weights]
+
+        # One contiguous column per metric keeps the per-metric gathers cheap
+        self.columns = [np.ascontiguousarray(self.metrics[:, m]) for m in range(len(self.weights))]
+
+        self.monster = np.ascontiguousarray(self.flags[:, 0])
+        self.equip = np.ascontiguousarray(self.flags[:, 1])
+        self.reactive = np.ascontiguousarray(self.flags[:, 2])
+        self.search = np.ascontiguousarray(self.flags[:, 3])
+        self.summon = np.ascontiguousarray(self.flags[:, 4])
+
+    def __len__(self):
+        return len(self.metrics)
+
+    def take(self, indices):
+        """Engine over only the cards at indices (in that order)"""
+        indices = self._indices(indices)
+        return PairEngine(self.metrics[indices], self.archetype[indices], self.flags[indices], self.weights)
+
+    def _indices(self, index):
+        """Turn a slice or index sequence into an index array"""
+        if isinstance(index, slice):
+            return np.arange(len(self))[index]
+        return np.asarray(index, dtype=np.intp)
+
+    def _multipliers(self, rows, cols):
+        """Synergy multipliers for broadcast-compatible index arrays"""
+        arch_r = self.archetype[rows]
+        arch_c = self.archetype[cols]
+        multiplier = np.ones(np.broadcast_shapes(rows.shape, cols.shape))
+
+        same_archetype = (arch_r == arch_c) & (arch_r >= 0)
+        np.multiply(multiplier, 1.5, out=multiplier, where=same_archetype)
+
+        monster_r = self.monster[rows]
+        monster_c = self.monster[cols]
+
+        equip_pair = (monster_r & self.equip[cols]) | (monster_c & self.equip[rows])
+        np.multiply(multiplier, 1.2, out=multiplier, where=equip_pair)
+
+        reactive_pair = (monster_r & self.reactive[cols]) | (monster_c & self.reactive[rows])
+        np.multiply(multiplier, 1.15, out=multiplier, where=reactive_pair)
+
+        search_summon = (self.search[rows] & self.summon[cols]) | (self.search[cols] & self.summon[rows])
+        np.multiply(multiplier, 1.3, out=multiplier, where=search_summon)
+
+        return np.minimum(multiplier, 2.0, out=multiplier)
+
+    def _weighted_totals(self, rows, cols):
+        """Weighted sum of the averaged metrics for broadcast-compatible index arrays"""
+        shape = np.broadcast_shapes(rows.shape, cols.shape)
+        total = np.zeros(shape)
+        term = np.empty(shape)
+
+        for column, weight in zip(self.columns, self.weights):
+            np.add(column[rows], column[cols], out=term)
+            term /= 2
+            term *= weight
+            total += term
+
+        return total
+
+    def _scores(self, rows, cols):
+        total = self._weighted_totals(rows, cols)
+        total *= self._multipliers(rows, cols)
+        return total
+
+    def card_totals(self):
+        """
+        Weighted metric total of every card on its own. A pair's total before
+        the synergy multiplier is the mean of its two card totals.
+        """
+        total = np.zeros(len(self))
+        for column, weight in zip(self.columns, self.weights):
+            total += column * weight
+        return total
+
+    def max_multipliers(self):
+        """Largest synergy multiplier each card can reach with any partner"""
+        bound = np.ones(len(self))
+        bound[self.archetype >= 0] *= 1.5
+        bound[self.monster | self.equip] *= 1.2
+        bound[self.monster | self.reactive] *= 1.15
+        bound[self.search | self.summon] *= 1.3
+        return np.minimum(bound, 2.0)
+
+    def nonnegative(self):
+        """Whether every weight and metric is >= 0, which score bounds rely on"""
+        return min(self.weights, default=0.0) >= 0 and (len(self) == 0 or self.metrics.min() >= 0)
+
+    def multipliers(self, rows, cols):
+        """Synergy multiplier matrix for rows x cols (index arrays or slices)"""
+        return self._multipliers(self._indices(rows)[:, None], self._indices(cols)[None, :])
+
+    def score_block(self, rows, cols):
+        """Unrounded total scores for every pair in rows x cols (index arrays or slices)"""
+        return self._scores(self._indices(rows)[:, None], self._indices(cols)[None, :])
+
+    def pair_multipliers(self, rows, cols):
+        """Synergy multipliers for the pairs (rows[k], cols[k])"""
+        return self._multipliers(self._indices(rows), self._indices(cols))
+
+    def score_pairs(self, rows, cols):
+        """Unrounded total scores for the pairs (rows[k], cols[k])"""
+        return self._scores(self._indices(rows), self._indices(cols))
+
+    def score_groups(self, groups):
+        """
+        Unrounded scores of every pair within each row of a (groups x size)
+        index array, as a groups x size x size array
+        """
+        groups = np.asarray(groups, dtype=np.intp)
+        return self._scores(groups[:, :, None], groups[:, None, :])
+
+    def iter_upper_blocks(self, block_pairs=BLOCK_PAIRS, row_start=0, row_stop=None):
+        """
+        Walk the upper triangle (i < j) in strips of consecutive rows,
+        optionally limited to rows [row_start, row_stop).
+
+        Yields (row_start, col_start, scores, pair_count) where scores[r, c]
+        is the score of pair (row_start + r, col_start + c). Entries on or
+        below the diagonal are set to -inf. Strips are sized so a block holds
+        at most block_pairs scores, and pairs come out in the same row-major
+        order as itertools.combinations.
+        """
+        n = len(self)
+        row_stop = n - 1 if row_stop is None else min(row_stop, n - 1)
+        rows_per_block = max(1, block_pairs // max(n, 1))
+
+        for block_start in range(row_start, row_stop, rows_per_block):
+            block_stop = min(block_start + rows_per_block, row_stop)
+            col_start = block_start + 1
+
+            scores = self.score_block(slice(block_start, block_stop), slice(col_start, n))
+
+            # Mask out j <= i inside the strip
+            row_ids = np.arange(block_start, block_stop)[:, None]
+            col_ids = np.arange(col_start, n)[None, :]
+            scores[col_ids <= row_ids] = -np.inf
+
+            yield block_start, col_start, scores, upper_pair_count(n, block_start, block_stop)
+
+def upper_pair_count(n, row_start, row_stop):
+    """Number of upper-triangle pairs (i < j < n) with row_start <= i < row_stop"""
+    rows = row_stop - row_start
+    return rows * (n - 1) - (row_start + row_stop - 1) * rows // 2
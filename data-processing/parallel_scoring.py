@@ -0,0 +1,151 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Multi-core Pair Scoring
+Shards the upper pair triangle across a process pool
+"""
+
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+from tqdm import tqdm
+
+from pair_engine import PairEngine, upper_pair_count
+from pruning import PrunedScan
+from topk import TopK
+
+# Shards per worker; more shards than workers keeps the pool busy and the
+# progress bar moving without changing the result
+SHARDS_PER_WORKER = 8
+
+# Per-process state, set up once by _init_worker
+_worker = {}
+
+def balanced_row_ranges(n, shards):
+    """
+    Split the rows of the upper triangle into at most `shards` contiguous
+    ranges holding roughly the same number of pairs each
+    """
+    if n < 2:
+        return []
+
+    # Row i owns n - 1 - i pairs, so early rows are much heavier than late ones
+    pairs_per_row = np.arange(n - 1, 0, -1, dtype=np.int64)
+    cumulative = np.cumsum(pairs_per_row)
+    targets = cumulative[-1] * np.arange(1, shards) / shards
+    cuts = np.searchsorted(cumulative, targets, side='left') + 1
+
+    bounds = sorted(set([0, *cuts.tolist(), n - 1]))
+    return [(start, stop) for start, stop in zip(bounds, bounds[1:]) if start < stop]
+
+class SharedEngineArrays:
+    """
+    Copies a PairEngine's per-card arrays into shared memory once, so
+    workers map the same pages instead of receiving pickled copies
+    """
+
+    FIELDS = ('metrics', 'archetype', 'flags')
+
+    def __init__(self, engine):
+        self.segments = []
+        self.spec = {'weights': engine.weights, 'arrays': {}}
+
+        for field in self.FIELDS:
+            array = getattr(engine, field)
+            segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+            view[...] = array
+            self.segments.append(segment)
+            self.spec['arrays'][field] = (segment.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def attach_engine(spec):
+    """Rebuild a read-only PairEngine on top of the shared segments"""
+    segments = []
+    arrays = {}
+    for field, (name, shape, dtype) in spec['arrays'].items():
+        segment = shared_memory.SharedMemory(name=name)
+        segments.append(segment)
+        arrays[field] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+    engine = PairEngine(arrays['metrics'], arrays['archetype'], arrays['flags'], spec['weights'])
+    return engine, segments
+
+def _init_worker(spec, tie_keys, top_n, candidate_floor, prune, min_cutoff):
+    engine, segments = attach_engine(spec)
+    _worker.update(
+        engine=engine,
+        scan=PrunedScan(engine) if prune else None,
+        min_cutoff=min_cutoff,
+        segments=segments,
+        tie_keys=tie_keys,
+        top_n=top_n,
+        candidate_floor=candidate_floor,
+    )
+
+def _score_shard(row_range):
+    """Score one row range into a local TopK and return its survivors"""
+    row_start, row_stop = row_range
+    engine = _worker['engine']
+    candidate_floor = _worker['candidate_floor']
+    top = TopK(_worker['top_n'], _worker['tie_keys'])
+
+    if _worker['scan'] is not None:
+        # Row ranges index the scan's sorted rows
+        scored_count, scored_pairs = _worker['scan'].run(top, candidate_floor, row_start, row_stop,
+                                                         min_cutoff=_worker['min_cutoff'])
+    else:
+        scored_count = 0
+        for block_start, col_start, scores, _ in engine.iter_upper_blocks(row_start=row_start, row_stop=row_stop):
+            rows, cols = np.nonzero(scores >= candidate_floor)
+            scored_count += len(rows)
+            top.push_block(scores[rows, cols], rows + block_start, cols + col_start)
+        scored_pairs = None
+
+    pair_count = upper_pair_count(len(engine), row_start, row_stop)
+    return top.results(), scored_count, scored_pairs, pair_count
+
+def select_top_pairs_parallel(engine, tie_keys, top_n, candidate_floor, workers, prune=False):
+    """
+    Score the upper triangle on `workers` processes.
+    Each shard keeps a local TopK; merging them gives exactly the same
+    winners as a single-process run because TopK ordering is total.
+    With prune, every shard runs a PrunedScan over its rows.
+    Returns the (score, idx1, idx2) winners and the count of pairs that
+    reached candidate_floor.
+    """
+    n = len(engine)
+    total_pairs = n * (n - 1) // 2
+    row_ranges = balanced_row_ranges(n, workers * SHARDS_PER_WORKER)
+    top = TopK(top_n, tie_keys)
+    scored_count = 0
+    scored_pairs = 0
+
+    # Shards start with an empty TopK; seed their pruning with a cutoff
+    # every shard can share
+    min_cutoff = PrunedScan(engine).seed_cutoff(top_n, candidate_floor) if prune else -np.inf
+
+    with SharedEngineArrays(engine) as shared:
+        init_args = (shared.spec, top.tie_keys, top_n, candidate_floor, prune, min_cutoff)
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+            with tqdm(total=total_pairs, desc=f"Processing ({workers} workers)", unit="pairs", unit_scale=True) as pbar:
+                for shard_winners, shard_scored, shard_pairs, pair_count in pool.imap_unordered(_score_shard, row_ranges):
+                    for score, idx1, idx2 in shard_winners:
+                        top.push(score, idx1, idx2)
+                    scored_count += shard_scored
+                    scored_pairs += shard_pairs or 0
+                    pbar.update(pair_count)
+
+    if prune:
+        print(f"✓ Pruning scored {scored_pairs:,} of {total_pairs:,} pairs")
+
+    return top.results(), scored_count
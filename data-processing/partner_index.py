@@ -0,0 +1,276 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Per-Card Partner Index
+Stores the exact top-M partners of every card as fixed-size binary records,
+so "what pairs best with this card?" is a single record read
+"""
+
+import argparse
+import multiprocessing
+import os
+import struct
+import sys
+
+import numpy as np
+from tqdm import tqdm
+
+from pair_engine import BLOCK_PAIRS
+from parallel_scoring import SharedEngineArrays, attach_engine, SHARDS_PER_WORKER
+from pruning import PrunedScan, BOUND_SLACK
+
+PARTNER_COUNT = 20  # Partners stored per card
+FIRST_PREFIX = 512  # Highest-total cards every card is scored against first
+PREFIX_GROWTH = 2  # Factor the prefix grows by for cards it cannot settle
+SHARD_CARDS = 4096  # Cards per shard on a single process (bounds the progress steps)
+# magic, format version, partners per card (M), card count
+HEADER = struct.Struct('<8sIIQ')
+MAGIC = b'YGOPARTS'
+INDEX_VERSION = 1
+
+# Per-process state, set up once by _init_worker
+_worker = {}
+
+def record_dtype(m):
+    """
+    One card's record: partner table indices (-1 when the card has fewer
+    than m partners) and pair scores in hundredths, best first
+    """
+    return np.dtype([('partner', '<i4', (m,)), ('score', '<i4', (m,))])
+
+def top_partners(scores, tie_keys, m):
+    """
+    Exact top-m columns of every row of a score block, best first. Equal
+    scores are ordered by tie_keys (smaller first), like TopK, including
+    ties that straddle the cut. Entries that must not be picked (the card
+    itself) have to be -inf, and every row needs at least m others.
+    Returns a (rows x m) array of column indices.
+    """
+    n = scores.shape[1]
+    cut = np.argpartition(scores, n - m, axis=1)[:, n - m:]
+    cut_scores = np.take_along_axis(scores, cut, axis=1)
+
+    # Rows with more candidates at the m-th score than places left need
+    # the tie keys to decide which ones stay
+    kth = cut_scores.min(axis=1)
+    straddling = np.count_nonzero(scores >= kth[:, None], axis=1) > m
+    for row in np.flatnonzero(straddling):
+        candidates = np.flatnonzero(scores[row] >= kth[row])
+        order = np.lexsort((tie_keys[candidates], -scores[row, candidates]))
+        cut[row] = candidates[order[:m]]
+    cut_scores = np.take_along_axis(scores, cut, axis=1)
+
+    order = np.lexsort((tie_keys[cut], -cut_scores), axis=1)
+    return np.take_along_axis(cut, order, axis=1)
+
+def centi_scores(scores):
+    """Scores rounded like score_combination's totalScore, as integer hundredths"""
+    return np.array([round(round(score, 2) * 100) for score in scores.ravel().tolist()],
+                    dtype=np.int32).reshape(scores.shape)
+
+def partner_records(engine, scan, tie_keys, m, start, stop, block_pairs=BLOCK_PAIRS):
+    """
+    Top-m partner records of the cards at positions [start, stop) of
+    scan.order, which lists cards by weighted total, highest first.
+
+    With non-negative scores, PrunedScan.partner_bound caps what a card
+    can score with any partner outside the first `prefix` sorted cards.
+    Each card is scored against a prefix only, and the prefix grows until
+    that bound falls below its m-th best score, so the records are exact. scan is
+    None when the bound does not hold; every card is then scored against
+    all others. Returns the table indices of the cards, their records and
+    the number of pair scores computed.
+    """
+    n = len(engine)
+    kept = min(m, max(n - 1, 0))
+    order = scan.order if scan is not None else np.arange(n)
+    positions = np.arange(start, stop)
+    records = np.zeros(len(positions), dtype=record_dtype(m))
+    records['partner'] = -1
+    scored_pairs = 0
+    if not kept:
+        return order[positions], records, scored_pairs
+
+    first_prefix = n if scan is None else min(n, max(FIRST_PREFIX, 2 * (kept + 1)))
+    best_cards = np.zeros((len(positions), kept), dtype=np.intp)
+    best_scores = np.zeros((len(positions), kept))
+    pending = np.arange(len(positions))
+    scored = 0
+
+    while len(pending):
+        prefix = min(n, max(first_prefix, scored * PREFIX_GROWTH))
+        cols = order[scored:prefix]
+        rows_per_block = max(1, block_pairs // len(cols))
+
+        for block_start in range(0, len(pending), rows_per_block):
+            block = pending[block_start:block_start + rows_per_block]
+            rows = order[positions[block]]
+            scores = engine.score_block(rows, cols)
+            scores[rows[:, None] == cols[None, :]] = -np.inf
+            scored_pairs += scores.size
+
+            # Best partners among the new columns, merged with the best so far
+            picks = top_partners(scores, tie_keys[cols], min(kept, len(cols)))
+            cards = cols[picks]
+            card_scores = np.take_along_axis(scores, picks, axis=1)
+            if scored:
+                cards = np.hstack([best_cards[block], cards])
+                card_scores = np.hstack([best_scores[block], card_scores])
+                merged = np.lexsort((tie_keys[cards], -card_scores), axis=1)[:, :kept]
+                cards = np.take_along_axis(cards, merged, axis=1)
+                card_scores = np.take_along_axis(card_scores, merged, axis=1)
+            best_cards[block] = cards
+            best_scores[block] = card_scores
+
+        if prefix < n:
+            # Best score any card past the prefix could reach
+            bound = scan.partner_bound(positions[pending], prefix)
+            done = bound * (1 + BOUND_SLACK) + BOUND_SLACK < best_scores[pending, -1]
+        else:
+            done = np.ones(len(pending), dtype=bool)
+        pending = pending[~done]
+        scored = prefix
+
+    records['partner'][:, :kept] = best_cards
+    records['score'][:, :kept] = centi_scores(best_scores)
+    return order[positions], records, scored_pairs
+
+def _init_worker(spec, tie_keys, m, prune):
+    engine, segments = attach_engine(spec)
+    _worker.update(engine=engine, scan=PrunedScan(engine) if prune else None,
+                   tie_keys=tie_keys, m=m, segments=segments)
+
+def _partner_shard(position_range):
+    """Partner records of one range of sorted positions"""
+    start, stop = position_range
+    return partner_records(_worker['engine'], _worker['scan'], _worker['tie_keys'], _worker['m'], start, stop)
+
+def write_partner_index(engine, tie_keys, path, m=PARTNER_COUNT, workers=1, prune=True):
+    """
+    Find the exact top-m partners of every card and write them to path.
+    Ties are broken by tie_keys (card ids), which are also stored in the
+    file. With prune, partners that provably cannot make a card's top-m
+    are never scored; with workers > 1 the cards are sharded across a
+    process pool like select_top_pairs. The file is replaced as a whole.
+    Returns the number of bytes written and of pair scores computed.
+    """
+    n = len(engine)
+    tie_keys = np.asarray(tie_keys, dtype=np.int64)
+    prune = prune and engine.nonnegative()
+    records = np.zeros(n, dtype=record_dtype(m))
+    scored_pairs = 0
+
+    # Low-total cards need the longest prefixes, so more shards than
+    # workers keep the pool busy until the end
+    shard_count = max(1, workers * SHARDS_PER_WORKER) if workers > 1 else max(1, -(-n // SHARD_CARDS))
+    bounds = np.linspace(0, n, shard_count + 1).astype(int)
+    shards = [(start, stop) for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()) if start < stop]
+
+    with tqdm(total=n, desc="Partners", unit="cards") as pbar:
+        if workers > 1:
+            with SharedEngineArrays(engine) as shared:
+                init_args = (shared.spec, tie_keys, m, prune)
+                with multiprocessing.Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+                    for rows, shard_records, shard_pairs in pool.imap_unordered(_partner_shard, shards):
+                        records[rows] = shard_records
+                        scored_pairs += shard_pairs
+                        pbar.update(len(rows))
+        else:
+            scan = PrunedScan(engine) if prune else None
+            for start, stop in shards:
+                rows, shard_records, shard_pairs = partner_records(engine, scan, tie_keys, m, start, stop)
+                records[rows] = shard_records
+                scored_pairs += shard_pairs
+                pbar.update(len(rows))
+
+    staging_path = path + '.tmp'
+    with open(staging_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, INDEX_VERSION, m, n))
+        f.write(tie_keys.tobytes())
+        f.write(records.tobytes())
+        size = f.tell()
+
+    os.replace(staging_path, path)
+    return size, scored_pairs
+
+class PartnerIndex:
+    """
+    Read-only view of a partner index file. The card ids and records are
+    memory-mapped, so opening is cheap and a lookup only reads the pages of
+    one record.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, version, m, n = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"{path} is not a version {INDEX_VERSION} partner index")
+
+        self.m = m
+        self.ids = np.memmap(path, dtype='<i8', mode='r', offset=HEADER.size, shape=(n,))
+        self.records = np.memmap(path, dtype=record_dtype(m), mode='r',
+                                 offset=HEADER.size + 8 * n, shape=(n,))
+        self._index = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, card_id):
+        return self.index_of(card_id) is not None
+
+    def index_of(self, card_id):
+        """Record number of a card id (str or int), or None"""
+        if self._index is None:
+            self._index = {card_id: idx for idx, card_id in enumerate(self.ids.tolist())}
+        try:
+            return self._index.get(int(card_id))
+        except (TypeError, ValueError):
+            return None
+
+    def partners(self, card_id, k=None):
+        """
+        Best partners of a card as (partner card id, score) tuples, best
+        first, at most k of them. Raises KeyError for unknown cards.
+        """
+        idx = self.index_of(card_id)
+        if idx is None:
+            raise KeyError(card_id)
+
+        record = self.records[idx]
+        partners = record['partner'][:k].tolist()
+        scores = record['score'][:k].tolist()
+        return [(int(self.ids[partner]), score / 100)
+                for partner, score in zip(partners, scores) if partner >= 0]
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Look up the best partners of a card")
+    parser.add_argument('card_id', help="card id to look up")
+    parser.add_argument('--index', default=None, help="partner index file (default: ../public/partners.bin)")
+    parser.add_argument('--top', type=int, default=None, help="number of partners to show (default: all stored)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main execution function"""
+    sys.path.insert(0, os.path.dirname(__file__))
+    from calculate_rankings import load_card_table, PARTNERS_FILE
+
+    args = parse_args(argv)
+    try:
+        index = PartnerIndex(args.index or PARTNERS_FILE)
+    except (OSError, ValueError) as e:
+        print(f"Error loading partner index: {e}")
+        print("Run calculate_rankings.py --partners first.")
+        return
+
+    if args.card_id not in index:
+        print(f"Card {args.card_id} is not in the partner index")
+        return
+
+    table = load_card_table()
+    name = table.text['name'][table.index_of(args.card_id)] if table is not None else args.card_id
+    print(f"Best partners of {name}:")
+    for rank, (partner_id, score) in enumerate(index.partners(args.card_id, args.top), 1):
+        partner = table.text['name'][table.index_of(partner_id)] if table is not None else partner_id
+        print(f"  {rank:>3}. {partner} ({score:.2f})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Bound-based Pair Pruning
+Skips pairs that provably cannot reach the running top-K, and counts the
+pairs above the threshold without scoring them one by one
+"""
+
+import numpy as np
+
+from pair_engine import PairEngine, upper_pair_count
+
+# Largest synergy multiplier any pair can get
+MAX_MULTIPLIER = 2.0
+# Relative slack on every bound. The bounds are computed from per-card
+# totals while the engine sums metric by metric, so they can differ by a
+# few ulps; the slack is far larger than that.
+BOUND_SLACK = 1e-9
+# Rows whose column ranges are computed at once
+ROW_WINDOW = 4096
+# Pairs scored per block. Smaller than the full-scan blocks, so the top-K
+# cutoff (and with it the pruning) tightens often
+PRUNE_BLOCK_PAIRS = 1 << 18
+
+def _slack(value):
+    return abs(value) * BOUND_SLACK + BOUND_SLACK
+
+def _ragged(rows, starts, stops):
+    """Flatten the column ranges [starts[k], stops[k]) of rows[k] into pair arrays"""
+    lengths = stops - starts
+    flat_rows = np.repeat(rows, lengths)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return flat_rows, np.arange(len(flat_rows)) + offsets
+
+class PrunedScan:
+    """
+    Exact upper-triangle scan driven by score bounds.
+
+    With non-negative weights and metrics, a pair scores m * (t_a + t_b) / 2,
+    where t is a card's weighted metric total and 1 <= m <= 2 is the
+    synergy multiplier. Cards are visited in order of t (highest first), so
+    in every row the partners that can still beat the running top-K cutoff
+    form a prefix; only that prefix is scored, and once a row's best
+    possible pair falls below the cutoff the scan stops.
+
+    The count of pairs above the threshold does not need pair scores
+    either: without a shared archetype, m only depends on the five synergy
+    flags of each card, so the pairs above the threshold are counted per
+    flag class with binary searches. Same-archetype pairs, and pairs too
+    close to the threshold to decide from the bounds, are scored exactly.
+    Both the top-K and the count match a full scan.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        totals = engine.card_totals()
+        self.order = np.argsort(-totals, kind='stable')
+        self.totals = totals[self.order]
+        self.max_multipliers = engine.max_multipliers()[self.order]
+        # Ascending copy for searchsorted
+        self._negated = -self.totals
+
+        # Flag class of every sorted card, and the multiplier of every pair
+        # of classes without a shared archetype
+        bits = 1 << np.arange(engine.flags.shape[1])
+        self.classes = (engine.flags[self.order] * bits).sum(axis=1)
+        class_flags = (np.arange(1 << len(bits))[:, None] & bits) > 0
+        class_engine = PairEngine(np.zeros((len(class_flags), len(engine.weights))),
+                                  np.full(len(class_flags), -1), class_flags, engine.weights)
+        self.class_multipliers = class_engine.multipliers(slice(None), slice(None))
+
+        self.archetype = engine.archetype[self.order]
+        # Sorted (class, position) and (archetype, position) keys for partner_bound
+        self._class_keys = None
+        self._archetype_keys = None
+
+    def __len__(self):
+        return len(self.totals)
+
+    def _cut(self, negated, row_totals, floor, multipliers):
+        """
+        For each row, how many entries of the descending totals -negated
+        are high enough for multipliers * (t_row + t) / 2 to reach floor
+        """
+        needed = 2 * floor / multipliers - row_totals
+        return np.searchsorted(negated, -needed, side='right')
+
+    def count_above(self, candidate_floor, row_start=0, row_stop=None):
+        """Number of pairs with a sorted row in [row_start, row_stop) that reach candidate_floor"""
+        n = len(self)
+        row_stop = n - 1 if row_stop is None else min(row_stop, n - 1)
+        floor_low = candidate_floor - _slack(candidate_floor)
+        floor_high = candidate_floor + _slack(candidate_floor)
+        rows = np.arange(row_start, row_stop)
+        if len(rows) == 0:
+            return 0
+
+        row_totals = self.totals[rows]
+        row_classes = self.classes[rows]
+        count = 0
+
+        for cls in np.unique(self.classes):
+            positions = np.flatnonzero(self.classes == cls)
+            negated = self._negated[positions]
+            multipliers = self.class_multipliers[row_classes, cls]
+
+            # Partners before or at the row itself belong to earlier rows
+            before = np.searchsorted(positions, rows, side='right')
+            sure = np.maximum(self._cut(negated, row_totals, floor_high, multipliers), before)
+            maybe = np.maximum(self._cut(negated, row_totals, floor_low, multipliers), sure)
+            count += int(np.sum(sure - before))
+
+            # Pairs within the slack of the threshold are decided by scoring
+            if np.any(maybe > sure):
+                pair_rows, members = _ragged(rows, sure, maybe)
+                pair_cols = positions[members]
+                arch = self.archetype[pair_rows]
+                apart = (arch < 0) | (arch != self.archetype[pair_cols])
+                scores = self.engine.score_pairs(self.order[pair_rows[apart]], self.order[pair_cols[apart]])
+                count += int(np.count_nonzero(scores >= candidate_floor))
+
+        # Same-archetype pairs get an extra factor, so swap their class
+        # estimate for their exact score
+        for arch in np.unique(self.archetype[self.archetype >= 0]):
+            members = np.flatnonzero(self.archetype == arch)
+            first, second = np.triu_indices(len(members), k=1)
+            pair_rows, pair_cols = members[first], members[second]
+            in_range = (pair_rows >= row_start) & (pair_rows < row_stop)
+            if not np.any(in_range):
+                continue
+            pair_rows, pair_cols = pair_rows[in_range], pair_cols[in_range]
+
+            estimate = (self.class_multipliers[self.classes[pair_rows], self.classes[pair_cols]]
+                        * (self.totals[pair_rows] + self.totals[pair_cols]) / 2)
+            scores = self.engine.score_pairs(self.order[pair_rows], self.order[pair_cols])
+            count += int(np.count_nonzero(scores >= candidate_floor)) - int(np.count_nonzero(estimate >= floor_high))
+
+        return count
+
+    def partner_bound(self, positions, prefix):
+        """
+        Upper bound on the score of the card at each sorted position with
+        any card from sorted position prefix on. Pairs without a shared
+        archetype are bounded per flag class by the class's highest total
+        past the prefix; same-archetype pairs by the archetype's.
+        """
+        n = len(self)
+        if self._class_keys is None:
+            self._class_keys = np.sort(self.classes.astype(np.int64) * n + np.arange(n))
+            members = np.flatnonzero(self.archetype >= 0)
+            self._archetype_keys = np.sort(self.archetype[members].astype(np.int64) * n + members)
+
+        # Highest total of every class past the prefix, -inf for none
+        classes = np.arange(len(self.class_multipliers))
+        first = np.searchsorted(self._class_keys, classes * n + prefix)
+        present = (first < n) & (self._class_keys[np.minimum(first, n - 1)] // n == classes)
+        class_totals = np.full(len(classes), -np.inf)
+        class_totals[present] = self.totals[self._class_keys[first[present]] % n]
+
+        row_totals = self.totals[positions]
+        bound = (self.class_multipliers[self.classes[positions]]
+                 * (row_totals[:, None] + class_totals[None, :]) / 2).max(axis=1)
+
+        arch = self.archetype[positions]
+        keys = self._archetype_keys
+        first = np.searchsorted(keys, arch.astype(np.int64) * n + prefix)
+        same = (arch >= 0) & (first < len(keys))
+        same[same] &= keys[first[same]] // n == arch[same]
+        partner_totals = self.totals[keys[first[same]] % n]
+        bound[same] = np.maximum(bound[same], self.max_multipliers[positions[same]]
+                                 * (row_totals[same] + partner_totals) / 2)
+        return bound
+
+    def seed_cutoff(self, k, candidate_floor):
+        """
+        Score of the k-th best pair among the highest-total cards. The final
+        top-K cutoff can only be higher, so shards that start with an empty
+        TopK can prune with it right away. -inf when there are too few pairs.
+        """
+        size = min(len(self), int(np.ceil(np.sqrt(4 * k))) + 1)
+        cards = self.order[:size]
+        first, second = np.triu_indices(size, k=1)
+        scores = self.engine.score_pairs(cards[first], cards[second])
+        scores = scores[scores >= candidate_floor]
+        if len(scores) < k or k <= 0:
+            return -np.inf
+        return float(np.partition(scores, len(scores) - k)[len(scores) - k])
+
+    def run(self, top, candidate_floor, row_start=0, row_stop=None, block_pairs=PRUNE_BLOCK_PAIRS, progress=None,
+            min_cutoff=-np.inf):
+        """
+        Scan sorted rows [row_start, row_stop) into top.
+        min_cutoff is a known lower bound on the final top-K cutoff.
+        Returns the number of pairs that reached candidate_floor and the
+        number of pairs actually scored for the top-K.
+        """
+        n = len(self)
+        row_stop = n - 1 if row_stop is None else min(row_stop, n - 1)
+        floor_low = candidate_floor - _slack(candidate_floor)
+        scored_pairs = 0
+
+        row = row_start
+        while row < row_stop:
+            # Pairs below the threshold never enter the top-K
+            threshold = max(top.threshold, min_cutoff)
+            cutoff = max(floor_low, threshold - _slack(threshold))
+
+            # Rows are sorted, so once the best partner of this row cannot
+            # reach the cutoff, no later row can either
+            if MAX_MULTIPLIER * (self.totals[row] + self.totals[row + 1]) / 2 < cutoff:
+                break
+
+            rows = np.arange(row, min(row + ROW_WINDOW, row_stop))
+            first = rows + 1
+            stops = self._cut(self._negated, self.totals[rows], cutoff, self.max_multipliers[rows])
+            stops = np.maximum(stops, first)
+
+            # Take as many rows as fit in one block, and at least one
+            take = max(1, int(np.searchsorted(np.cumsum(stops - first), block_pairs, side='right')))
+            pair_rows, pair_cols = _ragged(rows[:take], first[:take], stops[:take])
+
+            if len(pair_rows):
+                idx1 = self.order[pair_rows]
+                idx2 = self.order[pair_cols]
+                scores = self.engine.score_pairs(idx1, idx2)
+                scored_pairs += len(scores)
+
+                keep = scores >= candidate_floor
+                idx1, idx2 = idx1[keep], idx2[keep]
+                top.push_block(scores[keep], np.minimum(idx1, idx2), np.maximum(idx1, idx2))
+
+            if progress is not None:
+                progress.update(upper_pair_count(n, row, row + take))
+            row += take
+
+        if progress is not None and row < row_stop:
+            progress.update(upper_pair_count(n, row, row_stop))
+
+        return self.count_above(candidate_floor, row_start, row_stop), scored_pairs
@@ -0,0 +1,322 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Query Server
+Local HTTP/JSON service that scores any pair, lists a card's best partners and
+ranks pairs with custom weights and filters, from the precomputed card vectors
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+from calculate_rankings import (load_card_table, build_pair_engine, build_combinations, score_table_pair,
+                                generate_explanation, WEIGHTS, CARDS_FILE, PARTNERS_FILE)
+from deck_scoring import DeckScorer, parse_ydk, TOP_PAIRS
+from partner_index import PartnerIndex, top_partners, centi_scores
+from ranking_filters import PairFilter, filtered_top_pairs, filter_key, normalize_filter
+from rerank import resolve_weights
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 4  # Requests handled at once; the rest wait in the pool queue
+CACHE_SIZE = 1024  # Results kept per query type
+MAX_PARTNERS = 500
+MAX_RANK = 1000
+MAX_DECK_CARDS = 200
+MAX_DECKS = 10000  # Deck lists per bulk request
+
+class QueryService:
+    """
+    Answers pair queries from a CardTable loaded once. Every query method
+    is wrapped in an LRU cache, so repeated queries are dictionary lookups.
+    Queries only read shared state, so they can run on several threads.
+    """
+
+    def __init__(self, table, partner_index=None, cache_size=CACHE_SIZE):
+        self.table = table
+        self.engine = build_pair_engine(table)
+        # The stored partners are only valid for the exact same card set
+        if partner_index is not None and not np.array_equal(partner_index.ids, table.ids):
+            partner_index = None
+        self.partner_index = partner_index
+
+        self.score = lru_cache(maxsize=cache_size)(self._score)
+        self.top_partners = lru_cache(maxsize=cache_size)(self._top_partners)
+        self._rank = lru_cache(maxsize=cache_size)(self._rank_cached)
+        self.decks = DeckScorer(table, self.engine)
+
+    def _score(self, card_a, card_b):
+        """Score data and explanation of one pair of card ids"""
+        idx_a = self.table.index_of(card_a)
+        idx_b = self.table.index_of(card_b)
+        if idx_a == idx_b:
+            raise ValueError("A card cannot be paired with itself")
+
+        score_data = score_table_pair(self.table, idx_a, idx_b)
+        return {
+            'card1': self.table.summary(idx_a),
+            'card2': self.table.summary(idx_b),
+            **score_data,
+            'explanation': generate_explanation(self.table.card(idx_a), self.table.card(idx_b), score_data),
+        }
+
+    def _top_partners(self, card, k):
+        """The k best partners of a card id, best first"""
+        if not 1 <= k <= MAX_PARTNERS:
+            raise ValueError(f"k must be between 1 and {MAX_PARTNERS}")
+        idx = self.table.index_of(card)
+
+        if self.partner_index is not None and k <= self.partner_index.m:
+            partners = [(self.table.index_of(partner_id), score)
+                        for partner_id, score in self.partner_index.partners(card, k)]
+        else:
+            scores = self.engine.score_block([idx], slice(None))
+            scores[0, idx] = -np.inf
+            kept = top_partners(scores, self.table.ids, min(k, len(self.table) - 1))
+            partner_scores = centi_scores(np.take_along_axis(scores, kept, axis=1))[0] / 100
+            partners = list(zip(kept[0].tolist(), partner_scores.tolist()))
+
+        return {
+            'card': self.table.summary(idx),
+            'partners': [
+                {'rank': rank, 'card': self.table.summary(partner), 'totalScore': score}
+                for rank, (partner, score) in enumerate(partners, 1)
+            ],
+        }
+
+    def rank(self, weights=None, filters=None, k=50):
+        """
+        Exact top-k pairs passing filters (a ranking_filters pair filter:
+        card predicates for both cards or for each side, and a minScore
+        floor), scored with weights ({metric: weight} overrides of WEIGHTS)
+        """
+        weights = resolve_weights(weights or {}, WEIGHTS)
+        return self._rank(tuple(weights.items()), filter_key(normalize_filter(filters or {})), int(k))
+
+    def _rank_cached(self, weights, filters, k):
+        if not 1 <= k <= MAX_RANK:
+            raise ValueError(f"k must be between 1 and {MAX_RANK}")
+        weights = dict(weights)
+        pair_filter = PairFilter(self.table, json.loads(filters))
+        engine = self.engine if weights == WEIGHTS else build_pair_engine(self.table, weights)
+
+        winners = filtered_top_pairs(engine, self.table.ids, pair_filter, k)
+        return {
+            'cardsMatched': len(pair_filter.cards()),
+            'rankings': build_combinations(self.table, winners, pair_filter.min_score, weights),
+        }
+
+    def score_deck(self, query):
+        """
+        Synergy profile of one deck ({'cards': [ids]} or {'ydk': text},
+        optionally 'top'), or the summaries of many ({'decks': [[ids], ...]})
+        """
+        if 'decks' in query:
+            decks = query['decks']
+            if not isinstance(decks, list) or len(decks) > MAX_DECKS:
+                raise ValueError(f"'decks' must be a list of at most {MAX_DECKS:,} deck lists")
+            for deck in decks:
+                self._check_deck(deck)
+            return {'results': self.decks.score_decks(decks)}
+
+        if 'ydk' in query and not isinstance(query['ydk'], str):
+            raise ValueError("'ydk' must be the text of a .ydk deck list")
+        cards = parse_ydk(query['ydk'])['main'] if 'ydk' in query else query.get('cards')
+        self._check_deck(cards)
+        top = int(query.get('top', TOP_PAIRS))
+        if not 1 <= top <= MAX_PARTNERS:
+            raise ValueError(f"top must be between 1 and {MAX_PARTNERS}")
+        return self.decks.score_deck(cards, top)
+
+    @staticmethod
+    def _check_deck(cards):
+        if not isinstance(cards, list) or len(cards) > MAX_DECK_CARDS:
+            raise ValueError(f"A deck must be a list of at most {MAX_DECK_CARDS} card ids")
+
+    def cache_info(self):
+        """Hit and miss counts of every query cache"""
+        return {name: getattr(self, name).cache_info()._asdict() for name in ('score', 'top_partners', '_rank')}
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    JSON endpoints:
+      GET  /score?a=ID&b=ID
+      GET  /partners?card=ID&k=10
+      GET  /rank?k=50&type=Monster&card1.type=Trap&minScore=...
+      POST /rank  {"weights": {...}, "filters": {...}, "k": 50}
+      POST /deck  {"cards": [ID, ...]} or {"ydk": "..."} or {"decks": [[ID, ...], ...]}
+      GET  /health
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        service = self.server.service
+
+        if url.path == '/score':
+            self._answer(lambda: service.score(self._param(params, 'a'), self._param(params, 'b')))
+        elif url.path == '/partners':
+            self._answer(lambda: service.top_partners(self._param(params, 'card'), int(params.get('k', 10))))
+        elif url.path == '/rank':
+            k = params.pop('k', 50)
+            self._answer(lambda: service.rank(None, self._filter(params), int(k)))
+        elif url.path == '/health':
+            self._answer(lambda: {
+                'cards': len(service.table),
+                'partnerIndex': service.partner_index is not None,
+                'cache': service.cache_info(),
+            })
+        else:
+            self._send(404, {'error': f"Unknown endpoint {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        service = self.server.service
+        if url.path == '/rank':
+            self._answer(lambda: service.rank(*self._rank_query(self._body())))
+        elif url.path == '/deck':
+            self._answer(lambda: service.score_deck(self._body()))
+        else:
+            self._send(404, {'error': f"Unknown endpoint {url.path}"})
+
+    def _body(self):
+        """The request body as a JSON object"""
+        length = int(self.headers.get('Content-Length') or 0)
+        query = json.loads(self.rfile.read(length) or b'{}')
+        if not isinstance(query, dict):
+            raise ValueError("The request body must be a JSON object")
+        return query
+
+    @staticmethod
+    def _rank_query(query):
+        return query.get('weights'), query.get('filters'), int(query.get('k', 50))
+
+    @staticmethod
+    def _filter(params):
+        """Pair filter from query parameters: type=Trap, card1.type=Monster, minScore=200"""
+        spec = {}
+        for key, value in params.items():
+            side, _, field = key.rpartition('.')
+            if side:
+                spec.setdefault(side, {})[field] = value
+            else:
+                spec[key] = value
+        return spec
+
+    @staticmethod
+    def _param(params, name):
+        if name not in params:
+            raise ValueError(f"Missing parameter '{name}'")
+        return int(params[name])
+
+    def _answer(self, query):
+        """Run query and send its result, or the error it raised"""
+        start = time.perf_counter()
+        try:
+            result = query()
+        except KeyError as e:
+            self._send(404, {'error': f"Unknown card {e.args[0]}"})
+            return
+        except (ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+            return
+        self._send(200, {**result, 'milliseconds': round((time.perf_counter() - start) * 1000, 3)})
+
+    def _send(self, status, body):
+        encoded = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class QueryServer(HTTPServer):
+    """HTTPServer that hands connections to a fixed-size thread pool"""
+
+    def __init__(self, address, service, workers=DEFAULT_WORKERS, verbose=False):
+        super().__init__(address, QueryHandler)
+        self.service = service
+        self.verbose = verbose
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='query')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+def load_service(cards_file=None, partners_file=None, cache_size=CACHE_SIZE):
+    """QueryService over every card with a description, or None when no cards load"""
+    table = load_card_table(cards_file or CARDS_FILE)
+    if table is None:
+        return None
+    table = table.take(np.flatnonzero(table.text['desc'].lengths() > 0))
+
+    try:
+        partner_index = PartnerIndex(partners_file or PARTNERS_FILE)
+    except (OSError, ValueError):
+        partner_index = None
+    return QueryService(table, partner_index, cache_size)
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Serve pair scores, partners and rankings over HTTP")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"requests handled at once (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE,
+                        help=f"results cached per query type (default: {CACHE_SIZE})")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main execution function"""
+    args = parse_args(argv)
+
+    print("=" * 60)
+    print("Yu-Gi-Oh Combo Rankings - Query Server")
+    print("=" * 60)
+
+    service = load_service(cache_size=args.cache_size)
+    if service is None:
+        print("Failed to load cards. Please run fetch_cards.py first.")
+        return 1
+    print(f"✓ Loaded {len(service.table):,} cards")
+    if service.partner_index is None:
+        print("⚠️  No partner index for these cards, partners are scored on demand")
+        print("   Run calculate_rankings.py --partners (with --full to index every card) to build it")
+
+    server = QueryServer((args.host, args.port), service, max(1, args.workers), args.verbose)
+    print(f"✓ Listening on http://{args.host}:{server.server_port} with {max(1, args.workers)} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
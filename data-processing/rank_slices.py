@@ -0,0 +1,208 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Filtered Ranking Slices
+Exports the exact top combinations of many filters (card types, attributes,
+archetypes, score floors) from one pass over the pair space
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+from tqdm import tqdm
+
+sys.path.insert(0, os.path.dirname(__file__))
+from calculate_rankings import (load_card_table, build_pair_engine, build_combinations,
+                                CARDS_FILE, CARD_LIMIT, WEIGHTS)
+from instrumentation import RunReport, report_path
+from ranking_filters import PairFilter, filtered_top_pairs, multi_filter_top_pairs
+from rankings_export import write_rankings
+
+OUTPUT_DIR = "../public/slices"
+INDEX_FILE = 'index.json'
+SLICE_TOP_N = 500  # Combinations exported per slice
+MIN_ARCHETYPE_CARDS = 10  # Smallest archetype that gets its own slice with --archetypes
+# Slices with fewer pairs than this share of the full pass are ranked on
+# their own, which is cheaper than testing them in every block
+SMALL_SLICE_SHARE = 0.01
+
+ATTRIBUTES = ('DARK', 'LIGHT', 'EARTH', 'WATER', 'FIRE', 'WIND', 'DIVINE')
+DEFAULT_SLICES = [
+    {'name': 'monster-monster', 'title': 'Monster + Monster', 'filter': {'cards': {'type': 'Monster'}}},
+    {'name': 'monster-spell', 'title': 'Monster + Spell',
+     'filter': {'card1': {'type': 'Monster'}, 'card2': {'type': 'Spell'}}},
+    {'name': 'monster-trap', 'title': 'Monster + Trap',
+     'filter': {'card1': {'type': 'Monster'}, 'card2': {'type': 'Trap'}}},
+    {'name': 'spell-trap', 'title': 'Spells and Traps only', 'filter': {'cards': {'type': ['Spell', 'Trap']}}},
+    *({'name': f"attribute-{attribute.lower()}", 'title': f"{attribute} monsters",
+       'filter': {'cards': {'type': 'Monster', 'attribute': attribute}}} for attribute in ATTRIBUTES),
+]
+
+def load_slices(path):
+    """Read slice definitions [{'name', 'title', 'filter', 'top'?}, ...] from a JSON file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        slices = json.load(f)
+    if not isinstance(slices, list) or not all(isinstance(s, dict) and 'name' in s for s in slices):
+        raise ValueError(f"{path} must hold a list of slices, each with a 'name'")
+    return slices
+
+def archetype_slices(table):
+    """One slice per archetype with at least MIN_ARCHETYPE_CARDS cards"""
+    counts = np.bincount(table.codes['archetype'][table.codes['archetype'] >= 0],
+                         minlength=len(table.labels['archetype']))
+    return [
+        {'name': f"archetype-{code}", 'title': archetype, 'filter': {'cards': {'archetype': archetype}}}
+        for code, archetype in enumerate(table.labels['archetype']) if counts[code] >= MIN_ARCHETYPE_CARDS
+    ]
+
+def rank_slices(table, slices, top_n, run=None):
+    """
+    Exact top pairs of every slice. Large slices share one pass over the
+    pairs of their cards; small ones are ranked separately. Returns the
+    (score, idx1, idx2) winners of each slice and the compiled filters.
+    """
+    run = run or RunReport('rank_slices')
+    engine = build_pair_engine(table)
+    filters = [PairFilter(table, s['filter']) for s in slices]
+    ks = [int(s.get('top', top_n)) for s in slices]
+
+    total_pairs = len(table) * (len(table) - 1) // 2
+    sizes = [len(f.cards()) for f in filters]
+    small = [size * (size - 1) // 2 < SMALL_SLICE_SHARE * total_pairs for size in sizes]
+    shared = [idx for idx, is_small in enumerate(small) if not is_small]
+    winners = [None] * len(slices)
+
+    if shared:
+        cards = np.flatnonzero(np.any([filters[idx].cards_mask() for idx in shared], axis=0))
+        pairs = len(cards) * (len(cards) - 1) // 2
+        print(f"\nRanking {len(shared)} slices in one pass over {pairs:,} pairs...")
+        with run.stage('shared_pass', pairs=pairs):
+            with tqdm(total=pairs, desc="Processing", unit="pairs", unit_scale=True) as pbar:
+                results = multi_filter_top_pairs(engine, table.ids, [filters[idx] for idx in shared],
+                                                 [ks[idx] for idx in shared], progress=pbar)
+        for idx, result in zip(shared, results):
+            winners[idx] = result
+
+    separate = [idx for idx, is_small in enumerate(small) if is_small]
+    if separate:
+        print(f"\nRanking {len(separate)} small slices separately...")
+        with run.stage('small_slices', pairs=sum(sizes[idx] * (sizes[idx] - 1) // 2 for idx in separate)):
+            for idx in tqdm(separate, desc="Slices", unit="slices"):
+                winners[idx] = filtered_top_pairs(engine, table.ids, filters[idx], ks[idx])
+
+    return winners, filters
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Export the exact top combinations of many filters")
+    parser.add_argument('--slices', default=None,
+                        help="JSON file of [{name, title, filter, top}] slices (default: card type and attribute slices)")
+    parser.add_argument('--archetypes', action='store_true',
+                        help=f"add a slice for every archetype with at least {MIN_ARCHETYPE_CARDS} cards")
+    parser.add_argument('--top', type=int, default=SLICE_TOP_N,
+                        help=f"combinations exported per slice (default: {SLICE_TOP_N})")
+    parser.add_argument('--full', action='store_true', help=f"analyze every card instead of the first {CARD_LIMIT:,}")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help=f"directory of the slice files (default: {OUTPUT_DIR})")
+    parser.add_argument('--compact', action='store_true',
+                        help="write compact slice files (no indentation, each card stored once)")
+    parser.add_argument('--profile', metavar='STAGE', default=None,
+                        help="profile one stage with cProfile (e.g. shared_pass, explanations, export)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main execution function"""
+    args = parse_args(argv)
+    run = RunReport('rank_slices', args.profile)
+
+    print("=" * 60)
+    print("Yu-Gi-Oh Combo Rankings - Filtered Slices")
+    print("=" * 60)
+
+    try:
+        slices = load_slices(args.slices) if args.slices else list(DEFAULT_SLICES)
+    except (OSError, ValueError) as e:
+        print(f"Error loading slices: {e}")
+        return 1
+
+    table = load_card_table(CARDS_FILE, run=run)
+    if table is None:
+        print("Failed to load cards. Please run fetch_cards.py first.")
+        return 1
+
+    # Same card selection as calculate_rankings.py
+    table = table.take(np.flatnonzero(table.text['desc'].lengths() > 0))
+    if len(table) > CARD_LIMIT and not args.full:
+        print(f"\n⚠️  OPTIMIZATION: Using first {CARD_LIMIT:,} cards for faster processing")
+        print(f"   To analyze all cards, run with --full")
+        table = table.take(np.arange(CARD_LIMIT))
+    print(f"✓ Using {len(table):,} cards")
+
+    if args.archetypes:
+        slices += archetype_slices(table)
+    names = [s['name'] for s in slices]
+    if len(set(names)) != len(names):
+        print("Error loading slices: slice names must be unique")
+        return 1
+
+    try:
+        winners, filters = rank_slices(table, slices, args.top, run)
+    except ValueError as e:
+        print(f"Error in slice filters: {e}")
+        return 1
+
+    print(f"\nExporting {len(slices)} slices to {args.output_dir}...")
+    os.makedirs(args.output_dir, exist_ok=True)
+    generation_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    index = {'generationDate': generation_date, 'cardsAnalyzed': len(table), 'weights': WEIGHTS, 'slices': []}
+    total_bytes = 0
+
+    with run.stage('explanations'):
+        slice_rankings = [build_combinations(table, slice_winners, pair_filter.min_score)
+                          for slice_winners, pair_filter in zip(winners, filters)]
+
+    with run.stage('export'):
+        for s, rankings, pair_filter in zip(slices, slice_rankings, filters):
+            output_data = {
+                'metadata': {
+                    'slice': s['name'],
+                    'title': s.get('title', s['name']),
+                    'filter': pair_filter.spec,
+                    'cardsMatched': len(pair_filter.cards()),
+                    'topN': len(rankings),
+                    'generationDate': generation_date,
+                    'weights': WEIGHTS,
+                    'cardsAnalyzed': len(table),
+                    'minScoreThreshold': pair_filter.min_score,
+                },
+                'rankings': rankings
+            }
+            file_name = f"{s['name']}.json"
+            stats = write_rankings(output_data, os.path.join(args.output_dir, file_name), args.compact, pages=False)
+            total_bytes += stats['bytes']
+            index['slices'].append({
+                'name': s['name'],
+                'title': s.get('title', s['name']),
+                'file': file_name,
+                'count': len(rankings),
+                'topScore': rankings[0]['totalScore'] if rankings else None,
+            })
+            top = f"top {rankings[0]['totalScore']:.2f}" if rankings else "no pairs"
+            print(f"  {s['name']:<24} {len(rankings):>6,} combinations, {top}")
+
+    with open(os.path.join(args.output_dir, INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    print(f"✓ Wrote {len(slices)} slices ({total_bytes / (1024 * 1024):.2f} MB) and {INDEX_FILE}")
+
+    run.info.update({'cardsAnalyzed': len(table), 'slices': len(slices), 'bytes': total_bytes})
+    run.print_summary()
+    run.write(report_path(os.path.join(args.output_dir, INDEX_FILE)))
+
+    print("\n" + "=" * 60)
+    print("✓ COMPLETE!")
+    print("=" * 60)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
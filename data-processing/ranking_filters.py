@@ -0,0 +1,154 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Filtered Rankings
+Compiles card filters into boolean card masks and finds the exact top pairs
+that pass them, for one filter or for many filters in a single pass
+"""
+
+import json
+
+import numpy as np
+
+from pruning import PrunedScan
+from topk import TopK
+
+# Card fields filters can test. 'type' matches part of the card type
+# ("Monster" matches "Effect Monster"), the others match exactly
+CARD_FIELDS = ('type', 'race', 'attribute', 'archetype')
+# Card predicates of a pair filter: both cards match 'cards', one card
+# matches 'card1' and the other 'card2'
+SIDES = ('cards', 'card1', 'card2')
+
+def card_mask(table, predicate):
+    """
+    Bool mask of the cards matching every {field: value} of predicate.
+    A value may also be a list, which matches any of its values.
+    """
+    mask = np.ones(len(table), dtype=bool)
+    for field, wanted in predicate.items():
+        if field not in CARD_FIELDS:
+            raise ValueError(f"Unknown card field '{field}'")
+        values = wanted if isinstance(wanted, list) else [wanted]
+        if not all(isinstance(value, str) for value in values):
+            raise ValueError(f"Values of '{field}' must be strings")
+        if field == 'type':
+            mask &= table.label_mask(field, lambda label: label is not None and any(v in label for v in values))
+        else:
+            mask &= table.label_mask(field, lambda label: label in values)
+    return mask
+
+def normalize_filter(spec):
+    """
+    Canonical form of a pair filter spec: {'cards', 'card1', 'card2'}
+    predicates plus 'minScore'. Card fields given at the top level are
+    shorthand for 'cards'. Raises ValueError for anything else.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("A filter must be an object")
+
+    normal = {side: {} for side in SIDES}
+    normal['minScore'] = 0.0
+    for key, value in spec.items():
+        if key in SIDES:
+            if not isinstance(value, dict):
+                raise ValueError(f"'{key}' must be an object of card fields")
+            normal[key].update(value)
+        elif key in CARD_FIELDS:
+            normal['cards'][key] = value
+        elif key == 'minScore':
+            normal['minScore'] = float(value or 0)
+        else:
+            raise ValueError(f"Unknown filter '{key}'")
+
+    # Empty values select everything, like the frontend's filter panel
+    for side in SIDES:
+        normal[side] = {field: value for field, value in normal[side].items() if value not in ('', None, [])}
+    return normal
+
+def filter_key(spec):
+    """Hashable key of a normalized filter, for caches"""
+    return json.dumps(spec, sort_keys=True)
+
+class PairFilter:
+    """
+    A pair filter compiled against a CardTable. A pair (i, j) passes when
+    both cards match 'cards', one matches 'card1' and the other 'card2',
+    and its score reaches minScore. Only the two per-card masks are
+    stored; pair masks are broadcast from them block by block.
+    """
+
+    def __init__(self, table, spec):
+        self.spec = normalize_filter(spec)
+        both = card_mask(table, self.spec['cards'])
+        self.side1 = both & card_mask(table, self.spec['card1'])
+        self.side2 = both & card_mask(table, self.spec['card2'])
+        self.min_score = self.spec['minScore']
+        # Without sides every pair of matching cards passes, which the
+        # pruned scan can rank directly
+        self.symmetric = not self.spec['card1'] and not self.spec['card2']
+
+    @property
+    def candidate_floor(self):
+        """Same candidate floor as select_top_pairs"""
+        return self.min_score - 0.005
+
+    def cards_mask(self):
+        """Bool mask of the cards that can appear in a passing pair"""
+        return self.side1 | self.side2
+
+    def cards(self):
+        """Indices of the cards that can appear in a passing pair"""
+        return np.flatnonzero(self.cards_mask())
+
+    def pair_mask(self, rows, cols):
+        """Which pairs (rows, cols) pass the card predicates (broadcast index arrays)"""
+        return (self.side1[rows] & self.side2[cols]) | (self.side1[cols] & self.side2[rows])
+
+def filtered_top_pairs(engine, tie_keys, pair_filter, k):
+    """
+    Exact top-k pairs passing pair_filter, as (score, idx1, idx2) with
+    idx1 < idx2, best first. Only the cards the filter can match are
+    scored; unfiltered pairs of those cards go through the pruned scan.
+    """
+    cards = pair_filter.cards()
+    tie_keys = np.asarray(tie_keys)
+    top = TopK(k, tie_keys[cards])
+    sub_engine = engine.take(cards)
+
+    if pair_filter.symmetric and sub_engine.nonnegative():
+        PrunedScan(sub_engine).run(top, pair_filter.candidate_floor)
+    else:
+        for row_start, col_start, scores, _ in sub_engine.iter_upper_blocks():
+            rows = cards[row_start:row_start + len(scores)]
+            cols = cards[col_start:]
+            keep = (scores >= pair_filter.candidate_floor) & pair_filter.pair_mask(rows[:, None], cols[None, :])
+            block_rows, block_cols = np.nonzero(keep)
+            top.push_block(scores[block_rows, block_cols], block_rows + row_start, block_cols + col_start)
+
+    return [(score, int(cards[idx1]), int(cards[idx2])) for score, idx1, idx2 in top.results()]
+
+def multi_filter_top_pairs(engine, tie_keys, pair_filters, ks, progress=None):
+    """
+    Exact top pairs of several filters in one pass over the pairs of
+    every card any filter can match. Each block is cut once to the pairs
+    above the lowest cutoff of all filters, and only those are tested
+    against each filter. Returns one winner list per filter, in the same
+    form as filtered_top_pairs. progress: optional tqdm updated per block.
+    """
+    cards = np.flatnonzero(np.any([f.cards_mask() for f in pair_filters], axis=0))
+    tops = [TopK(k, tie_keys) for k in ks]
+
+    for row_start, col_start, scores, pair_count in engine.take(cards).iter_upper_blocks():
+        cutoffs = [max(f.candidate_floor, top.threshold) for f, top in zip(pair_filters, tops)]
+        block_rows, block_cols = np.nonzero(scores >= min(cutoffs))
+        block_scores = scores[block_rows, block_cols]
+        rows = cards[block_rows + row_start]
+        cols = cards[block_cols + col_start]
+
+        for pair_filter, top, cutoff in zip(pair_filters, tops, cutoffs):
+            keep = (block_scores >= cutoff) & pair_filter.pair_mask(rows, cols)
+            top.push_block(block_scores[keep], rows[keep], cols[keep])
+
+        if progress is not None:
+            progress.update(pair_count)
+
+    return [top.results() for top in tops]
@@ -0,0 +1,202 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Persisted Ranking State
+Keeps the analyzed card table and a candidate pool between runs so a
+changed card pool can be re-ranked by scoring only the affected pairs
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from card_table import CardTable
+from pair_engine import BLOCK_PAIRS
+from topk import TopK
+
+# Bump when the on-disk layout changes
+STATE_VERSION = 1
+STATE_FILE = 'state.json'
+TABLE_DIR = 'table'
+HASHES_FILE = 'hashes.npy'
+POOL_FILE = 'pool.npy'
+
+# The persisted pool holds POOL_FACTOR times the exported top N, so a few
+# removed or changed cards do not empty it
+POOL_FACTOR = 4
+
+POOL_DTYPE = np.dtype([('score', 'f8'), ('id1', 'i8'), ('id2', 'i8')])
+
+def card_hashes(table):
+    """Per-card content hash over everything that feeds scoring and export"""
+    hashes = np.empty(len(table), dtype=np.uint64)
+    for idx in range(len(table)):
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(table.metrics[idx].tobytes())
+        digest.update(table.flags[idx].tobytes())
+        for field in CardTable.CODE_FIELDS:
+            digest.update(repr(table.value(field, idx)).encode('utf-8'))
+        for field in CardTable.TEXT_FIELDS:
+            digest.update(b'\0' + table.text[field][idx].encode('utf-8'))
+        hashes[idx] = int.from_bytes(digest.digest(), 'little')
+    return hashes
+
+def pairs_involving(engine, cards, candidate_floor, block_pairs=BLOCK_PAIRS):
+    """
+    Score every pair that involves at least one of `cards` (table indices),
+    each pair once. Yields (scores, rows, cols) for the pairs that reach
+    candidate_floor, with rows < cols.
+    """
+    n = len(engine)
+    cards = np.unique(np.asarray(cards, dtype=np.intp))
+    selected = np.zeros(n, dtype=bool)
+    selected[cards] = True
+    col_ids = np.arange(n)[None, :]
+    rows_per_block = max(1, block_pairs // max(n, 1))
+
+    for start in range(0, len(cards), rows_per_block):
+        block_rows = cards[start:start + rows_per_block]
+        scores = engine.score_block(block_rows, slice(None))
+
+        # Drop the diagonal, and pairs of two selected cards from the later
+        # card's row so they are only scored once
+        row_ids = block_rows[:, None]
+        scores[(col_ids == row_ids) | (selected[None, :] & (col_ids < row_ids))] = -np.inf
+
+        r, c = np.nonzero(scores >= candidate_floor)
+        rows, cols = block_rows[r], c
+        yield scores[r, c], np.minimum(rows, cols), np.maximum(rows, cols)
+
+class RankingState:
+    """
+    Ranking results carried over from the previous run.
+
+    pool holds the best pairs that reached the candidate floor, as
+    (score, idx1, idx2) into table, best first. floor is None when the pool
+    holds every such pair; otherwise every pair missing from the pool scores
+    at most floor. config records the scorer fingerprint, weights and
+    threshold the scores were computed with.
+    """
+
+    def __init__(self, table, hashes, pool, floor, scored_count, config):
+        self.table = table
+        self.hashes = hashes
+        self.pool = pool
+        self.floor = floor
+        self.scored_count = scored_count
+        self.config = config
+
+    @classmethod
+    def from_pool(cls, table, pool, pool_size, scored_count, config):
+        """State after a full run that kept the best pool_size pairs"""
+        floor = pool[-1][0] if len(pool) >= pool_size else None
+        return cls(table, card_hashes(table), pool, floor, scored_count, config)
+
+    def certified(self, top_n):
+        """
+        Whether the first top_n pool entries are exactly the top_n pairs of
+        the whole table: the pool must be full enough, and its top_n-th
+        score must beat every pair outside it
+        """
+        if self.floor is None:
+            return True
+        return len(self.pool) >= top_n and self.pool[top_n - 1][0] > self.floor
+
+    def update(self, old_engine, table, engine, pool_size, candidate_floor):
+        """
+        Carry the state over to a new table.
+
+        Cards are matched by id and content hash. Pool pairs of two unchanged
+        cards keep their score; every pair involving a new or changed card is
+        rescored, and pairs involving removed or changed cards are dropped.
+        old_engine and engine score self.table and table with the same
+        weights.
+        """
+        hashes = card_hashes(table)
+        old_hashes = dict(zip(self.table.ids.tolist(), self.hashes.tolist()))
+        new_hashes = dict(zip(table.ids.tolist(), hashes.tolist()))
+
+        dirty = [idx for idx, card_id in enumerate(table.ids.tolist())
+                 if old_hashes.get(card_id) != new_hashes[card_id]]
+        stale = [idx for idx, card_id in enumerate(self.table.ids.tolist())
+                 if new_hashes.get(card_id) != old_hashes[card_id]]
+        print(f"✓ {len(dirty):,} new or changed cards, {len(stale):,} removed or changed")
+
+        # Pairs that left the table no longer count towards the threshold
+        scored_count = self.scored_count
+        for scores, _, _ in pairs_involving(old_engine, stale, candidate_floor):
+            scored_count -= len(scores)
+
+        top = TopK(pool_size, table.ids)
+        offered = 0
+
+        stale_ids = set(self.table.ids[stale].tolist())
+        for score, idx1, idx2 in self.pool:
+            id1, id2 = self.table.card_id(idx1), self.table.card_id(idx2)
+            if int(id1) in stale_ids or int(id2) in stale_ids:
+                continue
+            new1, new2 = sorted((table.index_of(id1), table.index_of(id2)))
+            top.push(score, new1, new2)
+            offered += 1
+
+        for scores, rows, cols in pairs_involving(engine, dirty, candidate_floor):
+            scored_count += len(scores)
+            offered += len(scores)
+            top.push_block(scores, rows, cols)
+
+        pool = top.results()
+
+        # Pairs trimmed from the pool now also sit below the floor
+        floor = self.floor
+        if offered > len(pool):
+            floor = pool[-1][0] if floor is None else max(floor, pool[-1][0])
+
+        return RankingState(table, hashes, pool, floor, scored_count, self.config)
+
+    def save(self, directory):
+        """Write the state to directory, replacing any previous state"""
+        # Write next to the old state and swap, so readers never see half a state
+        staging_dir = directory + '.tmp'
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        self.table.save(os.path.join(staging_dir, TABLE_DIR))
+        np.save(os.path.join(staging_dir, HASHES_FILE), self.hashes)
+
+        pool = np.empty(len(self.pool), dtype=POOL_DTYPE)
+        for k, (score, idx1, idx2) in enumerate(self.pool):
+            pool[k] = (score, self.table.ids[idx1], self.table.ids[idx2])
+        np.save(os.path.join(staging_dir, POOL_FILE), pool)
+
+        meta = {
+            'version': STATE_VERSION,
+            'floor': self.floor,
+            'scoredCount': self.scored_count,
+            'config': self.config,
+        }
+        with open(os.path.join(staging_dir, STATE_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging_dir, directory)
+
+    @classmethod
+    def load(cls, directory):
+        """Load a saved state, or None when there is no usable one"""
+        try:
+            with open(os.path.join(directory, STATE_FILE), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != STATE_VERSION:
+                return None
+
+            table = CardTable.load(os.path.join(directory, TABLE_DIR))
+            hashes = np.load(os.path.join(directory, HASHES_FILE))
+            saved_pool = np.load(os.path.join(directory, POOL_FILE))
+        except (OSError, ValueError, KeyError):
+            return None
+
+        pool = [
+            (score, table.index_of(id1), table.index_of(id2))
+            for score, id1, id2 in zip(saved_pool['score'].tolist(), saved_pool['id1'].tolist(),
+                                       saved_pool['id2'].tolist())
+        ]
+        return cls(table, hashes, pool, meta['floor'], meta['scoredCount'], meta['config'])
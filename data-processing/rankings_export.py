@@ -0,0 +1,183 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Rankings Export
+Writes rankings.json either pretty-printed or in a compact layout where each
+card is stored once and ranking rows are arrays that reference it by index,
+plus a manifest and rank pages the frontend loads on demand
+"""
+
+import json
+import os
+import shutil
+import time
+
+try:
+    import orjson
+except ImportError:  # Optional faster encoder
+    orjson = None
+
+COMPACT_FORMAT = 'compact-v1'
+PAGES_FORMAT = 'pages-v1'
+PAGE_SIZE = 500  # Rankings per page file
+MANIFEST_FILE = 'manifest.json'
+# Card fields stored in the compact card dictionary, in array order
+CARD_FIELDS = ('id', 'name', 'type', 'image_url_small')
+# Order of the values in a compact ranking row
+ROW_FIELDS = ('card1', 'card2', 'totalScore', 'synergyMultiplier', 'scores', 'explanation')
+
+def compact_rankings(output_data, first_rank=1):
+    """
+    Compact layout of a rankings output: every distinct card once in
+    'cards', and each ranking as a ROW_FIELDS array whose card1/card2 are
+    indices into 'cards' and whose scores follow 'metrics'. Ranks are
+    consecutive from first_rank.
+    """
+    rankings = output_data['rankings']
+    metrics = list(rankings[0]['scores']) if rankings else []
+    card_index = {}
+    cards = []
+    rows = []
+
+    def index_of(card):
+        if card['id'] not in card_index:
+            card_index[card['id']] = len(cards)
+            cards.append([card[field] for field in CARD_FIELDS])
+        return card_index[card['id']]
+
+    for rank, entry in enumerate(rankings, first_rank):
+        if entry['rank'] != rank:
+            raise ValueError(f"Ranking entry {rank} has rank {entry['rank']}; compact output needs consecutive ranks")
+        rows.append([
+            index_of(entry['card1']),
+            index_of(entry['card2']),
+            entry['totalScore'],
+            entry['synergyMultiplier'],
+            [entry['scores'][metric] for metric in metrics],
+            entry['explanation'],
+        ])
+
+    return {
+        'format': COMPACT_FORMAT,
+        'metadata': output_data['metadata'],
+        'firstRank': first_rank,
+        'metrics': metrics,
+        'cardFields': list(CARD_FIELDS),
+        'rowFields': list(ROW_FIELDS),
+        'cards': cards,
+        'rankings': rows,
+    }
+
+def encode_json(data, compact):
+    """
+    Encode data as UTF-8 JSON bytes. Pretty output matches
+    json.dump(..., ensure_ascii=False, indent=2); compact output has no
+    whitespace and uses orjson when it is installed. Returns the bytes and
+    the name of the encoder used.
+    """
+    if not compact:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8'), 'json'
+    if orjson is not None:
+        return orjson.dumps(data), 'orjson'
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 'json'
+
+def write_rankings(output_data, output_file, compact=False, pages=True):
+    """
+    Write a rankings output, compacted when compact is set, and with
+    pages also its manifest and rank pages (see write_ranking_pages).
+    Returns {'format', 'encoder', 'bytes', 'encodeSeconds',
+    'writeSeconds', 'pagesBytes', 'pagesSeconds'}.
+    """
+    start = time.perf_counter()
+    data = compact_rankings(output_data) if compact else output_data
+    encoded, encoder = encode_json(data, compact)
+    encode_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with open(output_file, 'wb') as f:
+        f.write(encoded)
+    write_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pages_bytes = write_ranking_pages(output_data, pages_dir(output_file)) if pages else None
+    pages_seconds = time.perf_counter() - start if pages else None
+
+    return {
+        'format': COMPACT_FORMAT if compact else 'pretty',
+        'encoder': encoder,
+        'bytes': os.path.getsize(output_file),
+        'encodeSeconds': encode_seconds,
+        'writeSeconds': write_seconds,
+        'pagesBytes': pages_bytes,
+        'pagesSeconds': pages_seconds,
+    }
+
+def pages_dir(output_file):
+    """
+    Directory of the paged rankings next to output_file:
+    rankings.json -> rankings-pages/ (not rankings/, the frontend route)
+    """
+    return os.path.splitext(output_file)[0] + '-pages'
+
+def ranking_summary(rankings):
+    """Score statistics of the exported rankings, for pages that only load the manifest"""
+    if not rankings:
+        return {'count': 0}
+    scores = sorted(entry['totalScore'] for entry in rankings)
+    middle = len(scores) // 2
+    median = scores[middle] if len(scores) % 2 else (scores[middle - 1] + scores[middle]) / 2
+    return {
+        'count': len(rankings),
+        'maxScore': scores[-1],
+        'minScore': scores[0],
+        'meanScore': round(sum(scores) / len(scores), 2),
+        'medianScore': median,
+        'meanSynergy': round(sum(entry['synergyMultiplier'] for entry in rankings) / len(rankings), 4),
+    }
+
+def write_ranking_pages(output_data, directory, page_size=PAGE_SIZE):
+    """
+    Write the rankings as a small manifest plus fixed-size compact pages,
+    so the frontend only downloads the ranks it shows. Page k (from 0)
+    holds ranks k * page_size + 1 onwards, in the compact layout. The
+    directory is replaced as a whole. Returns the number of bytes written.
+    """
+    rankings = output_data['rankings']
+    staging_dir = directory + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(os.path.join(staging_dir, 'pages'))
+
+    pages = []
+    total_bytes = 0
+    for start in range(0, len(rankings), page_size):
+        page = compact_rankings({'metadata': None, 'rankings': rankings[start:start + page_size]}, start + 1)
+        del page['metadata']
+        name = f"pages/{len(pages) + 1}.json"
+        encoded, _ = encode_json(page, compact=True)
+        with open(os.path.join(staging_dir, name), 'wb') as f:
+            f.write(encoded)
+        pages.append(name)
+        total_bytes += len(encoded)
+
+    manifest = {
+        'format': PAGES_FORMAT,
+        'metadata': output_data['metadata'],
+        'summary': ranking_summary(rankings),
+        'pageSize': page_size,
+        'pages': pages,
+    }
+    encoded, _ = encode_json(manifest, compact=True)
+    with open(os.path.join(staging_dir, MANIFEST_FILE), 'wb') as f:
+        f.write(encoded)
+    total_bytes += len(encoded)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging_dir, directory)
+    return total_bytes
+
+def print_export_stats(stats):
+    """Print the size and timing of a write_rankings call"""
+    print(f"✓ File size: {stats['bytes'] / (1024 * 1024):.2f} MB ({stats['format']})")
+    print(f"✓ Encoded in {stats['encodeSeconds']:.2f}s with {stats['encoder']}, "
+          f"written in {stats['writeSeconds']:.2f}s")
+    if stats['pagesBytes'] is not None:
+        print(f"✓ Rank pages and manifest: {stats['pagesBytes'] / (1024 * 1024):.2f} MB "
+              f"in {stats['pagesSeconds']:.2f}s")
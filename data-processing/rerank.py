@@ -0,0 +1,179 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Weight Re-ranking
+Re-ranks the last run's candidate pool with new metric weights without rescoring any cards
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+from calculate_rankings import (build_pair_engine, build_combinations, scorer_fingerprint,
+                                METRICS, OUTPUT_FILE, STATE_DIR, TOP_N)
+from ranking_state import RankingState
+from rankings_export import write_rankings, print_export_stats
+from topk import TopK
+
+# Per-card metric scores are capped at this value
+MAX_METRIC_SCORE = 100
+# Largest possible synergy multiplier
+MAX_MULTIPLIER = 2.0
+
+def load_weights(path, base_weights):
+    """
+    Read {metric: weight} overrides from a JSON file. Metrics left out keep
+    their weight from base_weights.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        overrides = json.load(f)
+    return resolve_weights(overrides, base_weights, path)
+
+def resolve_weights(overrides, base_weights, source='weights'):
+    """
+    Apply {metric: weight} overrides to base_weights. Raises ValueError for
+    unknown metrics, non-numeric or negative weights.
+    """
+    if not isinstance(overrides, dict):
+        raise ValueError(f"{source} must be an object of {{metric: weight}}")
+
+    unknown = sorted(set(overrides) - set(METRICS))
+    if unknown:
+        raise ValueError(f"Unknown metrics in {source}: {', '.join(unknown)}")
+    invalid = sorted(metric for metric, weight in overrides.items()
+                     if isinstance(weight, bool) or not isinstance(weight, (int, float)))
+    if invalid:
+        raise ValueError(f"Weights must be numbers: {', '.join(invalid)}")
+
+    weights = {metric: float(overrides.get(metric, base_weights[metric])) for metric in METRICS}
+    negative = [metric for metric, weight in weights.items() if weight < 0]
+    if negative:
+        raise ValueError(f"Weights must not be negative: {', '.join(negative)}")
+    return weights
+
+def outside_pool_bound(old_weights, new_weights, outside_max):
+    """
+    Upper bound on the re-weighted score of any pair outside the pool,
+    given that none of them scored above outside_max with old_weights.
+
+    Metric scores are non-negative, so a metric whose weight grows by a
+    factor r adds at most r times its old contribution; the largest factor
+    bounds them all. A metric that had no weight before could contribute
+    anything up to its cap times the largest multiplier.
+    """
+    ratios = [new_weights[m] / old_weights[m] for m in METRICS if old_weights[m] > 0]
+    unweighted = sum(new_weights[m] for m in METRICS if old_weights[m] <= 0)
+    return max(ratios, default=0.0) * outside_max + MAX_MULTIPLIER * MAX_METRIC_SCORE * unweighted
+
+def rerank_pool(state, weights, top_n, candidate_floor):
+    """
+    Rescore every pool pair with new weights in one vectorized pass and
+    select the top_n. Returns the (score, idx1, idx2) winners, best first,
+    and the number of pool pairs that reached candidate_floor.
+    """
+    engine = build_pair_engine(state.table, weights)
+    rows = np.array([idx1 for _, idx1, _ in state.pool], dtype=np.intp)
+    cols = np.array([idx2 for _, _, idx2 in state.pool], dtype=np.intp)
+    scores = engine.score_pairs(rows, cols)
+
+    keep = scores >= candidate_floor
+    top = TopK(top_n, state.table.ids)
+    top.push_block(scores[keep], rows[keep], cols[keep])
+    return top.results(), int(np.count_nonzero(keep))
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Re-rank the last run's candidates with new weights")
+    parser.add_argument('--weights', required=True,
+                        help="JSON file of {metric: weight}; metrics left out keep their weight")
+    parser.add_argument('--top', type=int, default=TOP_N,
+                        help=f"number of combinations to export (default: {TOP_N})")
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help=f"rankings file to write (default: {OUTPUT_FILE})")
+    parser.add_argument('--state', default=STATE_DIR,
+                        help=f"ranking state saved by calculate_rankings.py (default: {STATE_DIR})")
+    parser.add_argument('--compact', action='store_true',
+                        help="write compact rankings.json (no indentation, each card stored once)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main execution function"""
+    args = parse_args(argv)
+
+    print("=" * 60)
+    print("Yu-Gi-Oh Combo Rankings - Weight Re-ranking")
+    print("=" * 60)
+
+    state = RankingState.load(args.state)
+    if state is None:
+        print(f"No ranking state in {args.state}. Please run calculate_rankings.py first.")
+        return 1
+    if state.config['fingerprint'] != scorer_fingerprint():
+        print("The card scoring code changed since the last run. Please run calculate_rankings.py first.")
+        return 1
+
+    old_weights = state.config['weights']
+    min_score = state.config['minScore']
+    try:
+        weights = load_weights(args.weights, old_weights)
+    except (OSError, ValueError) as e:
+        print(f"Error loading weights: {e}")
+        return 1
+
+    print(f"✓ Loaded {len(state.pool):,} candidate pairs over {len(state.table):,} cards")
+    for metric in METRICS:
+        if weights[metric] != old_weights[metric]:
+            print(f"  {metric}: {old_weights[metric]} -> {weights[metric]}")
+
+    # Same candidate floor as select_top_pairs
+    candidate_floor = min_score - 0.005
+
+    start = time.perf_counter()
+    winners, scored_count = rerank_pool(state, weights, args.top, candidate_floor)
+    elapsed = time.perf_counter() - start
+    print(f"✓ Re-ranked in {elapsed * 1000:.1f} ms")
+
+    # Pairs outside the pool scored at most the floor (or stayed below the
+    # threshold when the pool held every candidate)
+    outside_max = candidate_floor if state.floor is None else state.floor
+    bound = outside_pool_bound(old_weights, weights, outside_max)
+    exact = bound < candidate_floor or (len(winners) >= args.top and winners[args.top - 1][0] > bound)
+
+    if exact:
+        print(f"✓ Candidate pool provably holds the true top {args.top:,}")
+    else:
+        cutoff = winners[args.top - 1][0] if len(winners) >= args.top else candidate_floor
+        print(f"\n⚠️  Weight change too large to certify the top {args.top:,}:")
+        print(f"   pairs outside the pool could score up to {bound:.2f}, above the cutoff of {cutoff:.2f}")
+        print(f"   Run calculate_rankings.py with these weights for exact rankings")
+
+    top_combinations = build_combinations(state.table, winners, min_score, weights)
+
+    print(f"\nExporting to {args.output}...")
+    n = len(state.table)
+    output_data = {
+        'metadata': {
+            'totalCombinations': n * (n - 1) // 2,
+            'poolCombinationsScored': scored_count,
+            'topN': args.top,
+            'generationDate': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'weights': weights,
+            'cardsAnalyzed': n,
+            'minScoreThreshold': min_score,
+            'reranked': True,
+            'exactTopN': exact
+        },
+        'rankings': top_combinations
+    }
+
+    print_export_stats(write_rankings(output_data, args.output, args.compact))
+
+    print("✓ DONE!")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
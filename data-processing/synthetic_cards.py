@@ -0,0 +1,149 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Synthetic Card Generator
+Generates realistic card pools offline, in the cards.json format, for benchmarks
+"""
+
+import argparse
+import json
+import random
+from datetime import datetime
+
+from calculate_rankings import CardScorer, TEXT_PHRASES
+
+# Card type mix, roughly that of the real card pool
+TYPE_WEIGHTS = {
+    'Effect Monster': 40,
+    'Normal Monster': 6,
+    'Fusion Monster': 4,
+    'Synchro Monster': 4,
+    'XYZ Monster': 4,
+    'Link Monster': 3,
+    'Ritual Effect Monster': 1,
+    'Pendulum Effect Monster': 2,
+    'Spell Card': 22,
+    'Trap Card': 14,
+}
+MONSTER_RACES = ['Warrior', 'Spellcaster', 'Dragon', 'Machine', 'Fiend', 'Fairy', 'Beast', 'Zombie', 'Aqua', 'Insect']
+SPELL_RACES = ['Normal', 'Quick-Play', 'Continuous', 'Equip', 'Field', 'Ritual']
+TRAP_RACES = ['Normal', 'Continuous', 'Counter']
+ATTRIBUTES = ['DARK', 'LIGHT', 'EARTH', 'WATER', 'FIRE', 'WIND']
+
+ARCHETYPE_SHARE = 0.55  # Share of cards that belong to an archetype
+CARDS_PER_ARCHETYPE = 18  # Average archetype size
+THEMES_PER_ARCHETYPE = 3  # Keyword groups each archetype leans on
+THEME_BIAS = 0.7  # Chance an archetype card's effect uses one of its themes
+EMPTY_DESC_SHARE = 0.01
+
+OPENERS = ['You can', 'If this card is Normal Summoned, you can', 'Once per turn: You can',
+           'When your opponent activates a card or effect:', 'During your Main Phase, you can',
+           'If this card is sent to the GY:']
+OBJECTS = ['1 card', '1 monster from your Deck', '1 card your opponent controls', 'this card',
+           'up to 2 cards', '1 Spell/Trap', 'all monsters on the field']
+FLAVOR = ['A legendary warrior who guards the ancient gate.', 'Its roar shakes the mountains.',
+          'This creature lurks in the deep sea.', 'A mysterious machine from a forgotten age.']
+
+def keyword_groups():
+    """Scoring keyword groups plus the single text phrases the scorers look for"""
+    groups = [keywords for name, keywords in vars(CardScorer).items() if name.endswith('_KEYWORDS')]
+    groups += [[phrase] for phrase in TEXT_PHRASES]
+    return groups
+
+def _effect(rng, keyword):
+    return f"{rng.choice(OPENERS)} {keyword} {rng.choice(OBJECTS)}."
+
+def generate_cards(count, seed=0):
+    """
+    Generate count parsed card dicts, deterministic for a given seed.
+    Archetype members share a few keyword themes, so their descriptions
+    (and their scores) cluster like real archetypes do.
+    """
+    rng = random.Random(seed)
+    groups = keyword_groups()
+    types = list(TYPE_WEIGHTS)
+    type_weights = list(TYPE_WEIGHTS.values())
+
+    archetypes = [
+        {'name': f"Synthetic {k}", 'themes': rng.sample(groups, THEMES_PER_ARCHETYPE)}
+        for k in range(max(1, count // CARDS_PER_ARCHETYPE))
+    ]
+
+    cards = []
+    for i in range(count):
+        card_type = rng.choices(types, type_weights)[0]
+        archetype = rng.choice(archetypes) if rng.random() < ARCHETYPE_SHARE else None
+
+        if card_type == 'Normal Monster':
+            desc = rng.choice(FLAVOR)
+        elif rng.random() < EMPTY_DESC_SHARE:
+            desc = ''
+        else:
+            effects = []
+            for _ in range(rng.randint(1, 5)):
+                if archetype is not None and rng.random() < THEME_BIAS:
+                    group = rng.choice(archetype['themes'])
+                else:
+                    group = rng.choice(groups)
+                effects.append(_effect(rng, rng.choice(group)))
+            if archetype is not None:
+                effects.append(f"You can only use this effect of \"{archetype['name']}\" once per turn.")
+            desc = ' '.join(effects)
+
+        if 'Spell' in card_type:
+            race = rng.choice(SPELL_RACES)
+        elif 'Trap' in card_type:
+            race = rng.choice(TRAP_RACES)
+        else:
+            race = rng.choice(MONSTER_RACES)
+
+        card_id = str(10_000_000 + i)
+        card = {
+            'id': card_id,
+            'name': f"{archetype['name'] if archetype else 'Synthetic'} Card {i}",
+            'type': card_type,
+            'desc': desc,
+            'race': race,
+            'archetype': archetype['name'] if archetype else None,
+            'image_url': f"https://images.ygoprodeck.com/images/cards/{card_id}.jpg",
+            'image_url_small': f"https://images.ygoprodeck.com/images/cards_small/{card_id}.jpg",
+        }
+        if 'Monster' in card_type:
+            card['attribute'] = rng.choice(ATTRIBUTES)
+            card['level'] = rng.randint(1, 12)
+            card['atk'] = rng.randrange(0, 3100, 100)
+            card['def'] = rng.randrange(0, 3100, 100)
+        else:
+            card['card_subtype'] = race
+        cards.append(card)
+
+    return cards
+
+def build_snapshot(cards, seed=0):
+    """Wrap cards in the cards.json layout written by fetch_cards.py"""
+    return {
+        'metadata': {
+            'totalCards': len(cards),
+            'fetchDate': datetime.now().strftime('%Y-%m-%d'),
+            'apiVersion': 'v7',
+            'source': f"synthetic (seed {seed})"
+        },
+        'cards': cards
+    }
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Generate a synthetic cards.json")
+    parser.add_argument('--count', type=int, default=13000, help="number of cards (default: 13000)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument('--output', default="synthetic_cards.json", help="file to write")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main execution function"""
+    args = parse_args(argv)
+    cards = generate_cards(args.count, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(build_snapshot(cards, args.seed), f, ensure_ascii=False, indent=2)
+    print(f"✓ Wrote {len(cards):,} synthetic cards to {args.output}")
+
+if __name__ == "__main__":
+    main()
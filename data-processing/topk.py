@@ -0,0 +1,81 @@
+"""
+Yu-Gi-Oh Card Combination Ranking - Streaming Top-K Selection
+Keeps only the best K (score, i, j) pairs while every pair streams past
+"""
+
+import heapq
+import math
+
+import numpy as np
+
+class TopK:
+    """
+    Exact, deterministic top-K collector for card pairs.
+
+    Pairs are ranked by score (highest first); equal scores are ordered by
+    the tie keys of the two cards (smaller first), so the same inputs always
+    produce the same ranking regardless of the order pairs arrive in. The
+    heap holds at most K small tuples, with the current worst pair on top.
+    """
+
+    def __init__(self, k, tie_keys):
+        """
+        k:        number of pairs to keep
+        tie_keys: per-card integer keys used to break score ties (card ids)
+        """
+        self.k = k
+        self.tie_keys = [int(key) for key in tie_keys]
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    @property
+    def threshold(self):
+        """Score a pair has to reach to enter the heap (-inf until it is full)"""
+        if len(self._heap) < self.k:
+            return -math.inf
+        return self._heap[0][0]
+
+    def push(self, score, idx1, idx2):
+        """Offer a single pair"""
+        entry = (score, -self.tie_keys[idx1], -self.tie_keys[idx2], idx1, idx2)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def push_block(self, scores, rows, cols):
+        """
+        Offer a vectorized block of pairs.
+
+        scores, rows and cols are matching 1-D arrays. Anything below the
+        current threshold is dropped up front, and argpartition cuts the rest
+        down to the K best scores (plus ties at the cut, which the heap
+        resolves by card id) before touching Python tuples.
+        """
+        if self.k <= 0 or len(scores) == 0:
+            return
+
+        threshold = self.threshold
+        if threshold > -math.inf:
+            keep = scores >= threshold
+            scores, rows, cols = scores[keep], rows[keep], cols[keep]
+
+        if len(scores) > self.k:
+            kth = np.argpartition(scores, len(scores) - self.k)[len(scores) - self.k]
+            keep = scores >= scores[kth]
+            scores, rows, cols = scores[keep], rows[keep], cols[keep]
+
+        for score, idx1, idx2 in zip(scores.tolist(), rows.tolist(), cols.tolist()):
+            self.push(score, idx1, idx2)
+
+    def merge(self, other):
+        """Fold another collector's pairs into this one"""
+        for score, _, _, idx1, idx2 in other._heap:
+            self.push(score, idx1, idx2)
+
+    def results(self):
+        """Kept pairs as (score, idx1, idx2), best first"""
+        ordered = sorted(self._heap, reverse=True)
+        return [(score, idx1, idx2) for score, _, _, idx1, idx2 in ordered]
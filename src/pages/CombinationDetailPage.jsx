@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { Radar, RadarChart, PolarGrid, PolarAngleAxis, PolarRadiusAxis, ResponsiveContainer, Tooltip } from 'recharts';
+import { loadCombination } from '../utils/rankings';
 
 const CombinationDetailPage = () => {
     const { rank } = useParams();
@@ -9,11 +10,9 @@ const CombinationDetailPage = () => {
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
-        // Find combo matching rank (=id)
-        fetch('/rankings.json')
-            .then(res => res.json())
-            .then(data => {
-                const found = data.rankings.find(r => r.rank === parseInt(rank));
+        // Only the rank page holding this combo is downloaded
+        loadCombination(parseInt(rank))
+            .then(found => {
                 setCombo(found);
                 setLoading(false);
             })
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
+import { loadSummary } from '../utils/rankings';
 
 const HomePage = () => {
     const [stats, setStats] = useState({
@@ -11,8 +12,8 @@ const HomePage = () => {
     useEffect(() => {
         const fetchStats = async () => {
             try {
-                const response = await fetch('/rankings.json');
-                const data = await response.json();
+                // Only the small manifest when rank pages were exported
+                const data = await loadSummary();
                 setStats({
                     totalCombinations: data.metadata.totalCombinations || 0,
                     topCombinations: data.metadata.scoredCombinations || 0,
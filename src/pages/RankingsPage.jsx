@@ -2,10 +2,17 @@ import React, { useState, useEffect, useMemo } from 'react';
 import CombinationCard from '../components/CombinationCard';
 import FilterPanel from '../components/FilterPanel';
 import Pagination from '../components/Pagination';
+import { loadAllRankings, loadRankingSlice } from '../utils/rankings';
+
+// Filters that narrow the rankings (the other fields are not applied yet)
+const hasActiveFilters = (filters) =>
+    Boolean(filters.cardName || filters.cardType || filters.minScore > 0);
 
 const RankingsPage = () => {
     const [combinations, setCombinations] = useState([]);
-    const [loading, setLoading] = useState(true);
+    const [pageSlice, setPageSlice] = useState({ total: 0, rankings: [] });
+    const [pageLoading, setPageLoading] = useState(true);
+    const [allLoading, setAllLoading] = useState(true);
     const [currentPage, setCurrentPage] = useState(1);
     const [itemsPerPage] = useState(50);
     const [filters, setFilters] = useState({
@@ -20,18 +27,44 @@ const RankingsPage = () => {
     });
     const [sortBy, setSortBy] = useState('rank'); // rank, score, synergy
 
+    // Browsing in rank order only needs the rank pages on screen; filtering
+    // and re-sorting need every ranking, which is loaded once
+    const browsing = !hasActiveFilters(filters) && sortBy === 'rank';
+    const needsAll = !browsing && combinations.length === 0;
+    // Each mode has its own loading flag, so a request cancelled by
+    // switching modes can't leave the other mode's spinner on
+    const loading = browsing ? pageLoading : allLoading;
+
     useEffect(() => {
-        fetch('/rankings.json')
-            .then(res => res.json())
-            .then(data => {
-                setCombinations(data.rankings);
-                setLoading(false);
+        if (!browsing) return;
+        let cancelled = false;
+        setPageLoading(true);
+        loadRankingSlice((currentPage - 1) * itemsPerPage, itemsPerPage)
+            .then(slice => {
+                if (cancelled) return;
+                setPageSlice(slice);
+                setPageLoading(false);
             })
             .catch(err => {
                 console.error("Failed to load rankings", err);
-                setLoading(false);
+                if (!cancelled) setPageLoading(false);
             });
-    }, []);
+        return () => { cancelled = true; };
+    }, [browsing, currentPage, itemsPerPage]);
+
+    useEffect(() => {
+        if (!needsAll) return;
+        setAllLoading(true);
+        loadAllRankings()
+            .then(rankings => {
+                setCombinations(rankings);
+                setAllLoading(false);
+            })
+            .catch(err => {
+                console.error("Failed to load rankings", err);
+                setAllLoading(false);
+            });
+    }, [needsAll]);
 
     // ... (Filter Logic Same as Before) ...
     const filteredCombinations = useMemo(() => {
@@ -81,11 +114,14 @@ const RankingsPage = () => {
     }, [filteredCombinations, sortBy]);
 
     // Pagination
-    const totalPages = Math.ceil(sortedCombinations.length / itemsPerPage);
-    const displayedCombinations = sortedCombinations.slice(
-        (currentPage - 1) * itemsPerPage,
-        currentPage * itemsPerPage
-    );
+    const resultCount = browsing ? pageSlice.total : filteredCombinations.length;
+    const totalPages = Math.ceil(resultCount / itemsPerPage);
+    const displayedCombinations = browsing
+        ? pageSlice.rankings
+        : sortedCombinations.slice(
+            (currentPage - 1) * itemsPerPage,
+            currentPage * itemsPerPage
+        );
 
     const handlePageChange = (page) => {
         setCurrentPage(page);
@@ -104,7 +140,7 @@ const RankingsPage = () => {
                             COMBINATION <span className="text-neon-cyan">DATABASE</span>
                         </h1>
                         <p className="text-tech-gray font-rajdhani mt-2 tracking-wide">
-                            <span className="text-neon-blue font-bold">{filteredCombinations.length.toLocaleString()}</span> PAIRS INDEXED
+                            <span className="text-neon-blue font-bold">{resultCount.toLocaleString()}</span> PAIRS INDEXED
                         </p>
                     </div>
 
@@ -0,0 +1,115 @@
+// Loads rankings written by data-processing/rankings_export.py and always
+// returns full ranking entries ({ card1, card2, scores, ... }).
+//
+// The exporter writes rankings.json (pretty or compact) plus
+// rankings-pages/: a small manifest and fixed-size rank pages. Pages are
+// fetched on demand; without a manifest everything falls back to the
+// single rankings.json file.
+
+const COMPACT_FORMAT = 'compact-v1';
+const PAGES_DIR = '/rankings-pages';
+
+const zipObject = (keys, values) =>
+    Object.fromEntries(keys.map((key, i) => [key, values[i]]));
+
+// Expand a compact file: cards are stored once and rows reference them by index
+export const decodeRankings = (data) => {
+    if (data.format !== COMPACT_FORMAT) return data;
+
+    const firstRank = data.firstRank || 1;
+    const cards = data.cards.map(values => zipObject(data.cardFields, values));
+    const rankings = data.rankings.map((values, i) => {
+        const row = zipObject(data.rowFields, values);
+        return {
+            card1: cards[row.card1],
+            card2: cards[row.card2],
+            scores: zipObject(data.metrics, row.scores),
+            synergyMultiplier: row.synergyMultiplier,
+            totalScore: row.totalScore,
+            rank: firstRank + i,
+            explanation: row.explanation
+        };
+    });
+
+    return { metadata: data.metadata, rankings };
+};
+
+const fetchJson = (url) =>
+    fetch(url).then(res => {
+        if (!res.ok) throw new Error(`${url}: HTTP ${res.status}`);
+        return res.json();
+    });
+
+// Requests are cached for the lifetime of the page
+let rankingsRequest = null;
+let manifestRequest = null;
+const pageRequests = new Map();
+
+export const loadRankings = () => {
+    if (!rankingsRequest) {
+        rankingsRequest = fetchJson('/rankings.json').then(decodeRankings);
+        rankingsRequest.catch(() => { rankingsRequest = null; });
+    }
+    return rankingsRequest;
+};
+
+// Resolves to the manifest, or null when no rank pages were exported
+export const loadManifest = () => {
+    if (!manifestRequest) {
+        // The SPA fallback may answer a missing file with index.html, so a
+        // parse error also means "no manifest"
+        manifestRequest = fetchJson(`${PAGES_DIR}/manifest.json`).catch(() => null);
+    }
+    return manifestRequest;
+};
+
+const loadPage = (manifest, index) => {
+    if (!pageRequests.has(index)) {
+        const request = fetchJson(`${PAGES_DIR}/${manifest.pages[index]}`)
+            .then(page => decodeRankings(page).rankings);
+        request.catch(() => pageRequests.delete(index));
+        pageRequests.set(index, request);
+    }
+    return pageRequests.get(index);
+};
+
+// Metadata and score summary, without downloading any rankings when paged
+export const loadSummary = () =>
+    loadManifest().then(manifest => manifest
+        ? { metadata: manifest.metadata, summary: manifest.summary }
+        : loadRankings().then(data => ({ metadata: data.metadata, summary: { count: data.rankings.length } })));
+
+// Entries [start, start + count) by rank order, plus the total number of rankings
+export const loadRankingSlice = (start, count) =>
+    loadManifest().then(manifest => {
+        if (!manifest) {
+            return loadRankings().then(data => ({
+                total: data.rankings.length,
+                rankings: data.rankings.slice(start, start + count)
+            }));
+        }
+
+        const total = manifest.summary.count;
+        const end = Math.min(start + count, total);
+        if (start >= end) return { total, rankings: [] };
+
+        const first = Math.floor(start / manifest.pageSize);
+        const last = Math.floor((end - 1) / manifest.pageSize);
+        const indices = Array.from({ length: last - first + 1 }, (_, i) => first + i);
+        return Promise.all(indices.map(index => loadPage(manifest, index))).then(pages => ({
+            total,
+            rankings: pages.flat().slice(start - first * manifest.pageSize, end - first * manifest.pageSize)
+        }));
+    });
+
+// Every ranking entry, for client-side filtering and sorting
+export const loadAllRankings = () =>
+    loadManifest().then(manifest => manifest
+        ? Promise.all(manifest.pages.map((_, index) => loadPage(manifest, index))).then(pages => pages.flat())
+        : loadRankings().then(data => data.rankings));
+
+// A single entry by rank (1-based), or undefined
+export const loadCombination = (rank) =>
+    rank >= 1
+        ? loadRankingSlice(rank - 1, 1).then(({ rankings }) => rankings[0])
+        : Promise.resolve(undefined);